@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# bench_dec.py — field-scanner micro-benchmarks: ns/frame, allocations/frame, JSON baseline
+import argparse
+import gc
+import json
+import platform
+import random
+import struct
+import sys
+import time
+import tracemalloc
+
+from core.core_frm import FrameBuffer
+from core.core_fv import FrameView
+from core.core_lc import compile_fields
+from core.core_util import get_fields_if_match, get_fields_if_match2, extract_frames
+from core.core_vec import FrameBatch
+from core.core_ver import codec_for
+from core_old.core_dec_dll import find_field_offsets
+from cts.cts_dll import _get_all_from_callback, _get_conid_from_callback
+
+CORPUS_SIZE = 2000
+REGRESSION_PCT = 10.0
+
+
+def _enc(*fields) -> bytes:
+    return b"".join(str(f).encode("ascii") + b"\x00" for f in fields)
+
+
+# ---- corpora (v178 wire layouts, deterministic) ----
+def corpus_contract_details(n=CORPUS_SIZE, rnd=None):
+    rnd = rnd or random.Random(1)
+    out = []
+    for i in range(n):
+        exp = rnd.choice(("20250919", "20251017", "20251121", "20251219"))
+        k = 5000 + 25 * rnd.randrange(80)
+        r = rnd.choice("CP")
+        out.append(_enc(10, i, "SPX", "OPT", exp, k, r, "SMART", "USD", f"SPX   {exp[2:]}{r}{k * 1000:08d}",
+                        "SPXW", "SPXW", 700000000 + i, 0.05, 100, "ACTIVETIM,LMT,MKT", "SMART,CBOE", 1, 416904,
+                        "SPX", "CBOE", exp[:6], "", "", "", "US/Eastern", "", "", "", "", 0, 1, "SPX", "IND",
+                        "", exp, "", 1, 1, 1))
+    return out
+
+
+def corpus_option_ticks(n=CORPUS_SIZE, rnd=None):
+    rnd = rnd or random.Random(2)
+    return [_enc(21, rnd.randrange(1, 500), rnd.choice((10, 11, 12, 13)), 1, f"{rnd.uniform(.1, .4):.6f}",
+                 f"{rnd.uniform(-1, 1):.6f}", f"{rnd.uniform(0.05, 300):.2f}", 0, f"{rnd.uniform(0, .01):.6f}",
+                 f"{rnd.uniform(0, 5):.6f}", f"{-rnd.uniform(0, 5):.6f}", f"{rnd.uniform(6400, 6600):.2f}")
+            for _ in range(n)]
+
+
+def corpus_hst_bars(n=CORPUS_SIZE // 10, bars=50, rnd=None):
+    rnd = rnd or random.Random(3)
+    out = []
+    for i in range(n):
+        f = [17, i, "20250919 09:30:00 US/Eastern", "20250919 16:00:00 US/Eastern", bars]
+        px = 6500.0
+        for b in range(bars):
+            o = px
+            px += rnd.gauss(0, 2)
+            f += [f"20250919 {9 + b // 60:02d}:{b % 60:02d}:00 US/Eastern", f"{o:.2f}", f"{max(o, px) + 1:.2f}",
+                  f"{min(o, px) - 1:.2f}", f"{px:.2f}", rnd.randint(100, 9000), f"{(o + px) / 2:.2f}",
+                  rnd.randint(10, 500)]
+        out.append(_enc(*f))
+    return out
+
+
+def corpus_from_capture(path):
+    """RX frames of a core_cap capture grouped the same way as the synthetic corpora"""
+    from core.core_cap import RX, read_capture
+    groups = {b"10": [], b"21": [], b"17": []}
+    for ts, direction, frame in read_capture(path):
+        if direction == RX:
+            g = groups.get(frame[:frame.find(b"\x00")])
+            if g is not None:
+                g.append(frame)
+    return groups[b"10"], groups[b"21"], groups[b"17"]
+
+
+def _wire_chunks(frames, chunk=4096):
+    wire = b"".join(struct.pack(">I", len(p)) + p for p in frames)
+    return [wire[i:i + chunk] for i in range(0, len(wire), chunk)]
+
+
+def _wire_reads(frames, size):
+    """Frame-aligned reads of about `size` bytes (a replayed read never leaves a partial frame)"""
+    out, cur = [], []
+    n = 0
+    for p in frames:
+        cur.append(struct.pack(">I", len(p)) + p)
+        n += len(p) + 4
+        if n >= size:
+            out.append(b"".join(cur))
+            cur, n = [], 0
+    if cur:
+        out.append(b"".join(cur))
+    return out
+
+
+# ---- cases: name -> (corpus key, per-frame callable, frames per call) ----
+def build_cases(cts, tick, hst):
+    codec = codec_for(178)
+    fv = FrameView()
+    ticks_wire = _wire_chunks(tick)
+    cases = {
+        "get_fields_if_match/cts": (cts, lambda f: get_fields_if_match(f, b"10", (2, 4, 5, 6, 7, 12)), 1),
+        "compile_fields/cts": (cts, compile_fields(b"10", (2, 4, 5, 6, 7, 12), True, True), 1),
+        "get_fields_if_match2/cts": (cts, lambda f: get_fields_if_match2(f, b"10"), 1),
+        "_get_all_from_callback/cts": (cts, lambda f: _get_all_from_callback(fv.reset(f)), 1),
+        "_get_conid_from_callback/cts": (cts, lambda f: _get_conid_from_callback(fv.reset(f)), 1),
+        "FrameView.int_field/cts": (cts, lambda f: fv.reset(f).int_field(12), 1),
+        "codec.contract_details/cts": (cts, codec.contract_details, 1),
+        "find_field_offsets/tick": (tick, lambda f: find_field_offsets(f, {4, 5, 6, 8, 9, 10, 11}, 12), 1),
+        "get_fields_if_match/tick": (tick, lambda f: get_fields_if_match(f, b"21", (4, 5, 6, 8, 9, 10, 11)), 1),
+        "compile_fields/tick": (tick, compile_fields(b"21", (4, 5, 6, 8, 9, 10, 11), True, True), 1),
+        "FrameView.float_field/tick": (tick, lambda f: fv.reset(f).float_field(4), 1),
+        "codec.tick_option_computation/tick": (tick, codec.tick_option_computation, 1),
+        "get_fields_if_match/hst": (hst, lambda f: get_fields_if_match(f, b"17", (2, 9)), 1),
+        "compile_fields/hst": (hst, compile_fields(b"17", (2, 9), True, True), 1),
+        "find_field_offsets/hst": (hst, lambda f: find_field_offsets(f, {1, 2, 3, 4}, 5), 1),
+        "split/hst": (hst, lambda f: f.split(b"\x00"), 1),
+    }
+    if ticks_wire:
+        buf = bytearray()
+        cases["extract_frames/tick"] = (ticks_wire, lambda c: extract_frames(buf, c), len(tick) / len(ticks_wire))
+        fb = FrameBuffer()
+        reads = _wire_reads(tick, 64 * 1024)
+        cases["FrameBatch/tick"] = (reads, lambda c: (fb.feed(c), FrameBatch.from_buffer(fb))[1], len(tick) / len(reads))
+    return cases
+
+
+def _time(corpus, fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        for f in corpus:
+            fn(f)
+        dt = time.perf_counter_ns() - t0
+        if best is None or dt < best:
+            best = dt
+    return best
+
+
+def _allocs(corpus, fn):
+    """Blocks and bytes still held by the results, plus the transient peak, per call"""
+    gc.collect()
+    gc.disable()
+    try:
+        tracemalloc.start()
+        b0 = sys.getallocatedblocks()
+        m0 = tracemalloc.get_traced_memory()[0]
+        keep = [fn(f) for f in corpus]
+        blocks = sys.getallocatedblocks() - b0
+        held = tracemalloc.get_traced_memory()[0] - m0
+        del keep
+        peak = 0
+        for f in corpus[:200]:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn(f)
+            p = tracemalloc.get_traced_memory()[1] - base
+            if p > peak:
+                peak = p
+        tracemalloc.stop()
+    finally:
+        gc.enable()
+    n = len(corpus)
+    # the list holding the results is one block plus one pointer per call
+    return max(blocks - 1, 0) / n, max(held - 8 * n, 0) / n, peak
+
+
+def run(cases, repeat=5):
+    res = {}
+    for name, (corpus, fn, per_call) in cases.items():
+        if not corpus:
+            continue
+        fn(corpus[0])
+        ns = _time(corpus, fn, repeat)
+        frames = len(corpus) * per_call
+        blocks, held, peak = _allocs(corpus, fn)
+        res[name] = {
+            "frames": int(frames),
+            "ns_per_frame": round(ns / frames, 1),
+            "blocks_per_frame": round(blocks / per_call, 2),
+            "bytes_per_frame": round(held / per_call, 1),
+            "peak_bytes": peak,
+        }
+    return res
+
+
+def report(res, base=None):
+    regressions = []
+    print(f"{'case':<38}{'ns/frame':>10}{'blocks':>8}{'bytes':>9}{'peak B':>8}  vs baseline")
+    for name, r in res.items():
+        cmp = ""
+        b = (base or {}).get(name)
+        if b:
+            d = (r["ns_per_frame"] - b["ns_per_frame"]) / b["ns_per_frame"] * 100
+            cmp = f"{d:+6.1f}%"
+            if d > REGRESSION_PCT:
+                cmp += "  REGRESSION"
+                regressions.append(name)
+            if r["blocks_per_frame"] >= b["blocks_per_frame"] + 0.5:
+                cmp += f"  blocks {b['blocks_per_frame']} -> {r['blocks_per_frame']}"
+        print(f"{name:<38}{r['ns_per_frame']:>10.1f}{r['blocks_per_frame']:>8.2f}"
+              f"{r['bytes_per_frame']:>9.1f}{r['peak_bytes']:>8}  {cmp}")
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Decoder micro-benchmarks")
+    ap.add_argument("--save", help="write results as a JSON baseline")
+    ap.add_argument("--compare", help="JSON baseline to compare against (exit 1 on regression)")
+    ap.add_argument("--capture", help="use RX frames of a core_cap capture instead of synthetic corpora")
+    ap.add_argument("--repeat", type=int, default=5)
+    a = ap.parse_args(argv)
+
+    corpora = corpus_from_capture(a.capture) if a.capture else \
+        (corpus_contract_details(), corpus_option_ticks(), corpus_hst_bars())
+    res = run(build_cases(*corpora), a.repeat)
+    base = None
+    if a.compare:
+        with open(a.compare) as f:
+            base = json.load(f)["results"]
+    regressions = report(res, base)
+    if a.save:
+        with open(a.save, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "capture": a.capture, "results": res}, f, indent=1)
+        print(f"baseline written to {a.save}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
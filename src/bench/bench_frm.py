@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# bench_frm.py — receive-path framing: legacy read(4)+read(n) vs core_frm.FrameBuffer
+import asyncio
+import socket
+import struct
+import threading
+import time
+
+from core.core_frm import FrameBuffer, read_frame, read_frame_async
+
+TICK = b"21\x001\x0013\x001\x000.1523\x000.5012\x0012.35\x000\x000.0012\x000.0435\x00-0.0612\x006512.25\x00"
+HST = b"17\x007\x00" + b"20250919 15:30:00 US/Eastern\x006512.25\x006515.0\x006510.5\x006513.75\x001234\x006512.9\x00321\x00" * 50
+
+
+def _wire(payload: bytes, count: int) -> bytes:
+    return (struct.pack(">I", len(payload)) + payload) * count
+
+
+def _legacy_recv(sock):
+    length_bytes = sock.recv(4)
+    if len(length_bytes) < 4:
+        return None
+    length = struct.unpack(">I", length_bytes)[0]
+    return sock.recv(length)
+
+
+def bench_sync(payload: bytes, count: int):
+    wire = _wire(payload, count)
+    res = {}
+    for name in ("legacy", "framebuffer"):
+        a, b = socket.socketpair()
+        t = threading.Thread(target=lambda: (a.sendall(wire), a.close()))
+        fb = FrameBuffer()
+        t0 = time.perf_counter()
+        t.start()
+        n = 0
+        if name == "legacy":
+            while _legacy_recv(b):
+                n += 1
+        else:
+            while read_frame(b, fb) is not None:
+                n += 1
+        res[name] = (n, time.perf_counter() - t0)
+        t.join()
+        b.close()
+    return res
+
+
+async def _legacy_recv_async(reader):
+    length_bytes = await reader.read(4)
+    if len(length_bytes) < 4:
+        return None
+    length = struct.unpack(">I", length_bytes)[0]
+    return await reader.read(length)
+
+
+async def bench_async(payload: bytes, count: int):
+    wire = _wire(payload, count)
+    res = {}
+    for name in ("legacy", "framebuffer"):
+        reader = asyncio.StreamReader(limit=len(wire) + 1)
+        reader.feed_data(wire)
+        reader.feed_eof()
+        fb = FrameBuffer()
+        t0 = time.perf_counter()
+        n = 0
+        if name == "legacy":
+            while await _legacy_recv_async(reader):
+                n += 1
+        else:
+            while await read_frame_async(reader, fb) is not None:
+                n += 1
+        res[name] = (n, time.perf_counter() - t0)
+    return res
+
+
+def _report(label, res, count):
+    base = res["legacy"][1] / max(res["legacy"][0], 1)
+    for name, (n, sec) in res.items():
+        per = sec / max(n, 1)
+        note = "" if n == count else f"  SHORT READ: stream desynced after {n}/{count}"
+        print(f"{label:<14} {name:<12} {n:>8} frames {per * 1e9:>9.0f} ns/frame  x{base / per:.2f}{note}")
+
+
+def main():
+    for label, payload, count in (("tick/sync", TICK, 200_000), ("hst/sync", HST, 5_000)):
+        _report(label, bench_sync(payload, count), count)
+    for label, payload, count in (("tick/async", TICK, 200_000), ("hst/async", HST, 5_000)):
+        _report(label, asyncio.run(bench_async(payload, count)), count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# bench_imp.py — import-time budget for the entry modules: -X importtime in fresh interpreters
+import argparse
+import os
+import subprocess
+import sys
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module -> (budget ms, modules it must not pull in). Budgets are the module's cumulative
+# -X importtime (interpreter startup excluded), best of --repeat runs.
+BUDGETS = {
+    "cts.cts_cfg": (15.0, ("asyncio", "typing", "datetime")),
+    "cts.cts_cache": (25.0, ("asyncio", "aiohttp", "requests", "pathlib", "typing")),
+    "cts.cts_cdn": (20.0, ("asyncio", "aiohttp", "requests")),
+    "cts.cts_dll": (40.0, ("asyncio", "aiohttp", "requests", "numpy")),
+    "core.Tws": (120.0, ("aiohttp", "requests", "numpy")),
+    "cts.cts_api": (130.0, ("aiohttp", "requests", "numpy")),
+    "hst.hst_api": (130.0, ("aiohttp", "requests", "numpy")),
+    "mkt.mkt_api": (130.0, ("aiohttp", "requests", "numpy")),
+}
+
+
+def import_profile(module: str):
+    """(cumulative us of module, every module imported) from one fresh interpreter"""
+    env = dict(os.environ, PYTHONPATH=SRC + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                       capture_output=True, text=True, env=env, cwd=SRC)
+    if p.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{p.stderr.strip().splitlines()[-1]}")
+    total, loaded = None, set()
+    for line in p.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if name == "imported package":
+            continue
+        loaded.add(name)
+        if name == module:
+            total = int(cum)
+    return total, loaded
+
+
+def run(modules, repeat: int):
+    res = {}
+    for m in modules:
+        best, loaded = None, set()
+        for _ in range(repeat):
+            us, loaded = import_profile(m)
+            best = us if best is None else min(best, us)
+        res[m] = (best / 1000, loaded)
+    return res
+
+
+def report(res) -> int:
+    over = 0
+    for m, (ms, loaded) in res.items():
+        budget, banned = BUDGETS.get(m, (None, ()))
+        bad = sorted(b for b in banned if b in loaded)
+        flag = ""
+        if budget is not None and ms > budget:
+            flag += f"  OVER ({budget:.0f} ms)"
+        if bad:
+            flag += f"  imports {', '.join(bad)}"
+        over += bool(flag)
+        print(f"{m:<16} {ms:>7.1f} ms {len(loaded):>5} modules{flag}")
+    return over
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Import-time budget of the entry modules")
+    ap.add_argument("modules", nargs="*", help="modules to measure (default: every budgeted one)")
+    ap.add_argument("--repeat", type=int, default=5)
+    a = ap.parse_args(argv)
+    over = report(run(a.modules or list(BUDGETS), a.repeat))
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
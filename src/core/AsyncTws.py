@@ -2,6 +2,9 @@ import asyncio
 import struct
 
 from core.core_cfg import client_id
+from core.core_frm import FrameBuffer, read_frame_async
+from core.core_trc import TRC, TX, RX
+from core.core_ver import codec_for, parse_server_version
 
 
 class AsyncTws:
@@ -10,7 +13,9 @@ class AsyncTws:
         self.port = port
         self.reader = None
         self.writer = None
+        self._rx = FrameBuffer()
         self.server_version = None
+        self.codec = None
         self.client_id = client_id(business, slot)
 
     async def connect(self):
@@ -21,19 +26,17 @@ class AsyncTws:
     async def send_frame(self, payload):
         """Send a framed message"""
         frame = struct.pack(">I", len(payload)) + payload
-        print(f">>> {frame.hex()}")
+        if TRC.ring_on:
+            TRC.record(TX, payload)
         self.writer.write(frame)
         await self.writer.drain()
 
     async def recv_frame(self):
-        """Receive a framed message"""
-        length_bytes = await self.reader.read(4)
-        if len(length_bytes) < 4:
-            return None
-        length = struct.unpack(">I", length_bytes)[0]
-        payload = await self.reader.read(length)
-        #print(f"<<< {(length_bytes + payload).hex()}")
-        return payload
+        """Receive a framed message (exact length, chunked reads)"""
+        frame = await read_frame_async(self.reader, self._rx)
+        if TRC.ring_on and frame is not None:
+            TRC.record(RX, frame)
+        return frame
 
     async def _handshake(self):
         """Perform TWS handshake"""
@@ -44,14 +47,11 @@ class AsyncTws:
 
         # Get server version
         response = await self.recv_frame()
-        #fields = response.decode('utf-8', 'replace').rstrip('\x00').split('\x00')
-        #self.server_version = int(fields[0])
-        #print(f"Server version: {self.server_version}")
-        #print(f"Server version: {response}")
+        self.server_version = parse_server_version(response)
+        self.codec = codec_for(self.server_version)
 
         # Send startApi
-        start_payload = f"71\x002\x00{self.client_id}\x00\x00".encode('ascii')
-        await self.send_frame(start_payload)
+        await self.send_frame(self.codec.start_api(self.client_id))
 
         # Get managedAccounts and nextValidId
         for _ in range(2):
@@ -2,43 +2,45 @@ import socket
 import struct
 
 from core.core_cfg import client_id
+from core.core_frm import FrameBuffer, read_frame
+from core.core_trc import TRC, TX, RX
+from core.core_ver import codec_for, parse_server_version
 
 
 class SyncTws:
     def __init__(self, host, port, business, slot):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.connect((host, port))
+        self._rx = FrameBuffer()
         self.server_version = None
+        self.codec = None
         self.client_id = client_id(business, slot)
 
     def send_frame(self, payload):
         frame = struct.pack(">I", len(payload)) + payload
-        print(f">>> {frame.hex()}")
-        self.sock.send(frame)
+        if TRC.ring_on:
+            TRC.record(TX, payload)
+        self.sock.sendall(frame)
 
     def recv_frame(self):
-        length_bytes = self.sock.recv(4)
-        if len(length_bytes) < 4:
-            return None
-        length = struct.unpack(">I", length_bytes)[0]
-        payload = self.sock.recv(length)
-        #print(f"<<< {(length_bytes + payload).hex()}")
-        return payload
+        frame = read_frame(self.sock, self._rx)
+        if TRC.ring_on and frame is not None:
+            TRC.record(RX, frame)
+        return frame
 
     def handshake(self):
         # Send handshake
         hello = b"API\x00" + struct.pack(">I", 9) + b"v157..178"
-        self.sock.send(hello)
+        self.sock.sendall(hello)
 
         # Get server version
         response = self.recv_frame()
-        fields = response.decode('utf-8', 'replace').rstrip('\x00').split('\x00')
-        self.server_version = int(fields[0])
+        self.server_version = parse_server_version(response)
+        self.codec = codec_for(self.server_version)
         print(f"Server version: {self.server_version}")
 
         # Send startApi
-        start_payload = f"71\x002\x00{self.client_id}\x00\x00".encode('ascii')
-        self.send_frame(start_payload)
+        self.send_frame(self.codec.start_api(self.client_id))
 
         # Get managedAccounts and nextValidId
         for _ in range(2):
@@ -3,20 +3,59 @@ import struct
 import socket
 import signal
 import atexit
-from core.core_cfg import client_id
+from core.core_bq import SubQueue, BLOCK, DROP_OLDEST, tick_key
+from core.core_cfg import client_id, REQ_ID_FIELD, REQ_IDS, SUB_QUEUE, DEFAULT_CONNECT_TIMEOUT_SEC
+from core.core_cap import CaptureWriter
+from core.core_cx import Cx
+from core.core_err import error_code, is_info
+from core.core_lat import LatencyProbe
+from core.core_met import MET, REQ_KINDS
+from core.core_pace import Pacer, gateway_budget
+from core.core_rid import ReqIdAllocator, RouteTable
+from core.core_sup import Supervisor
+from core.core_trc import TRC, TX, RX
+from core.core_ver import codec_for, parse_server_version
+from core.core_wrt import FrameWriter
+from core.core_util import extract_tag_req_id
 
 
 class Tws:
     is_async=False
-    def __init__(self, host="127.0.0.1", port=4012,business='cts',slot=1):
+    def __init__(self, host="127.0.0.1", port=4012,business='cts',slot=1,reconnect=True,capture=None):
         self._closed = False
+        self._closing = False
 
         self.host = host
         self.port = port
-        self.reader = None
-        self.writer = None
+        self.cx = None
+        self.tx = None
+        self.pacer = Pacer(gateway_budget(host, port))
         self.server_version = None
+        self.codec = None
         self.client_id = client_id(business, slot)
+        # reqIds come from this connection's own window; inbound routing indexes into it
+        self.ids = ReqIdAllocator(self.client_id * REQ_IDS["window"], busy=self._busy)
+        # Inbound routing: reqId -> queue of frames owned by that request
+        self._routes = RouteTable(self.ids.base)
+        # Frames no request owns, once someone reads them (recv_frame_async); bounded, oldest dropped
+        self._stream = None
+        # Handshake replies (version, managedAccounts, nextValidId) while _handshake_async runs
+        self._hs = None
+        # Pending requests: reqId -> payload, re-sent as-is after a reconnect
+        self._replay = {}
+        # Live streaming subscriptions: reqId -> builder(req_id) -> payload (count toward load)
+        self.subs = {}
+        # Frames without a reqId: tag -> callback(frame), checked before the stream
+        self.on_tag = {}
+        # Batch consumers: tag -> callback(batch, rows), claim every frame of that tag
+        self.on_batch = {}
+        self.sup = Supervisor(self) if reconnect else None
+        self.probe = None
+        # Counters: frames / bytes per tag both ways, error codes; request open times for latency
+        self.met = MET.connection(self)
+        self._opened = {}
+        # Optional wire capture (path): every frame in and out, for offline replay
+        self.cap = CaptureWriter(capture) if capture else None
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         # Register cleanup handlers
         atexit.register(self._cleanup_sync)
@@ -53,33 +92,228 @@ class Tws:
     async def connect_async(self):
         self.is_async = True
         """Establish connection to TWS"""
-        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
-        await self._handshake_async()
+        await self._open_async()
         print(f'Connected Async at {self.host} {self.port} {self.client_id}')
+
+    async def _open_async(self):
+        """New transport + writer + handshake (initial connect and every reconnect)"""
+        self.cx = Cx(self._on_frame, self._on_lost, self._on_batch if self.on_batch else None)
+        await self.cx.connect(self.host, self.port)
+        self.tx = FrameWriter(self.cx)
+        try:
+            await asyncio.wait_for(self._handshake_async(), DEFAULT_CONNECT_TIMEOUT_SEC)
+        except BaseException:
+            # an unusable handshake (unsupported version, dropped link) must not leave the socket open
+            self.cx.disconnect()
+            raise
+
+    def open_request(self, req_id, payload=None):
+        """Register req_id and return the queue its frames are routed to (None = connection lost).
+        With payload, the request is re-sent under the same reqId if the connection drops."""
+        q = self.add_route(req_id, asyncio.Queue())
+        if payload is not None:
+            self._replay[req_id] = payload
+            end = payload.find(b"\x00")
+            self._opened[req_id] = (REQ_KINDS.get(payload[:end], "other"), asyncio.get_running_loop().time())
+        return q
+
+    def open_subscription(self, req_id, policy=SUB_QUEUE["policy"], maxlen=SUB_QUEUE["maxlen"], key=tick_key):
+        """Register req_id and return a bounded SubQueue its frames are routed to (None = connection lost).
+        policy 'block' pauses reading the socket while the queue is full."""
+        q = SubQueue(maxlen, policy, key, on_drop=self.met.dropped)
+        if policy == BLOCK:
+            q.on_full = self._pause_reading
+            q.on_space = self._resume_reading
+        return self.add_route(req_id, q)
+
+    def add_route(self, req_id, route):
+        """Route req_id's frames to `route` (anything with put_nowait(frame); None = connection lost)"""
+        if req_id in self._routes:
+            raise ValueError(f"reqId {req_id} already in flight")
+        self._routes[req_id] = route
+        return route
+
+    def move_route(self, old_id, new_id):
+        """Re-key a route (the supervisor renumbers subscriptions on reconnect)"""
+        q = self._routes.pop(old_id)
+        if q is not None:
+            self._routes[new_id] = q
+
+    def _pause_reading(self):
+        if self.cx is not None:
+            self.cx.pause_reading()
+
+    def _resume_reading(self):
+        if self.cx is not None:
+            self.cx.resume_reading()
+
+    def next_req_id(self):
+        """Fresh reqId on this connection (unique across connections and API instances)"""
+        return self.ids.alloc()
+
+    def _busy(self, req_id):
+        return req_id in self._routes or req_id in self.subs
+
+    def close_request(self, req_id):
+        """Stop routing frames for req_id (late frames fall to the unrouted stream); returns its queue"""
+        self._replay.pop(req_id, None)
+        opened = self._opened.pop(req_id, None)
+        if opened is not None:
+            MET.observe(opened[0], asyncio.get_running_loop().time() - opened[1])
+        return self._routes.pop(req_id, None)
+
+    def add_batch_handler(self, tag, fn):
+        """Deliver frames of `tag` as FrameBatch rows, fn(batch, rows), on high-rate reads"""
+        self.on_batch[tag] = fn
+        if self.cx is not None:
+            self.cx.on_batch = self._on_batch
+
+    def remove_batch_handler(self, tag):
+        self.on_batch.pop(tag, None)
+        if not self.on_batch and self.cx is not None:
+            self.cx.on_batch = None
+
+    def start_probe(self):
+        """Start the reqCurrentTime heartbeat (RTT percentiles, clock offset)"""
+        if self.probe is None:
+            self.probe = LatencyProbe(self)
+        return self.probe.start()
+
+    @property
+    def inflight(self):
+        return len(self._routes)
+
+    @property
+    def load(self):
+        return len(self._routes) + len(self.subs)
+
+    def _on_frame(self, mv):
+        # Called from Cx.buffer_updated: the view is reused, keep a copy
+        frame = bytes(mv)
+        if TRC.ring_on:
+            TRC.record(RX, frame)
+        if self.cap is not None:
+            self.cap.record(RX, frame)
+        self._dispatch(frame)
+
+    def _on_batch(self, batch):
+        """Handlers get their rows of the batch; everything else goes through _dispatch in order"""
+        if TRC.ring_on:
+            TRC.record_spans(RX, batch.spans())
+        if self.cap is not None:
+            for frame in batch.frames():
+                self.cap.record(RX, frame)
+        claimed = []
+        m = self.met
+        for tag, fn in tuple(self.on_batch.items()):
+            rows = batch.rows(tag)
+            if len(rows):
+                fn(batch, rows)
+                # claimed rows skip _dispatch: count them here
+                m.frames_in[tag] = m.frames_in.get(tag, 0) + len(rows)
+                m.bytes_in[tag] = m.bytes_in.get(tag, 0) + batch.payload_bytes(rows) + 4 * len(rows)
+                claimed.append(tag)
+        dispatch = self._dispatch
+        frame = batch.frame
+        for i in (batch.rows_except(claimed) if claimed else range(len(batch))):
+            dispatch(frame(i))
+
+    def _dispatch(self, frame):
+        """Decode tag and reqId once, hand the frame to its owner"""
+        tag, req_id = extract_tag_req_id(frame, REQ_ID_FIELD)
+        m = self.met
+        m.frames_in[tag] = m.frames_in.get(tag, 0) + 1
+        m.bytes_in[tag] = m.bytes_in.get(tag, 0) + len(frame) + 4
+        if tag == b"4":
+            code = error_code(frame)
+            m.error(code)
+            if is_info(code):
+                # counted, never routed: a request waiting on its queue must not wake for a farm notice
+                cb = self.on_tag.get(tag)
+                if cb is not None:
+                    cb(frame)
+                return
+        if req_id is not None:
+            # RouteTable.get inlined: a list slot for reqIds from our window
+            routes = self._routes
+            i = req_id - routes.base
+            slots = routes.slots
+            q = slots[i] if 0 <= i < len(slots) else routes.extra.get(req_id)
+            if q is not None:
+                q.put_nowait(frame)
+                return
+        else:
+            cb = self.on_tag.get(tag)
+            if cb is not None:
+                cb(frame)
+                return
+        q = self._hs if self._hs is not None else self._stream
+        if q is not None:
+            q.put_nowait(frame)
+
+    def _on_lost(self, exc):
+        """Hand over to the supervisor, or wake every waiter so no request hangs on a dead socket"""
+        if self._hs is not None:
+            # dropped mid-handshake: fail the handshake now; its caller (connect_async or the
+            # supervisor, which then retries) owns the outcome, pending requests stay registered
+            self._hs.put_nowait(None)
+            return
+        if self._closing or self._closed:
+            self._fail_pending()
+            return
+        print(f"Connection lost: {exc or 'closed by peer'}")
+        if exc is not None:
+            TRC.dump(last=64)
+        if self.sup is not None and self.server_version is not None:
+            # Requests stay registered; the supervisor re-issues them once the handshake is done
+            self.sup.on_lost(exc)
+            return
+        self._fail_pending()
+
+    def _fail_pending(self):
+        self._replay.clear()
+        for q in self._routes.values():
+            q.put_nowait(None)
+        if self._stream is not None:
+            self._stream.put_nowait(None)
+            self._stream = None
     #
-    async def send_frame_async(self, payload):
+    async def send_frame_async(self, payload, pace=True):
         if not self.is_async:
             print("The connection is Sync! Cannot use this method!")
             return None
-        """Send a framed message"""
-        frame = struct.pack(">I", len(payload)) + payload
-        print(f">>> {frame.hex()}")
-        self.writer.write(frame)
-        return await self.writer.drain()
+        """Queue a framed message; written with the rest of this loop tick"""
+        if pace:
+            await self.pacer.pace()
+        if not self.cx.is_connected():
+            # Link is down: pending requests and subscriptions are replayed on reconnect
+            return None
+        if TRC.ring_on:
+            TRC.record(TX, payload)
+        if self.cap is not None:
+            self.cap.record(TX, payload)
+        self.met.sent(payload)
+        self.tx.put(payload)
+        return await self.tx.drain()
     #
     #
     async def recv_frame_async(self):
         if not self.is_async:
             print("The connection is Sync! Cannot use this method!")
             return None
-        """Receive a framed message"""
-        length_bytes = await self.reader.read(4)
-        if len(length_bytes) < 4:
-            return None
-        length = struct.unpack(">I", length_bytes)[0]
-        payload = await self.reader.read(length)
-        #print(f"<<< {(length_bytes + payload).hex()}")
-        return payload
+        """Receive the next frame not claimed by an open request"""
+        if self._stream is None:
+            if not self.cx.is_connected():
+                return None
+            self.open_stream()
+        return await self._stream.get()
+
+    def open_stream(self):
+        """Start keeping unrouted frames for recv_frame_async (bounded: the oldest go once maxlen wait)"""
+        if self._stream is None:
+            # never 'block': a stream nobody drains any more must not stall every route of the connection
+            self._stream = SubQueue(SUB_QUEUE["maxlen"], DROP_OLDEST, on_drop=self.met.dropped)
+        return self._stream
     #
     # def send_frame(self, payload):
     #     if self.is_async:
@@ -105,26 +339,32 @@ class Tws:
         """Perform TWS handshake"""
         # Send handshake
         hello = b"API\x00" + struct.pack(">I", 9) + b"v157..178"
-        self.writer.write(hello)
-        await self.writer.drain()
-
-        # Get server version
-        response = await self.recv_frame_async()
-        #fields = response.decode('utf-8', 'replace').rstrip('\x00').split('\x00')
-        #self.server_version = int(fields[0])
-        #print(f"Server version: {self.server_version}")
-        #print(f"Server version: {response}")
-
-        # Send startApi
-        start_payload = f"71\x002\x00{self.client_id}\x00\x00".encode('ascii')
-        await self.send_frame_async(start_payload)
-
-        # Get managedAccounts and nextValidId
-        for _ in range(2):
-            response = await self.recv_frame_async()
-            #print(f"Startup: {response}")
-            #fields = response.decode('utf-8', 'replace').rstrip('\x00').split('\x00')
-            #print(f"Startup: {fields[0]} -> {fields}")
+        hs = self._hs = asyncio.Queue()
+        try:
+            self.cx.send(hello)
+            await self.cx.drain()
+
+            # Get server version; resolve the codec for it once, here
+            response = await hs.get()
+            if response is None:
+                raise ConnectionError("Connection closed during handshake")
+            self.server_version = parse_server_version(response)
+            self.codec = codec_for(self.server_version)
+
+            # Send startApi
+            await self.send_frame_async(self.codec.start_api(self.client_id))
+
+            # Get managedAccounts and nextValidId
+            for _ in range(2):
+                response = await hs.get()
+                if response is None:
+                    raise ConnectionError("Connection closed during handshake")
+                #print(f"Startup: {response}")
+                #fields = response.decode('utf-8', 'replace').rstrip('\x00').split('\x00')
+                #print(f"Startup: {fields[0]} -> {fields}")
+        finally:
+            # Unrouted frames go back to the stream (dropped until someone reads it)
+            self._hs = None
     #
     # def _handshake(self):
     #     # Send handshake
@@ -181,31 +421,42 @@ class Tws:
         """Synchronous cleanup for emergencies"""
         if not self._closed:
             try:
+                if self.cx:
+                    self.cx.disconnect()
                 if self.sock:
                     self.sock.close()
+                if self.cap is not None:
+                    self.cap.close()
             except:
                 pass
+            MET.drop(self.met)
             self._closed = True
 
     async def close_async(self):
         if not self.is_async or self._closed:
             return
 
+        self._closing = True
+        if self.probe is not None:
+            self.probe.stop()
         try:
             # Send disconnect message
             disconnect_payload = b"71\x001\x00"
             await self.send_frame_async(disconnect_payload)
+            self.tx.flush()
             await asyncio.sleep(0.1)  # Brief pause for message delivery
         except:
             pass
 
         try:
-            if self.writer:
-                self.writer.close()
-                await self.writer.wait_closed()
+            if self.cx:
+                self.cx.disconnect()
         except:
             pass
 
+        if self.cap is not None:
+            self.cap.close()
+        MET.drop(self.met)
         self._closed = True
         print("Connection closed cleanly")
     #
@@ -0,0 +1,145 @@
+# core_bq.py — bounded per-subscription buffers: block, drop-oldest or conflate per tickType
+import asyncio
+from collections import deque
+
+from core.core_cfg import REQ_ID_FIELD, SUB_QUEUE
+
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+CONFLATE = "conflate"
+POLICIES = (BLOCK, DROP_OLDEST, CONFLATE)
+
+
+def tick_key(frame: bytes):
+    """Conflation key of a market data frame: (tag, tickType) for ticks, (tag,) otherwise"""
+    f = frame.split(b"\x00", 4)
+    i = REQ_ID_FIELD.get(f[0])
+    if i is not None and f[0] != b"50" and len(f) > i + 2:
+        return f[0], f[i + 1]
+    return f[0],
+
+
+class SubQueue:
+    """
+    Bounded buffer between the feed (put_nowait, never awaits: it runs inside
+    the socket read callback) and one consumer (get / get_nowait / drain).
+      drop_oldest  full: the oldest item goes, counted in `dropped`
+      conflate     one slot per key(item); a newer value replaces the queued
+                   one in place (`conflated`); a new key when full drops the
+                   oldest key (`dropped`)
+      block        full: the item is kept and on_full() is called
+                   (Tws pauses reading the socket, TCP pushes back on the
+                   gateway); on_space() when the consumer is back under half.
+                   Overshoot is bounded by what one socket read delivers.
+    on_drop() is called for every dropped item (running totals outlive the queue).
+    None is the close marker: always queued, never dropped.
+    """
+    __slots__ = ("maxlen", "policy", "key", "on_full", "on_space", "on_drop", "_q", "_waiter", "_blocked",
+                 "_closed", "put_count", "dropped", "conflated", "blocked", "high_water")
+
+    def __init__(self, maxlen: int = SUB_QUEUE["maxlen"], policy: str = SUB_QUEUE["policy"], key=tick_key,
+                 on_full=None, on_space=None, on_drop=None):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown queue policy '{policy}', expected one of {POLICIES}")
+        self.maxlen = maxlen
+        self.policy = policy
+        self.key = key
+        self.on_full = on_full
+        self.on_space = on_space
+        self.on_drop = on_drop
+        self._q = {} if policy == CONFLATE else deque()
+        self._waiter = None
+        self._blocked = False
+        self._closed = False
+        self.put_count = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.blocked = 0
+        self.high_water = 0
+
+    def __len__(self) -> int:
+        return len(self._q)
+
+    def put_nowait(self, item) -> None:
+        if item is None:
+            self._closed = True
+        else:
+            self.put_count += 1
+            q = self._q
+            if self.policy == CONFLATE:
+                k = self.key(item)
+                if k in q:
+                    self.conflated += 1
+                elif len(q) >= self.maxlen:
+                    del q[next(iter(q))]
+                    self.dropped += 1
+                    if self.on_drop is not None:
+                        self.on_drop()
+                q[k] = item
+            else:
+                if len(q) >= self.maxlen:
+                    if self.policy == DROP_OLDEST:
+                        q.popleft()
+                        self.dropped += 1
+                        if self.on_drop is not None:
+                            self.on_drop()
+                    else:
+                        if not self._blocked:
+                            self._blocked = True
+                            self.blocked += 1
+                        # every put while full: a reconnect brings a fresh, unpaused transport
+                        if self.on_full is not None:
+                            self.on_full()
+                q.append(item)
+            if len(q) > self.high_water:
+                self.high_water = len(q)
+        w = self._waiter
+        if w is not None:
+            self._waiter = None
+            if not w.done():
+                w.set_result(None)
+
+    def get_nowait(self):
+        """Oldest item (conflate: oldest key's latest value); None once closed and empty"""
+        q = self._q
+        if not q:
+            if self._closed:
+                return None
+            raise asyncio.QueueEmpty
+        if self.policy == CONFLATE:
+            item = q.pop(next(iter(q)))
+        else:
+            item = q.popleft()
+        if self._blocked and len(q) <= self.maxlen // 2:
+            self._blocked = False
+            if self.on_space is not None:
+                self.on_space()
+        return item
+
+    async def get(self):
+        while not self._q and not self._closed:
+            w = self._waiter = asyncio.get_running_loop().create_future()
+            await w
+        return self.get_nowait()
+
+    def drain(self) -> list:
+        """Everything queued, oldest first"""
+        out = []
+        while self._q:
+            out.append(self.get_nowait())
+        return out
+
+    @property
+    def stats(self) -> dict:
+        return {"policy": self.policy, "len": len(self._q), "maxlen": self.maxlen, "put": self.put_count,
+                "dropped": self.dropped, "conflated": self.conflated, "blocked": self.blocked,
+                "high_water": self.high_water}
+
+
+__all__ = [
+    "BLOCK",
+    "DROP_OLDEST",
+    "CONFLATE",
+    "tick_key",
+    "SubQueue",
+]
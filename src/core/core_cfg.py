@@ -20,8 +20,106 @@ IBKR_MAX_CLIENT_VERSION: int = 178
 # Connection defaults
 DEFAULT_CONNECT_TIMEOUT_SEC: int = 10
 MAX_FRAME_SIZE: int = 16 * 1024 * 1024  # 16 MiB hard ceiling to avoid bad frames
+RECV_CHUNK_SIZE: int = 64 * 1024  # one read pulls many frames into the framing buffer
+WRITE_BUF_SIZE: int = 64 * 1024  # outbound cork buffer, grows on demand
+WRITE_HIGH_WATER: int = 1024 * 1024  # flush / back-pressure threshold for the transport
+BATCH_MIN_BYTES: int = 16 * 1024  # frame batches this large are split with numpy (core_vec)
 
-INFO_ERROR_CODES = {2104, 2107, 2158}
+# Client-side pacing (core_pace): IB limits, enforced before frames leave
+PACING: Final[dict] = {
+    "msg_per_sec": 50,       # per connection
+    "gw_msg_per_sec": 50,    # shared by all connections to one gateway
+    "hst_per_window": 60,    # historical requests per gateway...
+    "hst_window_sec": 600,   # ...per 10 minutes
+    "mkt_lines": 100,        # concurrent market-data lines per gateway
+}
+
+# Wire capture (core_cap): file write buffer, frames hit the disk in large writes
+CAPTURE_BUF_SIZE: int = 1024 * 1024
+
+# Reconnect supervisor (core_sup): full-jitter exponential backoff, first retry immediate
+RECONNECT: Final[dict] = {
+    "base_sec": 0.05,
+    "cap_sec": 30.0,
+    "max_attempts": 0,                # 0 = retry until close_async()
+}
+
+# reqId allocation (core_rid): each connection owns [clientId * window, (clientId + 1) * window)
+REQ_IDS: Final[dict] = {
+    "window": 100_000,                # 5999 * 100_000 + window stays below 2**31
+}
+
+# Per-subscription buffers (core_bq): bounded, so a slow consumer can't grow the feed process
+SUB_QUEUE: Final[dict] = {
+    "maxlen": 10_000,                 # items per subscription
+    "policy": "drop_oldest",          # block | drop_oldest | conflate
+    # stream_mkt_data record buffers per reqId: greeks keep the latest per tickType
+    "records": {"bar": "drop_oldest", "opt": "conflate", "trd": "drop_oldest"},
+}
+
+# Multi-process market data (mkt_shard): worker processes on 'mkt' slots, ticks out through core_shm rings
+SHARD: Final[dict] = {
+    "workers": 2,                     # one process + one client id each
+    "first_slot": 1,                  # worker k uses mkt slot first_slot + k
+    "ring_records": 1 << 16,          # records per worker ring (80 bytes each)
+    "start_method": "spawn",          # fresh interpreter: no inherited sockets, loop or signal handlers
+    "ready_timeout_sec": 15.0,        # worker connect + handshake
+}
+
+# Bounded in-flight request pipeline (core_pipe): answers outstanding per connection
+PIPELINE: Final[dict] = {
+    "window": 32,                     # reqContractDetails in flight per connection; pacing still applies
+}
+
+# Metrics (core_met): counters always on; decode timing adds two clock reads per dispatched frame
+METRICS: Final[dict] = {
+    "host": "127.0.0.1",              # serve_metrics: local only
+    "port": 9464,
+    "decode_timing": True,
+    "latency_buckets": (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+}
+
+# Latency probe (core_lat): reqCurrentTime heartbeat per connection
+LATENCY: Final[dict] = {
+    "interval_sec": 1.0,
+    "timeout_sec": 2.0,
+    "slow_p99_ms": 250.0,   # TwsPool routes away above this
+    "min_samples": 10,
+    "window_samples": 60,   # slow flag: p99 over the last 1-2 windows of probes, not the whole life
+}
+
+# Wire tracing (core_trc): 0 off, 1 ring buffer only, 2 ring + stdout hex
+TRACE_LEVEL: int = 1
+TRACE_RING_SIZE: int = 4096  # most recent raw frames kept for dumps
+
+INFO_ERROR_CODES = {2104, 2107, 2158, 10167}
+# Warnings (21xx) never fail a request either: counted by Tws, not routed (core_err.is_info)
+INFO_ERROR_RANGE = (2100, 2200)
+# Codes that mean "no result" rather than failure: the request ends empty
+NO_RESULT_CODES = {200}   # No security definition has been found for the request
+
+# ---- Inbound tag → NUL-field index of reqId (used by the single reader to route) ----
+# Tags not listed here carry no reqId (currentTime, managedAccounts, nextValidId...)
+# and fall through to the connection's unrouted stream.
+REQ_ID_FIELD: Final[dict[bytes, int]] = {
+    b"1": 2,    # tickPrice (version, reqId)
+    b"2": 2,    # tickSize
+    b"4": 2,    # errMsg (version, reqId, code, text)
+    b"10": 1,   # contractDetails
+    b"17": 1,   # historicalData
+    b"18": 1,   # historicalDataEnd
+    b"21": 1,   # tickOptionComputation
+    b"45": 2,   # tickGeneric
+    b"46": 2,   # tickString
+    b"50": 2,   # realtimeBar
+    b"52": 2,   # contractDataEnd (version, reqId)
+    b"57": 2,   # tickSnapshotEnd
+    b"58": 2,   # marketDataType
+    b"75": 1,   # securityDefinitionOptionParameter
+    b"76": 1,   # securityDefinitionOptionParameterEnd
+    b"81": 1,   # tickReqParams
+    b"88": 1,   # headTimestamp
+}
 
 # ---- Business → clientId ranges (inclusive) ----
 BUSINESS_RANGES: Final[dict[str, tuple[int, int]]] = {
@@ -80,6 +178,7 @@ CORE_CFG: Final[dict] = {
         178: {  # stable as of Sep 2025
             # ---------- CTS ----------
             "contractDetails": {
+                "tag": b"10",
                 # NUL-field indices *within* the contractDetails payload.
                 # (Used where you already rely on fixed indices.)
                 "reqId": 1,
@@ -93,6 +192,9 @@ CORE_CFG: Final[dict] = {
             # - then walk the payload and extract these fields, in order,
             #   decoding strikes/expirations sets per your reader.
             "secDefOptParams": {
+                "tag": b"75",
+                # fixed fields; expirations/strikes follow as count-prefixed lists
+                "at": {"reqId": 1, "exchange": 2, "underlyingConId": 3, "tradingClass": 4, "multiplier": 5},
                 "fields": [
                     "reqId",
                     "exchange",
@@ -121,6 +223,10 @@ CORE_CFG: Final[dict] = {
                 # Scanner should react only to these tickTypes and then extract the full set you care about.
                 # Field names below are the canonical IB wrapper names; keep them in this order.
                 "tickOptionComputation": {
+                    "tag": b"21",
+                    # tag, reqId, tickType, tickAttrib, then the fields below
+                    "at": {"impliedVol": 4, "delta": 5, "optPrice": 6, "pvDividend": 7,
+                           "gamma": 8, "vega": 9, "theta": 10, "underPrice": 11},
                     "tickTypes": {
                         "bid":   10,
                         "ask":   11,
@@ -144,6 +250,10 @@ CORE_CFG: Final[dict] = {
             # - match the message by tag (e.g., orderStatus),
             # - read these fields in order from the payload.
             "orderStatus": {
+                "tag": b"3",
+                # orderRef / totalQuantity / limitPrice are not on the orderStatus wire
+                # message (they come with openOrder) and have no index here.
+                "at": {"clientId": 9, "filled": 3, "remaining": 4, "avgFillPrice": 5, "orderStatus": 2},
                 "fields": [
                     "clientId",
                     "orderRef",
@@ -179,10 +289,28 @@ __all__ = [
     "IBKR_MAX_CLIENT_VERSION",
     "DEFAULT_CONNECT_TIMEOUT_SEC",
     "MAX_FRAME_SIZE",
+    "RECV_CHUNK_SIZE",
+    "WRITE_BUF_SIZE",
+    "WRITE_HIGH_WATER",
+    "BATCH_MIN_BYTES",
+    "PACING",
+    "CAPTURE_BUF_SIZE",
+    "RECONNECT",
+    "REQ_IDS",
+    "SUB_QUEUE",
+    "SHARD",
+    "METRICS",
+    "PIPELINE",
+    "LATENCY",
+    "TRACE_LEVEL",
+    "TRACE_RING_SIZE",
     "BUSINESS_RANGES",
     "ClientIdError",
     "client_id",
     "CORE_CFG",
     "get_layout",
     "INFO_ERROR_CODES",
+    "INFO_ERROR_RANGE",
+    "NO_RESULT_CODES",
+    "REQ_ID_FIELD",
 ]
\ No newline at end of file
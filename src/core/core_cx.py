@@ -0,0 +1,142 @@
+# core_cx.py — BufferedProtocol transport: recv straight into the framing buffer
+import asyncio
+
+from core.core_cfg import RECV_CHUNK_SIZE, WRITE_HIGH_WATER
+from core.core_frm import FrameBuffer, FrameError
+from core.core_trc import TRC
+from core.core_vec import FrameBatch
+
+
+class Cx(asyncio.BufferedProtocol):
+    """
+    Lean TCP connection for the IB wire.
+    The event loop writes socket bytes directly into a preallocated FrameBuffer
+    (get_buffer / buffer_updated); complete frames are parsed in place and handed
+    to on_frame(memoryview) synchronously — no per-chunk queue, no extra task.
+    on_frame must copy what it keeps: the view is reused by the next read.
+    With on_batch set, every read is handed over as one FrameBatch instead
+    (vectorized split once BATCH_MIN_BYTES or more are buffered).
+    """
+    __slots__ = ("_transport", "_rx", "_on_frame", "_on_lost", "on_batch",
+                 "_bytes_sent", "_msgs_sent", "_bytes_recv", "_msgs_recv",
+                 "_paused", "_drain_waiter")
+
+    def __init__(self, on_frame, on_lost=None, on_batch=None):
+        self._transport = None
+        self._rx = FrameBuffer()
+        self._on_frame = on_frame
+        self._on_lost = on_lost
+        self.on_batch = on_batch
+        self._bytes_sent = 0
+        self._msgs_sent = 0
+        self._bytes_recv = 0
+        self._msgs_recv = 0
+        self._paused = False
+        self._drain_waiter = None
+
+    async def connect(self, host: str, port: int):
+        loop = asyncio.get_running_loop()
+        await loop.create_connection(lambda: self, host, port)
+
+    def disconnect(self):
+        t = self._transport
+        if t is not None:
+            t.close()
+            self._transport = None
+
+    def pause_reading(self):
+        """Stop reading the socket (TCP back-pressure on the peer) until resume_reading()"""
+        t = self._transport
+        if t is not None and t.is_reading():
+            t.pause_reading()
+
+    def resume_reading(self):
+        t = self._transport
+        if t is not None and not t.is_reading():
+            t.resume_reading()
+
+    def is_connected(self) -> bool:
+        return self._transport is not None
+
+    def send(self, data):
+        t = self._transport
+        if t is None:
+            raise ConnectionError("Not connected")
+        t.write(data)
+        self._bytes_sent += len(data)
+        self._msgs_sent += 1
+
+    async def drain(self):
+        """Wait only while the transport has paused us (write buffer above high-water)"""
+        if not self._paused:
+            return
+        waiter = self._drain_waiter
+        if waiter is None:
+            waiter = self._drain_waiter = asyncio.get_running_loop().create_future()
+        await waiter
+
+    # asyncio.BufferedProtocol
+    def connection_made(self, transport):
+        self._transport = transport
+        transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+
+    def get_buffer(self, sizehint):
+        return self._rx.writable(sizehint if sizehint > RECV_CHUNK_SIZE else RECV_CHUNK_SIZE)
+
+    def buffer_updated(self, nbytes):
+        rx = self._rx
+        rx.advance(nbytes)
+        self._bytes_recv += nbytes
+        on_frame = self._on_frame
+        try:
+            if self.on_batch is not None:
+                batch = FrameBatch.from_buffer(rx)
+                if batch is not None:
+                    self._msgs_recv += len(batch)
+                    self.on_batch(batch)
+                return
+            for mv in rx.frames():
+                self._msgs_recv += 1
+                on_frame(mv)
+        except FrameError as e:
+            print(f"Cx: {e}, closing")
+            TRC.dump(last=64)
+            self.disconnect()
+
+    def eof_received(self):
+        return False  # let the transport close itself
+
+    def pause_writing(self):
+        self._paused = True
+
+    def resume_writing(self):
+        self._paused = False
+        waiter = self._drain_waiter
+        if waiter is not None:
+            self._drain_waiter = None
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def connection_lost(self, exc):
+        self._transport = None
+        waiter = self._drain_waiter
+        if waiter is not None:
+            self._drain_waiter = None
+            if not waiter.done():
+                waiter.set_exception(ConnectionError("Connection lost"))
+        cb = self._on_lost
+        if cb:
+            cb(exc)
+
+    @property
+    def stats(self):
+        return {
+            "bytes_sent": self._bytes_sent,
+            "msgs_sent": self._msgs_sent,
+            "bytes_recv": self._bytes_recv,
+            "msgs_recv": self._msgs_recv,
+            "connected": self.is_connected(),
+        }
+
+
+__all__ = ["Cx"]
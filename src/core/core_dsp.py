@@ -0,0 +1,67 @@
+# core_dsp.py — tag dispatch: raw tag bytes -> handler, frames nobody handles dropped undecoded
+from time import perf_counter_ns
+from typing import Callable, Dict, Optional
+
+from core.core_fv import FrameView
+from core.core_met import MET
+
+Handler = Callable[[FrameView, object], Optional[bool]]
+
+
+class Dispatcher:
+    """
+    Replaces if/elif chains over decoded tags. dispatch(frame, ctx) slices the
+    tag (one find), looks it up, and only then hands the handler a FrameView
+    of the frame plus the caller's ctx (per-request state, so one Dispatcher
+    can be built at import and shared). A handler returns True to end the
+    caller's loop. Unregistered tags are counted and dropped without decoding.
+    The FrameView is reused per frame: handlers must not keep it.
+    Handler time per tag goes to core_met.MET while MET.timing is on.
+    """
+    __slots__ = ("_handlers", "_fv", "handled", "dropped")
+
+    def __init__(self, handlers: Dict[bytes, Handler] = None):
+        self._handlers = dict(handlers or ())
+        self._fv = FrameView()
+        self.handled = 0
+        self.dropped = 0
+
+    def on(self, tag: bytes, fn: Handler = None):
+        """Register fn for tag; usable as a decorator when fn is omitted"""
+        if fn is None:
+            return lambda f: self.on(tag, f)
+        self._handlers[tag] = fn
+        return fn
+
+    def off(self, tag: bytes) -> None:
+        self._handlers.pop(tag, None)
+
+    def __contains__(self, tag: bytes) -> bool:
+        return tag in self._handlers
+
+    def dispatch(self, frame, ctx=None):
+        """Handler result for frame (None when dropped)"""
+        end = frame.find(b"\x00")
+        tag = frame[:end] if end >= 0 else frame
+        fn = self._handlers.get(tag)
+        if fn is None:
+            self.dropped += 1
+            return None
+        self.handled += 1
+        if MET.timing:
+            t = perf_counter_ns()
+            r = fn(self._fv.reset(frame), ctx)
+            MET.decode(tag, perf_counter_ns() - t)
+            return r
+        return fn(self._fv.reset(frame), ctx)
+
+
+def stop(fv: FrameView, ctx) -> bool:
+    """Handler for terminal tags (…End messages): end the loop"""
+    return True
+
+
+__all__ = [
+    "Dispatcher",
+    "stop",
+]
@@ -0,0 +1,79 @@
+# core_err.py — error frames (tag 4): reqId and code as ints, informational vs request-fatal
+from core.core_cfg import INFO_ERROR_CODES, INFO_ERROR_RANGE, NO_RESULT_CODES
+
+_INFO_LO, _INFO_HI = INFO_ERROR_RANGE
+
+
+def _skip(frame, p: int, n: int) -> int:
+    """Start of the field n fields after the one starting at p (0 if the frame ends first)"""
+    for _ in range(n):
+        p = frame.find(b"\x00", p) + 1
+        if not p:
+            return 0
+    return p
+
+
+def _int_at(frame, p: int) -> int:
+    q = frame.find(b"\x00", p)
+    if q < 0:
+        q = len(frame)
+    return int(frame[p:q]) if q > p else -1
+
+
+def error_code(frame, start: int = 0) -> int:
+    """Code of an error frame (4, version, reqId, code, text), -1 if missing; the text is never decoded"""
+    p = _skip(frame, start, 3)
+    return _int_at(frame, p) if p else -1
+
+
+def parse_error(frame, start: int = 0):
+    """(reqId, code) of an error frame as ints (-1 where missing)"""
+    p = _skip(frame, start, 2)
+    if not p:
+        return -1, -1
+    q = _skip(frame, p, 1)
+    return _int_at(frame, p), (_int_at(frame, q) if q else -1)
+
+
+def is_info(code: int) -> bool:
+    """Informational / warning codes: farm status, delayed data notices… never fail a request"""
+    return code in INFO_ERROR_CODES or _INFO_LO <= code < _INFO_HI
+
+
+class RequestError(Exception):
+    """A request the gateway rejected; the text is decoded only when the error is shown"""
+    __slots__ = ("req_id", "code", "frame")
+    def __init__(self, req_id: int, code: int, frame: bytes) -> None:
+        self.req_id = req_id
+        self.code = code
+        self.frame = frame
+    @property
+    def message(self) -> str:
+        f = self.frame.split(b"\x00")
+        return f[4].decode("utf-8", "replace") if len(f) > 4 else ""
+    def __str__(self) -> str:
+        return f"reqId {self.req_id}: error {self.code} {self.message}"
+
+
+def on_request_error(fv, ctx):
+    """
+    Dispatcher handler for b'4' in request collectors: a 'no result' code
+    (NO_RESULT_CODES) ends the loop with whatever was collected, any other
+    code raises RequestError at once instead of leaving the caller waiting.
+    Informational codes never reach collectors (Tws counts and drops them).
+    """
+    code = fv.int_field(3, -1) if fv.has(3) else -1
+    if code in NO_RESULT_CODES:
+        return True
+    if is_info(code):
+        return None
+    raise RequestError(fv.int_field(2, -1), code, bytes(fv))
+
+
+__all__ = [
+    "error_code",
+    "parse_error",
+    "is_info",
+    "RequestError",
+    "on_request_error",
+]
@@ -0,0 +1,156 @@
+# core_frm.py — length-prefixed framing engine (shared by Tws / AsyncTws / SyncTws)
+import struct
+from typing import Iterator, Optional
+
+from core.core_cfg import MAX_FRAME_SIZE, RECV_CHUNK_SIZE
+
+_LEN = struct.Struct(">I")
+
+
+class FrameError(Exception):
+    __slots__ = ("message",)
+    def __init__(self, message: str) -> None:
+        self.message = message
+    def __str__(self) -> str:
+        return self.message
+
+
+class FrameBuffer:
+    """
+    Reusable receive buffer for IB wire frames (4-byte big-endian length + payload).
+    Bytes are appended in large chunks (feed / recv_into) and complete frames are
+    handed out as memoryview slices of the buffer: a frame is never returned short.
+    Slices stay valid until the next feed()/writable() call — copy what you keep.
+    """
+    __slots__ = ("_buf", "_view", "_start", "_end", "_need", "max_frame")
+
+    def __init__(self, size: int = RECV_CHUNK_SIZE * 4, max_frame: int = MAX_FRAME_SIZE):
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+        self._need = 0
+        self.max_frame = max_frame
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def _reserve(self, n: int) -> None:
+        """Make room for n more bytes: compact in place, grow only if a frame needs it"""
+        if len(self._buf) - self._end >= n:
+            return
+        pending = self._end - self._start
+        if pending + n <= len(self._buf):
+            # memoryview assignment memmoves overlapping ranges; no resize, views stay valid
+            self._view[:pending] = self._view[self._start:self._end]
+        else:
+            buf = bytearray(max(pending + n, len(self._buf) * 2))
+            buf[:pending] = self._view[self._start:self._end]
+            self._buf = buf
+            self._view = memoryview(buf)
+        self._start = 0
+        self._end = pending
+
+    def writable(self, n: int = RECV_CHUNK_SIZE) -> memoryview:
+        """Free tail of the buffer for sock.recv_into / BufferedProtocol.get_buffer"""
+        self._reserve(n if n > self._need else self._need)
+        return self._view[self._end:]
+
+    def advance(self, n: int) -> None:
+        """Commit n bytes written into writable()"""
+        self._end += n
+
+    def feed(self, data) -> None:
+        n = len(data)
+        self._reserve(n)
+        self._buf[self._end:self._end + n] = data
+        self._end += n
+
+    def next_frame(self) -> Optional[memoryview]:
+        """Pop one complete frame payload, or None if more bytes are needed"""
+        start = self._start
+        avail = self._end - start
+        if avail < 4:
+            return None
+        length = int.from_bytes(self._view[start:start + 4], "big")
+        if length > self.max_frame:
+            raise FrameError(f"frame of {length} bytes exceeds MAX_FRAME_SIZE={self.max_frame}")
+        if avail - 4 < length:
+            # the next writable() makes room for the rest of this frame in one go
+            self._need = length + 4 - avail
+            return None
+        self._need = 0
+        self._start = start + 4 + length
+        if self._start == self._end:
+            self._start = self._end = 0
+        return self._view[start + 4:start + 4 + length]
+
+    def take_run(self):
+        """
+        Copy out every complete frame in one slice: (bytes, [payload offsets]).
+        Headers stay in the copy (payload i ends 4 bytes before offset i + 1).
+        Only the 4-byte lengths are walked here; splitting is left to the caller.
+        """
+        buf = self._buf
+        start = self._start
+        end = self._end
+        offs = []
+        add = offs.append
+        unpack = _LEN.unpack_from
+        p = start
+        while end - p >= 4:
+            length = unpack(buf, p)[0]
+            if length > self.max_frame:
+                raise FrameError(f"frame of {length} bytes exceeds MAX_FRAME_SIZE={self.max_frame}")
+            if end - p - 4 < length:
+                self._need = length + 4 - (end - p)
+                break
+            add(p + 4 - start)
+            p += 4 + length
+        else:
+            self._need = 0
+        data = bytes(self._view[start:p])
+        self._start = p
+        if p == end:
+            self._start = self._end = 0
+        return data, offs
+
+    def frames(self) -> Iterator[memoryview]:
+        """Yield every complete frame currently buffered"""
+        nxt = self.next_frame
+        mv = nxt()
+        while mv is not None:
+            yield mv
+            mv = nxt()
+
+
+async def read_frame_async(reader, fb: FrameBuffer) -> Optional[bytes]:
+    """Exact-length frame from an asyncio StreamReader, one chunked read per batch"""
+    mv = fb.next_frame()
+    while mv is None:
+        data = await reader.read(RECV_CHUNK_SIZE)
+        if not data:
+            return None
+        fb.feed(data)
+        mv = fb.next_frame()
+    return bytes(mv)
+
+
+def read_frame(sock, fb: FrameBuffer) -> Optional[bytes]:
+    """Exact-length frame from a blocking socket, received straight into the buffer"""
+    mv = fb.next_frame()
+    while mv is None:
+        n = sock.recv_into(fb.writable())
+        if not n:
+            return None
+        fb.advance(n)
+        mv = fb.next_frame()
+    return bytes(mv)
+
+
+__all__ = [
+    "FrameError",
+    "FrameBuffer",
+    "read_frame_async",
+    "read_frame",
+]
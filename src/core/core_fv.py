@@ -0,0 +1,92 @@
+# core_fv.py — FrameView: lazy NUL-offset index over one frame, typed field access
+class FrameView:
+    """
+    Read-only view of one NUL-separated payload (bytes or a bytearray window).
+    NUL offsets are found on first access and only as far as the highest field
+    asked for, then kept: field(i) after that is a lookup plus one slice.
+    int_field / float_field parse straight from the bytes slice (no str).
+    One FrameView can be reset() per frame, so a decode loop allocates no views.
+    """
+    __slots__ = ("data", "start", "end", "_ends")
+
+    def __init__(self, data=b"", start: int = 0, end: int = None):
+        self.reset(data, start, end)
+
+    def reset(self, data, start: int = 0, end: int = None) -> "FrameView":
+        self.data = data
+        self.start = start
+        self.end = len(data) if end is None else end
+        self._ends = []
+        return self
+
+    def _scan(self, i: int) -> bool:
+        """Extend the offset index to field i; False if the payload has fewer fields"""
+        ends = self._ends
+        find = self.data.find
+        add = ends.append
+        end = self.end
+        p = ends[-1] if ends else self.start - 1
+        for _ in range(i + 1 - len(ends)):
+            p = find(b"\x00", p + 1, end)
+            if p < 0:
+                return False
+            add(p)
+        return True
+
+    def _bounds(self, i: int):
+        ends = self._ends
+        if len(ends) <= i and not self._scan(i):
+            raise IndexError(f"field {i} beyond frame ({len(ends)} fields)")
+        return (ends[i - 1] + 1 if i else self.start), ends[i]
+
+    @property
+    def tag(self) -> bytes:
+        return self.field(0)
+
+    def field(self, i: int) -> bytes:
+        a, b = self._bounds(i)
+        return self.data[a:b]
+
+    def field_z(self, i: int) -> bytes:
+        """Field with its NUL terminator (the shape cts/hst chunk code works with)"""
+        a, b = self._bounds(i)
+        return self.data[a:b + 1]
+
+    def field_view(self, i: int) -> memoryview:
+        """Zero-copy slice of field i"""
+        a, b = self._bounds(i)
+        return memoryview(self.data)[a:b]
+
+    def str_field(self, i: int) -> str:
+        a, b = self._bounds(i)
+        return self.data[a:b].decode("ascii", "replace")
+
+    def int_field(self, i: int, default=None):
+        a, b = self._bounds(i)
+        return int(self.data[a:b]) if b > a else default
+
+    def float_field(self, i: int, default=None):
+        a, b = self._bounds(i)
+        return float(self.data[a:b]) if b > a else default
+
+    def has(self, i: int) -> bool:
+        return len(self._ends) > i or self._scan(i)
+
+    def is_tag(self, tag: bytes) -> bool:
+        """Prefix test on the raw payload, no index needed"""
+        n = len(tag)
+        d = self.data
+        s = self.start
+        return d[s:s + n] == tag and self.end > s + n and d[s + n] == 0
+
+    def __len__(self) -> int:
+        """Number of NUL-terminated fields (indexes the whole frame)"""
+        while self._scan(len(self._ends)):
+            pass
+        return len(self._ends)
+
+    def __bytes__(self) -> bytes:
+        return bytes(self.data[self.start:self.end])
+
+
+__all__ = ["FrameView"]
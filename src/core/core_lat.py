@@ -0,0 +1,260 @@
+# core_lat.py — gateway latency probe: reqCurrentTime heartbeat, RTT histogram, clock offset
+import asyncio
+import time
+
+from core.core_cfg import LATENCY
+
+TAG_CURRENT_TIME = b"49"
+
+
+class RttHistogram:
+    """
+    HDR-style log-linear histogram of integer microseconds.
+    Values below 2**bits are exact; above, each power of two is split into
+    2**(bits-1) equal buckets, so the relative error stays under 2**-(bits-1)
+    (~3% with bits=6) at any magnitude. record() is a bit_length and an index.
+    """
+    __slots__ = ("bits", "sub", "half", "counts", "count", "total", "min", "max")
+
+    def __init__(self, bits: int = 6, max_exp: int = 40):
+        self.bits = bits
+        self.sub = 1 << bits
+        self.half = self.sub >> 1
+        self.counts = [0] * (self.sub + max_exp * self.half)
+        self.reset()
+
+    def reset(self) -> None:
+        self.counts[:] = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, v: int) -> int:
+        if v < self.sub:
+            return v
+        e = v.bit_length() - self.bits
+        i = self.sub + (e - 1) * self.half + (v >> e) - self.half
+        last = len(self.counts) - 1
+        return i if i < last else last
+
+    def _value(self, i: int) -> float:
+        """Midpoint of bucket i"""
+        if i < self.sub:
+            return float(i)
+        k = i - self.sub
+        e = k // self.half + 1
+        m = k % self.half + self.half
+        return (m << e) + (1 << e) / 2
+
+    def record(self, us: int) -> None:
+        if us < 0:
+            us = 0
+        self.counts[self._index(us)] += 1
+        self.count += 1
+        self.total += us
+        if self.min is None or us < self.min:
+            self.min = us
+        if us > self.max:
+            self.max = us
+
+    def add(self, other: "RttHistogram") -> None:
+        """Merge another histogram of the same shape into this one"""
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max > self.max:
+            self.max = other.max
+
+    def percentile(self, p: float) -> float:
+        """Value (µs) at percentile p in [0, 100]; 0.0 when empty"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(p / 100.0 * self.count + 0.5))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c:
+                seen += c
+                if seen >= rank:
+                    v = self._value(i)
+                    return float(min(max(v, self.min), self.max))
+        return float(self.max)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> dict:
+        """Milliseconds, as shown in stats and used by the pool"""
+        return {
+            "count": self.count,
+            "min_ms": (self.min or 0) / 1000,
+            "p50_ms": self.percentile(50) / 1000,
+            "p90_ms": self.percentile(90) / 1000,
+            "p99_ms": self.percentile(99) / 1000,
+            "max_ms": self.max / 1000,
+            "mean_ms": self.mean / 1000,
+        }
+
+
+class ClockOffset:
+    """
+    Server time in reqCurrentTime is whole seconds, so one sample only says
+    server_now - local_now lies in [s - t_recv, s + 1 - t_send]. Intersecting
+    the intervals of successive samples narrows the estimate well below one
+    second; an empty intersection (clock step / drift) restarts from the sample.
+    """
+    __slots__ = ("lo", "hi", "samples")
+
+    def __init__(self):
+        self.lo = None
+        self.hi = None
+        self.samples = 0
+
+    def update(self, server_sec: int, t_send: float, t_recv: float) -> None:
+        lo = server_sec - t_recv
+        hi = server_sec + 1 - t_send
+        if self.lo is not None:
+            nlo = lo if lo > self.lo else self.lo
+            nhi = hi if hi < self.hi else self.hi
+            if nlo <= nhi:
+                lo, hi = nlo, nhi
+        self.lo, self.hi = lo, hi
+        self.samples += 1
+
+    @property
+    def offset(self):
+        """Seconds to add to local wall time to get server time (None before any sample)"""
+        if self.lo is None:
+            return None
+        return (self.lo + self.hi) / 2
+
+    @property
+    def error(self):
+        if self.lo is None:
+            return None
+        return (self.hi - self.lo) / 2
+
+
+class LatencyProbe:
+    """
+    Background heartbeat on one Tws: every interval, send reqCurrentTime (49)
+    and time the reply. RTTs go into an RttHistogram, server time into a
+    ClockOffset. One probe in flight at a time, so the untagged reply is ours.
+    slow is set when p99 over the recent samples exceeds slow_p99_ms; TwsPool
+    routes away from slow connections. Recent means the current and the previous
+    window of window_samples probes (rotated), so an old slow spell ages out and
+    a new one shows within one window; hist keeps the lifetime distribution.
+    """
+
+    def __init__(self, tws, cfg: dict = LATENCY):
+        self.tws = tws
+        self.interval = cfg["interval_sec"]
+        self.timeout = cfg["timeout_sec"]
+        self.slow_p99_ms = cfg["slow_p99_ms"]
+        self.min_samples = cfg["min_samples"]
+        self.window = cfg["window_samples"]
+        self.hist = RttHistogram()
+        self._cur = RttHistogram()
+        self._prev = RttHistogram()
+        self._recent_n = 0
+        self._recent_p99_ms = 0.0
+        self.clock = ClockOffset()
+        self.timeouts = 0
+        self.last_ms = None
+        self._reply = None
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self.tws.on_tag[TAG_CURRENT_TIME] = self._on_reply
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.tws.on_tag.get(TAG_CURRENT_TIME) == self._on_reply:
+            del self.tws.on_tag[TAG_CURRENT_TIME]
+
+    def _on_reply(self, frame):
+        fut = self._reply
+        if fut is not None and not fut.done():
+            fut.set_result((time.perf_counter(), time.time(), frame))
+
+    async def once(self):
+        """One probe; returns the RTT in ms (None on timeout or while disconnected)"""
+        tws = self.tws
+        if tws.cx is None or not tws.cx.is_connected():
+            return None
+        self._reply = fut = asyncio.get_running_loop().create_future()
+        await tws.pacer.pace()
+        t_send = time.time()
+        t0 = time.perf_counter()
+        await tws.send_frame_async(tws.codec.req_current_time(), pace=False)
+        try:
+            t1, t_recv, frame = await asyncio.wait_for(fut, self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return None
+        finally:
+            self._reply = None
+        us = int((t1 - t0) * 1e6)
+        self.hist.record(us)
+        self._record_recent(us)
+        self.last_ms = us / 1000
+        f = frame.split(b"\x00", 3)
+        if len(f) > 2 and f[2]:
+            self.clock.update(int(f[2]), t_send, t_recv)
+        return self.last_ms
+
+    def _record_recent(self, us: int) -> None:
+        if self._cur.count >= self.window:
+            self._prev, self._cur = self._cur, self._prev
+            self._cur.reset()
+        self._cur.record(us)
+        # slow is read on every TwsPool.pick(): compute the windowed p99 here, once per sample
+        h = RttHistogram()
+        h.add(self._prev)
+        h.add(self._cur)
+        self._recent_n = h.count
+        self._recent_p99_ms = h.percentile(99) / 1000
+
+    async def _run(self):
+        while True:
+            await self.once()
+            await asyncio.sleep(self.interval)
+
+    @property
+    def p99_ms(self) -> float:
+        return self.hist.percentile(99) / 1000
+
+    @property
+    def recent_p99_ms(self) -> float:
+        return self._recent_p99_ms
+
+    @property
+    def slow(self) -> bool:
+        return self._recent_n >= self.min_samples and self._recent_p99_ms > self.slow_p99_ms
+
+    @property
+    def stats(self):
+        s = self.hist.summary()
+        s["last_ms"] = self.last_ms
+        s["recent_p99_ms"] = self._recent_p99_ms
+        s["timeouts"] = self.timeouts
+        s["clock_offset_sec"] = self.clock.offset
+        s["clock_error_sec"] = self.clock.error
+        return s
+
+
+__all__ = [
+    "RttHistogram",
+    "ClockOffset",
+    "LatencyProbe",
+]
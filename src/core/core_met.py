@@ -0,0 +1,208 @@
+# core_met.py — metrics registry: per-connection / per-tag counters, request latency, Prometheus text endpoint
+from bisect import bisect_left
+
+from core.core_cfg import METRICS
+
+# Request tag -> latency series name (requests opened with Tws.open_request)
+REQ_KINDS = {
+    b"9": "contract_details",
+    b"78": "sec_def_opt_params",
+    b"20": "historical_data",
+    b"1": "mkt_data_snapshot",
+    b"49": "current_time",
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram (upper bounds in seconds), Prometheus-style cumulative on render"""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+
+class ConnMetrics:
+    """
+    Counters of one Tws, bumped inline by Tws (plain dict increments keyed by
+    the raw tag bytes, no label formatting on the hot path). Queue depths are
+    read from the Tws itself at render time; queue drops are a running total
+    (SubQueue.on_drop), so closing a subscription never lowers the counter.
+    """
+    __slots__ = ("tws", "frames_in", "bytes_in", "frames_out", "bytes_out", "errors", "queue_dropped")
+
+    def __init__(self, tws):
+        self.tws = tws
+        self.frames_in = {}
+        self.bytes_in = {}
+        self.frames_out = {}
+        self.bytes_out = {}
+        self.errors = {}
+        self.queue_dropped = 0
+
+    def sent(self, payload: bytes) -> None:
+        end = payload.find(b"\x00")
+        tag = payload[:end] if end >= 0 else payload
+        self.frames_out[tag] = self.frames_out.get(tag, 0) + 1
+        self.bytes_out[tag] = self.bytes_out.get(tag, 0) + len(payload) + 4
+
+    def error(self, code: int) -> None:
+        self.errors[code] = self.errors.get(code, 0) + 1
+
+    def dropped(self) -> None:
+        self.queue_dropped += 1
+
+
+def _depth(route) -> int:
+    """Queued items of a route: asyncio.Queue, SubQueue, or 0 for sinks that queue nothing"""
+    qsize = getattr(route, "qsize", None)
+    if qsize is not None:
+        return qsize()
+    return len(route) if hasattr(route, "__len__") else 0
+
+
+class Registry:
+    """
+    Process-wide metrics: one ConnMetrics per live Tws, decode time per tag
+    (Dispatcher, while `timing` is on) and request latency per request kind.
+    render() is the Prometheus text exposition of all of it.
+    """
+    __slots__ = ("conns", "decode_ns", "decode_n", "latency", "timing", "buckets")
+
+    def __init__(self, cfg: dict = METRICS):
+        self.conns = []
+        self.decode_ns = {}
+        self.decode_n = {}
+        self.latency = {}
+        self.timing = cfg["decode_timing"]
+        self.buckets = cfg["latency_buckets"]
+
+    def connection(self, tws) -> ConnMetrics:
+        cm = ConnMetrics(tws)
+        self.conns.append(cm)
+        return cm
+
+    def drop(self, cm: ConnMetrics) -> None:
+        if cm in self.conns:
+            self.conns.remove(cm)
+
+    def decode(self, tag: bytes, ns: int) -> None:
+        self.decode_ns[tag] = self.decode_ns.get(tag, 0) + ns
+        self.decode_n[tag] = self.decode_n.get(tag, 0) + 1
+
+    def observe(self, kind: str, sec: float) -> None:
+        h = self.latency.get(kind)
+        if h is None:
+            h = self.latency[kind] = Histogram(self.buckets)
+        h.observe(sec)
+
+    def reset(self) -> None:
+        self.decode_ns.clear()
+        self.decode_n.clear()
+        self.latency.clear()
+        for cm in self.conns:
+            for d in (cm.frames_in, cm.bytes_in, cm.frames_out, cm.bytes_out, cm.errors):
+                d.clear()
+            cm.queue_dropped = 0
+
+    def render(self) -> str:
+        out = []
+
+        def family(name, kind, help_, rows):
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} {kind}")
+            for labels, v in rows:
+                lbl = ",".join(f'{k}="{x}"' for k, x in labels)
+                out.append(f"{name}{{{lbl}}} {v}" if lbl else f"{name} {v}")
+
+        def per_tag(attr):
+            return [((("cid", cm.tws.client_id), ("tag", t.decode("ascii", "replace"))), n)
+                    for cm in self.conns for t, n in sorted(getattr(cm, attr).items())]
+
+        family("ib_frames_in_total", "counter", "Frames received, by connection and tag", per_tag("frames_in"))
+        family("ib_bytes_in_total", "counter", "Bytes received (with length prefix)", per_tag("bytes_in"))
+        family("ib_frames_out_total", "counter", "Frames sent, by connection and tag", per_tag("frames_out"))
+        family("ib_bytes_out_total", "counter", "Bytes sent (with length prefix)", per_tag("bytes_out"))
+        family("ib_errors_total", "counter", "Error frames (tag 4), by connection and code",
+               [((("cid", cm.tws.client_id), ("code", c)), n) for cm in self.conns for c, n in sorted(cm.errors.items())])
+
+        rows = []
+        for cm in self.conns:
+            t = cm.tws
+            cid = ("cid", t.client_id)
+            routes = t._routes.values()
+            rows.append(((cid, ("queue", "stream")), _depth(t._stream) if t._stream is not None else 0))
+            rows.append(((cid, ("queue", "routes")), sum(map(_depth, routes))))
+        family("ib_queue_depth", "gauge", "Frames waiting for a consumer", rows)
+        family("ib_requests_in_flight", "gauge", "Open requests", [((("cid", cm.tws.client_id),), cm.tws.inflight)
+                                                                   for cm in self.conns])
+        family("ib_subscriptions", "gauge", "Live streaming subscriptions",
+               [((("cid", cm.tws.client_id),), len(cm.tws.subs)) for cm in self.conns])
+        family("ib_sub_queue_dropped_total", "counter",
+               "Items dropped by bounded subscription queues and the unrouted stream",
+               [((("cid", cm.tws.client_id),), cm.queue_dropped) for cm in self.conns])
+        family("ib_reconnects_total", "counter", "Reconnects by the supervisor",
+               [((("cid", cm.tws.client_id),), cm.tws.sup.reconnects) for cm in self.conns if cm.tws.sup is not None])
+
+        family("ib_decode_seconds_total", "counter", "Time in decode handlers, by tag",
+               [((("tag", t.decode("ascii", "replace")),), ns / 1e9) for t, ns in sorted(self.decode_ns.items())])
+        family("ib_decode_frames_total", "counter", "Frames decoded by handlers, by tag",
+               [((("tag", t.decode("ascii", "replace")),), n) for t, n in sorted(self.decode_n.items())])
+
+        out.append("# HELP ib_request_seconds Request latency, open_request to close_request, by kind")
+        out.append("# TYPE ib_request_seconds histogram")
+        for kind, h in sorted(self.latency.items()):
+            acc = 0
+            for le, n in zip(h.bounds + (float("inf"),), h.counts):
+                acc += n
+                le = "+Inf" if le == float("inf") else repr(le)
+                out.append(f'ib_request_seconds_bucket{{kind="{kind}",le="{le}"}} {acc}')
+            out.append(f'ib_request_seconds_sum{{kind="{kind}"}} {h.sum}')
+            out.append(f'ib_request_seconds_count{{kind="{kind}"}} {h.count}')
+        return "\n".join(out) + "\n"
+
+
+MET = Registry()
+
+
+async def serve_metrics(host: str = METRICS["host"], port: int = METRICS["port"], registry: Registry = MET):
+    """Local text endpoint: GET /metrics answers registry.render(). Returns the asyncio server."""
+    import asyncio
+
+    async def handle(reader, writer):
+        try:
+            line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = line.split()
+            if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] in (b"/metrics", b"/"):
+                body = registry.render().encode()
+                head = b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            else:
+                body = b"not found\n"
+                head = b"HTTP/1.0 404 Not Found\r\nContent-Type: text/plain\r\n"
+            writer.write(head + b"Content-Length: %d\r\n\r\n" % len(body) + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"Metrics on http://{host}:{server.sockets[0].getsockname()[1]}/metrics")
+    return server
+
+
+__all__ = [
+    "REQ_KINDS",
+    "Histogram",
+    "ConnMetrics",
+    "Registry",
+    "MET",
+    "serve_metrics",
+]
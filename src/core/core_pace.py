@@ -0,0 +1,178 @@
+# core_pace.py — client-side pacing: message windows per connection and per gateway
+import asyncio
+import time
+from collections import deque
+
+from core.core_cfg import PACING
+
+_now = time.monotonic
+
+
+class SlidingWindow:
+    """
+    At most `limit` takes in any `window` seconds (IB historical pacing rule).
+    Keeps the reserved send times; take() returns the wait for the next free slot.
+    next_free() / reserve() split take() so one send can claim the same slot in
+    several windows.
+    """
+    __slots__ = ("limit", "window", "stamps")
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.stamps = deque()
+
+    @property
+    def tokens(self) -> int:
+        now = _now()
+        return self.limit - sum(1 for t in self.stamps if t > now - self.window)
+
+    def next_free(self, now: float) -> float:
+        """Earliest send time with a free slot (now when the window is not full)"""
+        stamps = self.stamps
+        if len(stamps) < self.limit:
+            return now
+        slot = stamps[0] + self.window
+        return slot if slot > now else now
+
+    def reserve(self, slot: float) -> None:
+        """Record a send at `slot` (a value from next_free, or later)"""
+        stamps = self.stamps
+        if len(stamps) >= self.limit:
+            stamps.popleft()
+        stamps.append(slot)
+
+    def take(self) -> float:
+        now = _now()
+        slot = self.next_free(now)
+        self.reserve(slot)
+        return slot - now
+
+
+class GatewayBudget:
+    """Limits shared by every connection to one gateway (host, port)"""
+    __slots__ = ("msg", "hst", "lines", "lines_max", "line_waiters")
+
+    def __init__(self, cfg: dict = PACING):
+        self.msg = SlidingWindow(cfg["gw_msg_per_sec"], 1.0)
+        self.hst = SlidingWindow(cfg["hst_per_window"], cfg["hst_window_sec"])
+        self.lines = 0
+        self.lines_max = cfg["mkt_lines"]
+        self.line_waiters = []
+
+
+_GATEWAYS = {}
+
+# Gateway-wide limits: what budget_share() divides between processes
+_GATEWAY_LIMITS = ("gw_msg_per_sec", "hst_per_window", "mkt_lines")
+
+
+def gateway_budget(host: str, port: int, cfg: dict = PACING) -> GatewayBudget:
+    """Budget of one gateway in this process; cfg only applies to the first call"""
+    gw = _GATEWAYS.get((host, port))
+    if gw is None:
+        gw = _GATEWAYS[(host, port)] = GatewayBudget(cfg)
+    return gw
+
+
+def budget_share(cfg: dict, parts: int, k: int) -> dict:
+    """
+    Part k of cfg for `parts` processes connected to one gateway: _GATEWAY_LIMITS
+    are divided (remainders to the first parts), per-connection limits are kept.
+    Budgets live per process, so each process must be seeded with its share.
+    """
+    share = dict(cfg)
+    for name in _GATEWAY_LIMITS:
+        q, r = divmod(cfg[name], parts)
+        share[name] = q + (k < r)
+    return share
+
+
+class Pacer:
+    """
+    Every outbound frame of a Tws goes through pace(); historical requests and
+    market-data lines take their own budgets on top. Callers send as fast as the
+    budgets allow instead of sleeping a fixed delay. waited is the wall time
+    during which at least one caller was held back (overlapping waits of
+    concurrent callers count once); max_wait the longest single wait.
+    """
+    __slots__ = ("gw", "msg", "waited", "max_wait", "_until")
+
+    def __init__(self, gw: GatewayBudget, cfg: dict = PACING):
+        self.gw = gw
+        # A sliding window, not a bucket: burst + refill would let 2x the limit through in one second
+        self.msg = SlidingWindow(cfg["msg_per_sec"], 1.0)
+        self.waited = 0.0
+        self.max_wait = 0.0
+        self._until = 0.0
+
+    def _wait(self, now: float, slot: float) -> float:
+        w = slot - now
+        if w > 0:
+            if w > self.max_wait:
+                self.max_wait = w
+            if slot > self._until:
+                self.waited += slot - (now if now > self._until else self._until)
+                self._until = slot
+        return w
+
+    async def pace(self) -> None:
+        # one slot for both windows: the later of the two, reserved in each, so the
+        # connection stamp is the actual send time even when the gateway is the bottleneck
+        now = _now()
+        slot = self.msg.next_free(now)
+        g = self.gw.msg.next_free(now)
+        if g > slot:
+            slot = g
+        self.msg.reserve(slot)
+        self.gw.msg.reserve(slot)
+        w = self._wait(now, slot)
+        if w > 0:
+            await asyncio.sleep(w)
+
+    async def pace_hst(self) -> None:
+        now = _now()
+        slot = self.gw.hst.next_free(now)
+        self.gw.hst.reserve(slot)
+        w = self._wait(now, slot)
+        if w > 0:
+            await asyncio.sleep(w)
+
+    async def acquire_line(self) -> None:
+        """Reserve one concurrent market-data line on the gateway (waits if full)"""
+        gw = self.gw
+        while gw.lines >= gw.lines_max:
+            fut = asyncio.get_running_loop().create_future()
+            gw.line_waiters.append(fut)
+            await fut
+        gw.lines += 1
+
+    def release_line(self) -> None:
+        gw = self.gw
+        if gw.lines > 0:
+            gw.lines -= 1
+        while gw.line_waiters:
+            fut = gw.line_waiters.pop(0)
+            if not fut.done():
+                fut.set_result(None)
+                break
+
+    @property
+    def stats(self):
+        return {
+            "msg_tokens": self.msg.tokens,
+            "gw_msg_tokens": self.gw.msg.tokens,
+            "hst_tokens": self.gw.hst.tokens,
+            "lines": self.gw.lines,
+            "waited_sec": self.waited,
+            "max_wait_sec": self.max_wait,
+        }
+
+
+__all__ = [
+    "SlidingWindow",
+    "GatewayBudget",
+    "gateway_budget",
+    "budget_share",
+    "Pacer",
+]
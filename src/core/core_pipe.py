@@ -0,0 +1,65 @@
+# core_pipe.py — bounded in-flight request pipeline over one or more connections
+import asyncio
+
+from core.core_cfg import PIPELINE
+
+_END = object()
+
+
+async def windowed(conns, items, request, window: int = PIPELINE["window"]):
+    """
+    Run request(tws, item) for every item, keeping at most `window` requests
+    in flight per connection (new ones go to the least-loaded connection), and
+    yield (item, result) in completion order; result is the exception when the
+    request raised. items is consumed lazily, so a generator of millions is
+    fine. Pacing stays with Tws.send_frame_async: the window only bounds how
+    many answers are outstanding. Closing the generator cancels what is left.
+    """
+    conns = list(conns)
+    if not conns:
+        raise ConnectionError("windowed: no connection")
+    it = iter(items)
+    load = {t: 0 for t in conns}
+    running = {}
+
+    def launch():
+        while True:
+            t = min(conns, key=load.__getitem__)
+            if load[t] >= window:
+                return
+            item = next(it, _END)
+            if item is _END:
+                return
+            load[t] += 1
+            running[asyncio.ensure_future(request(t, item))] = (t, item)
+
+    finished = []
+    launch()
+    try:
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for f in done:
+                t, item = running.pop(f)
+                load[t] -= 1
+                finished.append((item, f))
+            # refill before handing results out: the window stays full while the caller works
+            launch()
+            while finished:
+                item, f = finished.pop(0)
+                if f.cancelled():
+                    yield item, asyncio.CancelledError()
+                else:
+                    exc = f.exception()
+                    yield item, (exc if exc is not None else f.result())
+    finally:
+        for f in running:
+            f.cancel()
+        # completed but never handed out (the caller stopped early): retrieve, or asyncio logs them
+        for _, f in finished:
+            if not f.cancelled():
+                f.exception()
+
+
+__all__ = [
+    "windowed",
+]
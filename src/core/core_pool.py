@@ -0,0 +1,79 @@
+# core_pool.py — N connections across gateways × client-id slots, least-loaded routing
+import asyncio
+import signal
+
+from core.Tws import Tws
+
+
+class TwsPool:
+    """
+    One Tws per (gateway port, slot) for a business ('cts', 'mkt', 'hst'...).
+    Client ids come from BUSINESS_RANGES via Tws, so slots must be distinct per
+    gateway. pick() returns the connected Tws with the fewest requests in flight.
+    """
+
+    def __init__(self, business, slots=(1,), ports=(4012,), host="127.0.0.1"):
+        self.business = business
+        self.conns = [Tws(host, port, business, slot) for port in ports for slot in slots]
+        self.live = []
+        # Each Tws installs its own handler; the pool must close all of them
+        signal.signal(signal.SIGINT, self._signal_handler)
+        signal.signal(signal.SIGTERM, self._signal_handler)
+
+    def _signal_handler(self, signum, frame):
+        for t in self.conns:
+            t._cleanup_sync()
+        exit(0)
+
+    async def connect_async(self):
+        """Connect every slot; keep the ones that came up (a gateway may be down)"""
+        res = await asyncio.gather(*(t.connect_async() for t in self.conns), return_exceptions=True)
+        self.live = []
+        for t, r in zip(self.conns, res):
+            if isinstance(r, BaseException):
+                print(f"Pool {self.business}: {t.host}:{t.port} cid {t.client_id} failed: {r}")
+            else:
+                self.live.append(t)
+        if not self.live:
+            raise ConnectionError(f"Pool {self.business}: no gateway reachable")
+        return self
+
+    def start_probes(self):
+        """Latency heartbeat on every live connection; pick() then avoids slow gateways"""
+        for t in self.live:
+            t.start_probe()
+
+    def pick(self):
+        """Least-loaded live connection (in-flight requests + live subscriptions),
+        connections whose probe reports a slow p99 only when nothing else is up"""
+        best = None
+        best_load = None
+        for t in self.live:
+            if not t.cx.is_connected():
+                continue
+            # slow connections rank after every healthy one
+            load = t.load
+            if t.probe is not None and t.probe.slow:
+                load += 1 << 30
+            if best is None or load < best_load:
+                best, best_load = t, load
+                if load == 0:
+                    break
+        if best is None:
+            raise ConnectionError(f"Pool {self.business}: no live connection")
+        return best
+
+    @property
+    def loads(self):
+        return [(t.port, t.client_id, t.load) for t in self.live]
+
+    @property
+    def latencies(self):
+        return [(t.port, t.client_id, t.probe.stats if t.probe is not None else None) for t in self.live]
+
+    async def close_async(self):
+        await asyncio.gather(*(t.close_async() for t in self.live), return_exceptions=True)
+        self.live = []
+
+
+__all__ = ["TwsPool"]
@@ -0,0 +1,116 @@
+# core_rid.py — per-connection reqId allocation and the dense reqId -> route table
+from core.core_cfg import REQ_IDS
+
+
+class ReqIdError(Exception):
+    __slots__ = ("message",)
+    def __init__(self, message: str) -> None:
+        self.message = message
+    def __str__(self) -> str:
+        return self.message
+
+
+class ReqIdAllocator:
+    """
+    Hands out reqIds from one connection's window [base, base + window).
+    Windows are keyed by clientId, so ids never collide across connections,
+    APIs or processes sharing a gateway. The cursor walks the window and wraps;
+    ids still busy (open request or live subscription) are skipped, so a
+    reqId is reused only a full window later. Runs on the event loop thread:
+    alloc() never awaits, so it is atomic with respect to other coroutines.
+    """
+    __slots__ = ("base", "window", "end", "_next", "_busy")
+
+    def __init__(self, base: int, window: int = REQ_IDS["window"], busy=None):
+        self.base = base
+        self.window = window
+        self.end = base + window
+        self._next = base
+        self._busy = busy
+
+    def alloc(self) -> int:
+        busy = self._busy
+        for _ in range(self.window):
+            i = self._next
+            self._next = i + 1 if i + 1 < self.end else self.base
+            if busy is None or not busy(i):
+                return i
+        raise ReqIdError(f"reqId window {self.base}..{self.end - 1} exhausted ({self.window} in use)")
+
+    def owns(self, req_id: int) -> bool:
+        return self.base <= req_id < self.end
+
+
+class RouteTable:
+    """
+    reqId -> route, indexed by offset into the connection's window (a list
+    slot, grown as ids are used) with a dict for ids from outside the window
+    (caller-chosen reqIds). Same get / [] / pop / in / len / values surface as
+    the dict it replaces in Tws; Tws._dispatch reads slots / extra directly
+    to skip the method call on the hot path.
+    """
+    __slots__ = ("base", "window", "slots", "extra", "_n")
+
+    def __init__(self, base: int, window: int = REQ_IDS["window"]):
+        self.base = base
+        self.window = window
+        self.slots = []
+        self.extra = {}
+        self._n = 0
+
+    def get(self, req_id: int, default=None):
+        i = req_id - self.base
+        if 0 <= i < len(self.slots):
+            v = self.slots[i]
+            return default if v is None else v
+        return self.extra.get(req_id, default)
+
+    def __getitem__(self, req_id: int):
+        v = self.get(req_id)
+        if v is None:
+            raise KeyError(req_id)
+        return v
+
+    def __setitem__(self, req_id: int, route) -> None:
+        i = req_id - self.base
+        if 0 <= i < self.window:
+            slots = self.slots
+            if i >= len(slots):
+                slots.extend([None] * (i + 1 - len(slots)))
+            if slots[i] is None:
+                self._n += 1
+            slots[i] = route
+        else:
+            if req_id not in self.extra:
+                self._n += 1
+            self.extra[req_id] = route
+
+    def pop(self, req_id: int, default=None):
+        i = req_id - self.base
+        if 0 <= i < len(self.slots):
+            v = self.slots[i]
+            if v is None:
+                return default
+            self.slots[i] = None
+        else:
+            v = self.extra.pop(req_id, None)
+            if v is None:
+                return default
+        self._n -= 1
+        return v
+
+    def __contains__(self, req_id: int) -> bool:
+        return self.get(req_id) is not None
+
+    def __len__(self) -> int:
+        return self._n
+
+    def values(self):
+        return [v for v in self.slots if v is not None] + list(self.extra.values())
+
+
+__all__ = [
+    "ReqIdError",
+    "ReqIdAllocator",
+    "RouteTable",
+]
@@ -0,0 +1,148 @@
+# core_shm.py — single-producer ring of fixed-size tick records in multiprocessing.shared_memory
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+from core.core_cfg import SHARD
+
+# Header (64 bytes, one cache line): write seq (u64) | capacity (u64) | record size (u64)
+_HDR = struct.Struct("<QQQ")
+_HDR_SIZE = 64
+_SEQ = struct.Struct("<Q")
+# Record: wall time (f64) | key (i64) | tag (i16) | tickType (i16) | pad | 7 values (f64)
+TICK = struct.Struct("<dqhh4x7d")
+TICK_SIZE = TICK.size
+N_VALUES = 7
+
+_ATTACH_LOCK = threading.Lock()
+
+
+class ShmRingError(Exception):
+    __slots__ = ("message",)
+    def __init__(self, message: str) -> None:
+        self.message = message
+    def __str__(self) -> str:
+        return self.message
+
+
+def _attach_untracked(name: str) -> shared_memory.SharedMemory:
+    """
+    < 3.13 registers every attach with the resource tracker, which unlinks the
+    block when the attaching process exits; only the creator may unlink. Skip
+    the registration of this block only: other names registered meanwhile (by
+    any thread) go through. Unregistering after the attach is no substitute:
+    spawned workers share their parent's tracker, and would drop the creator's
+    registration.
+    """
+    register = resource_tracker.register
+    def skip_own(n, rtype):
+        if rtype != "shared_memory" or n.lstrip("/") != name.lstrip("/"):
+            register(n, rtype)
+    with _ATTACH_LOCK:
+        resource_tracker.register = skip_own
+        try:
+            return shared_memory.SharedMemory(name)
+        finally:
+            resource_tracker.register = register
+
+
+class ShmRing:
+    """
+    Tick records in a shared memory block: one writer process, one reader
+    (each side has its own ShmRing over the same name). The writer never
+    blocks: it overwrites the oldest records, writes the record first and
+    publishes the write sequence after. The reader keeps its own position;
+    when the writer has lapped it, the overwritten records are skipped and
+    counted in `lost`, and a record is only returned if it was not being
+    overwritten while it was copied (sequence re-checked after the copy).
+    """
+    __slots__ = ("shm", "capacity", "owner", "_buf", "_seq", "read_seq", "lost")
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self._buf = shm.buf
+        _, self.capacity, rec = _HDR.unpack_from(self._buf, 0)
+        if rec != TICK_SIZE:
+            raise ShmRingError(f"ring '{shm.name}' has {rec}-byte records, expected {TICK_SIZE}")
+        self._seq = _SEQ.unpack_from(self._buf, 0)[0]
+        self.read_seq = self._seq
+        self.lost = 0
+
+    @classmethod
+    def create(cls, capacity: int = SHARD["ring_records"], name: str = None) -> "ShmRing":
+        """New ring (the creator unlinks it on close)"""
+        shm = shared_memory.SharedMemory(name, create=True, size=_HDR_SIZE + capacity * TICK_SIZE)
+        _HDR.pack_into(shm.buf, 0, 0, capacity, TICK_SIZE)
+        return cls(shm, True)
+
+    @classmethod
+    def attach(cls, name: str) -> "ShmRing":
+        """Existing ring by name; reading starts at its current end"""
+        try:
+            shm = shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            shm = _attach_untracked(name)
+        return cls(shm, False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write(self, key: int, tag: int, tick_type: int, *values) -> None:
+        """One record stamped with the current time (missing values are 0.0)"""
+        seq = self._seq
+        v = values + (0.0,) * (N_VALUES - len(values)) if len(values) < N_VALUES else values
+        TICK.pack_into(self._buf, _HDR_SIZE + (seq % self.capacity) * TICK_SIZE,
+                       time.time(), key, tag, tick_type, *v)
+        self._seq = seq + 1
+        _SEQ.pack_into(self._buf, 0, seq + 1)
+
+    @property
+    def write_seq(self) -> int:
+        return _SEQ.unpack_from(self._buf, 0)[0]
+
+    def pending(self) -> int:
+        return min(self.write_seq - self.read_seq, self.capacity)
+
+    def read(self, max_n: int = None) -> list:
+        """Records written since the last read, oldest first, as TICK tuples"""
+        buf, cap = self._buf, self.capacity
+        w = self.write_seq
+        r = self.read_seq
+        if w - r > cap:
+            self.lost += w - r - cap
+            r = w - cap
+        if max_n is not None and w - r > max_n:
+            w = r + max_n
+        out = []
+        unpack = TICK.unpack_from
+        while r < w:
+            # contiguous run up to the end of the buffer
+            i = r % cap
+            n = min(w - r, cap - i)
+            base = _HDR_SIZE + i * TICK_SIZE
+            out.extend(unpack(buf, base + k * TICK_SIZE) for k in range(n))
+            r += n
+        # records the writer reached while they were copied may be torn
+        torn = self.write_seq - cap + 1 - (w - len(out))
+        if torn > 0:
+            torn = min(torn, len(out))
+            self.lost += torn
+            del out[:torn]
+        self.read_seq = w
+        return out
+
+    def close(self) -> None:
+        self._buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+__all__ = [
+    "TICK",
+    "ShmRingError",
+    "ShmRing",
+]
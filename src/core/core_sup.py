@@ -0,0 +1,84 @@
+# core_sup.py — reconnect supervisor: jittered backoff, handshake, replay
+import asyncio
+import random
+
+from core.core_cfg import RECONNECT
+from core.core_ver import VersionError
+
+
+class Supervisor:
+    """
+    Owned by a Tws. When the socket drops unexpectedly, reconnects with
+    full-jitter exponential backoff (first attempt immediately), re-runs the
+    handshake, re-issues every pending request under its reqId (the waiting
+    queue stays bound) and re-sends every live subscription under a fresh reqId
+    from the connection's window (its SubQueue, if any, moves with it).
+    on_resub(old_id, new_id) lets owners (e.g. MktApi) follow the renumbering.
+    """
+
+    def __init__(self, tws, cfg: dict = RECONNECT, on_resub=None):
+        self.tws = tws
+        self.base = cfg["base_sec"]
+        self.cap = cfg["cap_sec"]
+        self.max_attempts = cfg["max_attempts"]
+        self.on_resub = on_resub
+        self._task = None
+        self.reconnects = 0
+        self.last_outage_sec = 0.0
+
+    @property
+    def active(self):
+        return self._task is not None and not self._task.done()
+
+    def on_lost(self, exc):
+        if not self.active:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _delay(self, attempt: int) -> float:
+        if attempt == 0:
+            return 0.0
+        return random.uniform(0, min(self.cap, self.base * (2 ** attempt)))
+
+    async def _run(self):
+        tws = self.tws
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        attempt = 0
+        while not tws._closing:
+            if self.max_attempts and attempt >= self.max_attempts:
+                print(f"Reconnect {tws.host}:{tws.port} gave up after {attempt} attempts")
+                tws._fail_pending()
+                return
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+            try:
+                await tws._open_async()
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, VersionError) as e:
+                print(f"Reconnect {tws.host}:{tws.port} attempt {attempt} failed: {str(e) or type(e).__name__}")
+                continue
+            break
+        else:
+            return
+        self.reconnects += 1
+        self.last_outage_sec = loop.time() - t0
+        await self._replay()
+        print(f"Reconnected {tws.host}:{tws.port} cid {tws.client_id} in {self.last_outage_sec * 1000:.0f} ms "
+              f"({len(tws._replay)} requests, {len(tws.subs)} subscriptions replayed)")
+
+    async def _replay(self):
+        tws = self.tws
+        for req_id, payload in list(tws._replay.items()):
+            if payload.startswith(b"20\x00"):
+                await tws.pacer.pace_hst()
+            await tws.send_frame_async(payload)
+        for old_id, build in list(tws.subs.items()):
+            del tws.subs[old_id]
+            new_id = tws.next_req_id()
+            tws.subs[new_id] = build
+            tws.move_route(old_id, new_id)
+            if self.on_resub is not None:
+                self.on_resub(old_id, new_id)
+            await tws.send_frame_async(build(new_id))
+
+
+__all__ = ["Supervisor"]
@@ -0,0 +1,66 @@
+# core_tpl.py — pre-encoded request templates: payload bytes split around the reqId field
+from typing import Callable, Dict
+
+TEMPLATE_CACHE_SIZE = 4096  # distinct (builder, prms) pairs kept before the cache is reset
+
+_TEMPLATES: Dict[tuple, "RequestTemplate"] = {}
+
+
+class RequestTemplate:
+    """
+    One request payload with its reqId field cut out: build(req_id) is a
+    single concatenation. Bound build methods are valid Tws.subs builders.
+    """
+    __slots__ = ("head", "tail")
+
+    def __init__(self, payload: bytes, req_field: int):
+        # field req_field spans (NUL ending field req_field - 1, its own NUL]
+        p = -1
+        for _ in range(req_field):
+            p = payload.find(b"\x00", p + 1)
+            if p < 0:
+                raise ValueError(f"payload has no field {req_field}")
+        q = payload.find(b"\x00", p + 1)
+        if q < 0:
+            raise ValueError(f"payload has no field {req_field}")
+        self.head = payload[:p + 1]
+        self.tail = payload[q:]
+
+    def build(self, req_id: int) -> bytes:
+        return b"%s%d%s" % (self.head, req_id, self.tail)
+
+
+def request_template(builder: Callable, prms: dict, req_field: int, *args) -> RequestTemplate:
+    """
+    Template for builder(req_id, prms, *args), built on first use. req_field is
+    the reqId's field index in the payload. The key is the content of prms, so
+    an edited cts_cfg entry gets a new template; prms with unhashable values
+    are not cached (a fresh template each call).
+    """
+    key = (builder, req_field, tuple(prms.items()), args)
+    try:
+        tpl = _TEMPLATES.get(key)
+    except TypeError:
+        return RequestTemplate(builder(0, prms, *args), req_field)
+    if tpl is None:
+        if len(_TEMPLATES) >= TEMPLATE_CACHE_SIZE:
+            _TEMPLATES.clear()
+        tpl = _TEMPLATES[key] = RequestTemplate(builder(0, prms, *args), req_field)
+    return tpl
+
+
+def build_request(builder: Callable, req_id: int, prms: dict, req_field: int, *args) -> bytes:
+    return request_template(builder, prms, req_field, *args).build(req_id)
+
+
+def clear_templates() -> None:
+    """Drop every template (after reloading cts_cfg or changing a shared chunk)"""
+    _TEMPLATES.clear()
+
+
+__all__ = [
+    "RequestTemplate",
+    "request_template",
+    "build_request",
+    "clear_templates",
+]
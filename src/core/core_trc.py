@@ -0,0 +1,85 @@
+# core_trc.py — level-gated wire tracing with an in-memory ring of raw frames
+import sys
+import time
+from collections import deque
+from itertools import repeat
+
+from core.core_cfg import TRACE_LEVEL, TRACE_RING_SIZE
+
+# Levels
+TRC_OFF = 0   # nothing recorded
+TRC_RING = 1  # raw frames kept in the ring, dumped on demand / on error
+TRC_WIRE = 2  # ring + hex line on stdout per frame (debug only)
+
+# Directions
+TX = 0
+RX = 1
+_DIR = (">>>", "<<<")
+
+
+class Tracer:
+    """
+    Hot paths test a plain bool attribute before calling anything:
+        if TRC.ring_on: TRC.record(TX, payload)
+    Recording is one tuple append (monotonic ns, direction, frame reference);
+    formatting only happens in dump().
+    """
+    __slots__ = ("level", "ring", "ring_on", "wire_on")
+
+    def __init__(self, level: int = TRACE_LEVEL, size: int = TRACE_RING_SIZE):
+        self.ring = deque(maxlen=size)
+        self.set_level(level)
+
+    def set_level(self, level: int) -> None:
+        self.level = level
+        self.ring_on = level >= TRC_RING
+        self.wire_on = level >= TRC_WIRE
+
+    def record(self, direction: int, frame) -> None:
+        self.ring.append((time.monotonic_ns(), direction, frame))
+        if self.wire_on:
+            print(f"{_DIR[direction]} {bytes(frame).hex()}")
+
+    def record_spans(self, direction: int, spans) -> None:
+        """Frames of one read as (data, start, end): one timestamp, sliced only in dump()"""
+        if self.wire_on:
+            for d, s, e in spans:
+                self.record(direction, d[s:e])
+            return
+        self.ring.extend(zip(repeat(time.monotonic_ns()), repeat(direction), spans))
+
+    def dump(self, last: int = None, file=None) -> None:
+        """Write the most recent frames (all by default) with relative timestamps"""
+        out = file or sys.stderr
+        recs = list(self.ring)
+        if last is not None:
+            recs = recs[-last:]
+        if not recs:
+            return
+        t0 = recs[0][0]
+        print(f"--- trace dump: {len(recs)} frames ---", file=out)
+        for ts, direction, frame in recs:
+            if type(frame) is tuple:
+                d, s, e = frame
+                frame = d[s:e]
+            text = bytes(frame).replace(b"\x00", b"|").decode("ascii", "replace")
+            print(f"+{(ts - t0) / 1e6:10.3f}ms {_DIR[direction]} {text}", file=out)
+        print("--- end trace dump ---", file=out)
+
+    def clear(self) -> None:
+        self.ring.clear()
+
+
+# Process-wide tracer shared by every connection
+TRC = Tracer()
+
+
+__all__ = [
+    "TRC_OFF",
+    "TRC_RING",
+    "TRC_WIRE",
+    "TX",
+    "RX",
+    "Tracer",
+    "TRC",
+]
@@ -1,6 +1,11 @@
 # core_utils_dll.py (shared utilities)
+from __future__ import annotations
+
 import struct
-from typing import Optional, List
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # annotations are never evaluated: importing core_util (cts_cfg, cts_cache) skips typing
+    from typing import Optional, List, Tuple
 
 ip='127.0.0.1'
 port=4002
@@ -80,6 +85,27 @@ def extract_frames(buf: bytearray, data: bytes) -> List[bytes]:
     return frames
 
 
+def extract_tag_req_id(payload: bytes, req_id_field: dict) -> Tuple[bytes, Optional[int]]:
+    """Extract tag and reqId in one forward walk (reqId is None if the tag carries none)"""
+    end = payload.find(b'\x00')
+    if end < 0:
+        return payload, None
+    tag = payload[:end]
+    idx = req_id_field.get(tag)
+    if idx is None:
+        return tag, None
+    pos = end
+    for _ in range(idx - 1):
+        pos = payload.find(b'\x00', pos + 1)
+        if pos == -1:
+            return tag, None
+    nxt = payload.find(b'\x00', pos + 1)
+    try:
+        return tag, int(payload[pos + 1:nxt] if nxt != -1 else payload[pos + 1:])
+    except ValueError:
+        return tag, None
+
+
 def split_fields(payload: bytes) -> List[bytes]:
     """Fast field splitting without decode"""
     return payload.split(b'\x00')
@@ -0,0 +1,231 @@
+# core_vec.py — batch frame splitting: tag / reqId / tickType columns for a whole read at once
+from itertools import repeat
+
+from core.core_cfg import BATCH_MIN_BYTES, REQ_ID_FIELD
+from core.core_fv import FrameView
+
+# Tick messages carry tickType right after the reqId
+TICK_TAGS = frozenset((1, 2, 21, 45, 46))
+_INT_WIDTH = 10  # digits parsed by the vector path (int32 reqIds)
+
+_np = None
+
+
+def _numpy():
+    """numpy on first use (optional: without it columns are plain lists)"""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = False
+    return _np
+
+
+def have_numpy() -> bool:
+    return bool(_numpy())
+
+
+def _req_field_table():
+    """tag int -> reqId field index, -1 for tags without one (tags are < 256 on the wire)"""
+    t = [-1] * 256
+    for tag, i in REQ_ID_FIELD.items():
+        t[int(tag)] = i
+    return t
+
+
+_REQ_FIELD = _req_field_table()
+
+
+def _atoi_np(np, a, s, e, width=_INT_WIDTH):
+    """
+    Vector atoi over byte ranges [s, e) of a (Horner, one column per digit);
+    empty fields give -1. a must be padded past every s by width + 1 bytes.
+    """
+    n = e - s
+    neg = (n > 0) & (a[s] == 45)
+    s = s + neg
+    n = n - neg
+    v = np.zeros(len(s), dtype=np.int64)
+    # only as many digit columns as the longest field present
+    for c in range(min(width, int(n.max()) if len(n) else 0)):
+        v = np.where(c < n, v * 10 + (a[s + c] - 48), v)
+    v = np.where(neg, -v, v)
+    return np.where(n > 0, v, -1)
+
+
+def _luts(np):
+    """tag -> reqId field index, tag -> is a tick message (numpy lookup tables, built once)"""
+    global _LUTS
+    if _LUTS is None:
+        tick = np.zeros(256, dtype=bool)
+        tick[list(TICK_TAGS)] = True
+        _LUTS = np.asarray(_REQ_FIELD, dtype=np.int64), tick
+    return _LUTS
+
+
+_LUTS = None
+_PAD = b"\x00" * 16   # covers the widest digit run read past a field start
+_NUL_PAD = 8          # sentinel NUL offsets: field index + 1 never runs off the table
+
+
+class FrameBatch:
+    """
+    Every complete frame of one read, copied once, with per-frame columns:
+    tags, req_ids (-1: none) and tick_types (-1: not a tick). Large reads are
+    split in one vectorized pass into numpy arrays; small ones (or no numpy)
+    get plain lists, where the fixed numpy call overhead would dominate.
+    Row i is data[starts[i]:ends[i]]; view(i) is a FrameView over it, no copy.
+    """
+    __slots__ = ("data", "starts", "ends", "tags", "req_ids", "tick_types", "_nul")
+
+    def __init__(self, data: bytes, offs, vector: bool = True):
+        self.data = data
+        np = _numpy() if vector else False
+        if np:
+            self._split_np(np, offs)
+        else:
+            self._split_py(offs)
+
+    @classmethod
+    def from_buffer(cls, fb, min_vector: int = BATCH_MIN_BYTES):
+        """Take every complete frame of a FrameBuffer; None if there is none"""
+        data, offs = fb.take_run()
+        return cls(data, offs, len(data) >= min_vector) if offs else None
+
+    def _split_np(self, np, offs):
+        size = len(self.data)
+        a = np.frombuffer(self.data + _PAD, dtype=np.uint8)
+        starts = np.asarray(offs, dtype=np.int64)
+        ends = np.empty_like(starts)
+        ends[:-1] = starts[1:] - 4
+        ends[-1] = size
+        # length headers may hold 0x00 bytes: keep them out of the NUL index
+        is_nul = a[:size] == 0
+        is_nul[((starts - 4)[:, None] + np.arange(4)).ravel()] = False
+        nul = np.flatnonzero(is_nul)
+        if not len(nul):
+            self._split_py(offs)
+            return
+        nul = np.concatenate((nul, np.full(_NUL_PAD, size, dtype=nul.dtype)))
+        req_lut, tick_lut = _luts(np)
+        first = np.searchsorted(nul[:-_NUL_PAD], starts)
+        tags = _atoi_np(np, a, starts, np.minimum(nul[first], ends), 3)
+        tags = np.where((tags >= 0) & (tags < 256), tags, 0)
+        fidx = req_lut[tags]
+        # field k of a row spans (nul[first + k - 1], nul[first + k])
+        j = first + fidx
+        ok = (fidx > 0) & (nul[j] < ends)
+        req = np.where(ok, _atoi_np(np, a, nul[j - 1] + 1, nul[j]), -1)
+        is_tick = ok & tick_lut[tags] & (nul[j + 1] < ends)
+        tick = _atoi_np(np, a, nul[j] + 1, nul[j + 1], 4)
+        self.starts = starts
+        self.ends = ends
+        self.tags = tags
+        self.req_ids = req
+        self.tick_types = np.where(is_tick, tick, -1)
+        self._nul = nul
+
+    def _split_py(self, offs):
+        d = self.data
+        find = d.find
+        n = len(offs)
+        ends = [offs[i + 1] - 4 for i in range(n - 1)] + [len(d)]
+        tags, reqs, ticks = [], [], []
+        for s, e in zip(offs, ends):
+            p = find(b"\x00", s, e)
+            tag = int(d[s:p]) if p > s else 0
+            tags.append(tag)
+            k = _REQ_FIELD[tag] if tag < 256 else -1
+            req = tick = -1
+            if k > 0:
+                for _ in range(k - 1):
+                    p = find(b"\x00", p + 1, e) if p >= 0 else -1
+                q = find(b"\x00", p + 1, e) if p >= 0 else -1
+                if q > p + 1:
+                    req = int(d[p + 1:q])
+                    if tag in TICK_TAGS:
+                        r = find(b"\x00", q + 1, e)
+                        if r > q + 1:
+                            tick = int(d[q + 1:r])
+            reqs.append(req)
+            ticks.append(tick)
+        self.starts = list(offs)
+        self.ends = ends
+        self.tags = tags
+        self.req_ids = reqs
+        self.tick_types = ticks
+        self._nul = None
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def frame(self, i: int) -> bytes:
+        return self.data[self.starts[i]:self.ends[i]]
+
+    def frames(self):
+        d = self.data
+        for s, e in zip(self.starts, self.ends):
+            yield d[s:e]
+
+    def spans(self):
+        """(data, start, end) per row: the frames by reference, sliced by whoever reads them"""
+        s, e = self.starts, self.ends
+        if self._nul is not None:
+            s, e = s.tolist(), e.tolist()
+        return zip(repeat(self.data), s, e)
+
+    def view(self, i: int, fv: FrameView = None) -> FrameView:
+        """FrameView over row i (pass one in to reuse it across rows)"""
+        s, e = int(self.starts[i]), int(self.ends[i])
+        return fv.reset(self.data, s, e) if fv is not None else FrameView(self.data, s, e)
+
+    def rows(self, tag: bytes):
+        """Row indices of one tag, in arrival order"""
+        t = int(tag)
+        if self._nul is not None:
+            return _np.flatnonzero(self.tags == t)
+        return [i for i, x in enumerate(self.tags) if x == t]
+
+    def rows_except(self, tags) -> list:
+        """Row indices whose tag is none of `tags`, in arrival order"""
+        t = [int(x) for x in tags]
+        if self._nul is not None:
+            return _np.flatnonzero(~_np.isin(self.tags, t)).tolist()
+        return [i for i, x in enumerate(self.tags) if x not in t]
+
+    def payload_bytes(self, rows) -> int:
+        """Summed payload length of the given rows (length prefixes not included)"""
+        s, e = self.starts, self.ends
+        if self._nul is not None:
+            return int((e[rows] - s[rows]).sum())
+        return sum(e[i] - s[i] for i in rows)
+
+    def int_column(self, rows, field: int):
+        """Integer field `field` of the given rows (-1 where empty/missing), one vector pass"""
+        np = _np
+        if self._nul is None:
+            fv = FrameView()
+            return [v.int_field(field, -1) if v.has(field) else -1 for v in (self.view(i, fv) for i in rows)]
+        rows = np.asarray(rows, dtype=np.int64)
+        nul = self._nul
+        starts = self.starts[rows]
+        first = np.searchsorted(nul[:-_NUL_PAD], starts)
+        j = np.minimum(first + field, len(nul) - 1)
+        ok = nul[j] < self.ends[rows]
+        s = starts if field == 0 else nul[j - 1] + 1
+        a = np.frombuffer(self.data + _PAD, dtype=np.uint8)
+        return np.where(ok, _atoi_np(np, a, s, np.where(ok, nul[j], s)), -1)
+
+    def field_column(self, rows, field: int):
+        """Raw bytes of field `field` for the given rows (b'' where missing)"""
+        fv = FrameView()
+        return [v.field(field) if v.has(field) else b"" for v in (self.view(i, fv) for i in rows)]
+
+
+__all__ = [
+    "TICK_TAGS",
+    "FrameBatch",
+    "have_numpy",
+]
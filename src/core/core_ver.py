@@ -0,0 +1,120 @@
+# core_ver.py — per server-version codec: encoders/decoders resolved once at connect
+from typing import Callable, Dict
+
+from core.core_cfg import CORE_CFG, IBKR_MIN_CLIENT_VERSION, IBKR_MAX_CLIENT_VERSION
+from core.core_lc import compile_layout
+
+
+class VersionError(Exception):
+    __slots__ = ("message",)
+    def __init__(self, message: str) -> None:
+        self.message = message
+    def __str__(self) -> str:
+        return self.message
+
+
+def parse_server_version(frame: bytes) -> int:
+    """First handshake frame: b'<serverVersion>\\0<connectionTime>\\0'"""
+    end = frame.find(b"\x00")
+    try:
+        v = int(frame[:end] if end >= 0 else frame)
+    except ValueError:
+        raise VersionError(f"bad server version frame {frame[:32]!r}")
+    if not IBKR_MIN_CLIENT_VERSION <= v <= IBKR_MAX_CLIENT_VERSION:
+        raise VersionError(f"server version {v} outside v{IBKR_MIN_CLIENT_VERSION}..{IBKR_MAX_CLIENT_VERSION}")
+    return v
+
+
+def _static_encoder(payload: bytes) -> Callable:
+    def enc() -> bytes:
+        return payload
+    return enc
+
+
+def _req_id_encoder(head: bytes) -> Callable:
+    def enc(req_id: int) -> bytes:
+        return head + str(req_id).encode("ascii") + b"\x00"
+    return enc
+
+
+def _start_api_encoder(optional_caps: bytes) -> Callable:
+    def enc(client_id: int) -> bytes:
+        return b"71\x002\x00" + str(client_id).encode("ascii") + b"\x00" + optional_caps + b"\x00"
+    return enc
+
+
+# decoder attribute -> core_lc layout name; compiled on first use, not at connect
+_DECODERS = {
+    "contract_details": "contractDetails",
+    "sec_def_opt_params": "secDefOptParams",
+    "tick_option_computation": "tickOptionComputation",
+    "order_status": "orderStatus",
+}
+
+
+def layout_version(version: int):
+    """Newest layout table at or below a negotiated version (None if every table is newer)"""
+    best = None
+    for v in CORE_CFG["layouts"]:
+        if v <= version and (best is None or v > best):
+            best = v
+    return best
+
+
+class Codec:
+    """
+    Encoders and decoders for one negotiated server version.
+    Every entry is a plain attribute bound to a closure or a core_lc compiled
+    extractor, so hot paths call tws.codec.contract_details(frame) directly.
+    Decoders are compiled on first access from the newest layout table at or
+    below the version (layouts only change when a version adds fields), so
+    connecting never depends on the layout tables.
+    """
+    __slots__ = ("version", "layout_version", "start_api", "req_current_time", "cancel_mkt_data",
+                 "cancel_hst_data") + tuple(_DECODERS)
+
+    def __init__(self, version: int):
+        self.version = version
+        self.layout_version = layout_version(version)
+        # encoders
+        self.start_api = _start_api_encoder(b"")
+        self.req_current_time = _static_encoder(b"49\x001\x00")
+        self.cancel_mkt_data = _req_id_encoder(b"2\x001\x00")
+        self.cancel_hst_data = _req_id_encoder(b"25\x001\x00")
+
+    def __getattr__(self, name: str):
+        # only reached for an unset slot: a decoder not compiled yet
+        message = _DECODERS.get(name)
+        if message is None:
+            raise AttributeError(name)
+        if self.layout_version is None:
+            raise VersionError(f"no {message} layout for server version {self.version} "
+                               f"(known: {known_versions()})")
+        fn = compile_layout(self.layout_version, message)
+        setattr(self, name, fn)
+        return fn
+
+
+_CODECS: Dict[int, Codec] = {}
+
+
+def codec_for(version: int) -> Codec:
+    """Codec for a negotiated version, built once per process"""
+    c = _CODECS.get(version)
+    if c is None:
+        c = _CODECS[version] = Codec(version)
+    return c
+
+
+def known_versions():
+    return sorted(CORE_CFG["layouts"])
+
+
+__all__ = [
+    "VersionError",
+    "parse_server_version",
+    "layout_version",
+    "Codec",
+    "codec_for",
+    "known_versions",
+]
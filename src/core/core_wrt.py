@@ -0,0 +1,96 @@
+# core_wrt.py — corked outbound writer: many frames, one transport write
+import asyncio
+import struct
+import time
+
+from core.core_cfg import WRITE_BUF_SIZE, WRITE_HIGH_WATER
+
+_pack_into = struct.pack_into
+
+
+class FrameWriter:
+    """
+    Outbound frame queue over a Cx connection.
+    put() packs length + payload into one reusable bytearray (struct.pack_into);
+    the buffer is flushed with a single write at the end of the current loop
+    iteration, so a burst of subscriptions leaves as one segment train.
+    Back-pressure only applies once the transport is above its high-water mark.
+    """
+    __slots__ = ("_cx", "_buf", "_view", "_len", "_scheduled", "high_water",
+                 "frames", "bytes", "flushes", "_mark")
+
+    def __init__(self, cx, size: int = WRITE_BUF_SIZE, high_water: int = WRITE_HIGH_WATER):
+        self._cx = cx
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._len = 0
+        self._scheduled = False
+        self.high_water = high_water
+        self.frames = 0
+        self.bytes = 0
+        self.flushes = 0
+        self._mark = (time.monotonic(), 0, 0)
+
+    def put(self, payload) -> None:
+        n = len(payload)
+        start = self._len
+        end = start + 4 + n
+        if end > len(self._buf):
+            self._grow(end)
+        _pack_into(">I", self._buf, start, n)
+        self._view[start + 4:end] = payload
+        self._len = end
+        self.frames += 1
+        self.bytes += 4 + n
+        if end >= self.high_water:
+            self.flush()
+        elif not self._scheduled:
+            self._scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def _grow(self, need: int) -> None:
+        buf = bytearray(max(need, len(self._buf) * 2))
+        buf[:self._len] = self._view[:self._len]
+        self._buf = buf
+        self._view = memoryview(buf)
+
+    def flush(self) -> None:
+        self._scheduled = False
+        n = self._len
+        if not n:
+            return
+        self._len = 0
+        if not self._cx.is_connected():
+            # dropped with the connection: pending requests are re-issued on reconnect
+            return
+        # transports may keep a reference to what they could not send: hand over a copy
+        self._cx.send(bytes(self._view[:n]))
+        self.flushes += 1
+
+    async def drain(self) -> None:
+        """Wait only when the transport reports it is above high-water"""
+        if self._cx._paused:
+            self.flush()
+            await self._cx.drain()
+
+    def rates(self) -> dict:
+        """frames/sec and bytes/sec since the previous call"""
+        now = time.monotonic()
+        t0, f0, b0 = self._mark
+        self._mark = (now, self.frames, self.bytes)
+        dt = now - t0
+        if dt <= 0:
+            return {"frames_per_sec": 0.0, "bytes_per_sec": 0.0}
+        return {"frames_per_sec": (self.frames - f0) / dt, "bytes_per_sec": (self.bytes - b0) / dt}
+
+    @property
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "flushes": self.flushes,
+            "pending": self._len,
+        }
+
+
+__all__ = ["FrameWriter"]
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Bounded subscription queues: drop_oldest, conflate and block policies
+import asyncio
+
+from core.core_bq import BLOCK, CONFLATE, DROP_OLDEST, SubQueue, tick_key
+
+
+def _tick(req_id, tick_type, px):
+    return b"1\x006\x00%d\x00%d\x00%s\x001\x00" % (req_id, tick_type, px)
+
+
+def test_tick_key():
+    assert tick_key(_tick(7, 4, b"1.5")) == (b"1", b"4")
+    assert tick_key(b"50\x003\x007\x001700000000\x00") == (b"50",)
+
+
+def test_drop_oldest():
+    q = SubQueue(3, DROP_OLDEST)
+    for i in range(5):
+        q.put_nowait(_tick(7, 4, b"%d" % i))
+    assert q.dropped == 2 and q.high_water == 3
+    assert q.drain() == [_tick(7, 4, b"%d" % i) for i in (2, 3, 4)]
+
+
+def test_conflate():
+    q = SubQueue(2, CONFLATE)
+    q.put_nowait(_tick(7, 1, b"1"))
+    q.put_nowait(_tick(7, 2, b"2"))
+    q.put_nowait(_tick(7, 1, b"3"))   # replaces the queued bid in place
+    assert q.conflated == 1 and len(q) == 2
+    q.put_nowait(_tick(7, 4, b"4"))   # new key while full: oldest key goes
+    assert q.dropped == 1
+    assert q.drain() == [_tick(7, 2, b"2"), _tick(7, 4, b"4")]
+
+
+def test_block_pauses_and_resumes():
+    calls = []
+    q = SubQueue(4, BLOCK, on_full=lambda: calls.append("full"), on_space=lambda: calls.append("space"))
+    for i in range(6):
+        q.put_nowait(_tick(7, 4, b"%d" % i))
+    # nothing is lost; every put while full asks for a pause
+    assert len(q) == 6 and q.dropped == 0 and q.blocked == 1 and calls == ["full", "full"]
+    q.get_nowait()
+    q.get_nowait()
+    q.get_nowait()
+    assert calls == ["full", "full"]
+    q.get_nowait()                    # back at half
+    assert calls[-1] == "space"
+
+
+def test_close_marker():
+    async def run():
+        q = SubQueue(2, DROP_OLDEST)
+        getter = asyncio.ensure_future(q.get())
+        await asyncio.sleep(0)
+        q.put_nowait(_tick(7, 4, b"1"))
+        assert await getter == _tick(7, 4, b"1")
+        q.put_nowait(_tick(7, 4, b"2"))
+        q.put_nowait(_tick(7, 4, b"3"))
+        q.put_nowait(None)            # never dropped, read after what is queued
+        assert [await q.get(), await q.get(), await q.get()] == [_tick(7, 4, b"2"), _tick(7, 4, b"3"), None]
+    asyncio.run(run())
+
+
+def test_unknown_policy():
+    try:
+        SubQueue(2, "lifo")
+    except ValueError:
+        return
+    raise AssertionError("unknown policy accepted")
+
+
+def main():
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"{name}: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# Error frames (tag 4): informational codes are counted and never routed, request errors fail the owner at once
+import asyncio
+
+from core.Tws import Tws
+from core.core_err import RequestError, error_code, is_info, parse_error
+from cts.cts_dll import _collect_cts_det
+from mkt.mkt_dll import _collect_mkt_data
+
+
+def _err(req_id, code, text):
+    return b"4\x002\x00%d\x00%d\x00%s\x00" % (req_id, code, text)
+
+
+def test_parse():
+    f = _err(300100007, 354, b"Requested market data is not subscribed.")
+    assert error_code(f) == 354 and parse_error(f) == (300100007, 354)
+    assert parse_error(b"4\x002\x00") == (-1, -1) and error_code(b"4\x002\x00-1\x00") == -1
+    assert is_info(2104) and is_info(2158) and is_info(2150) and is_info(10167)
+    assert not is_info(200) and not is_info(354) and not is_info(100)
+
+
+def test_info_not_routed():
+    async def run():
+        t = Tws('127.0.0.1', 1, 'cts', 4, reconnect=False)
+        rid = t.next_req_id()
+        q = t.open_request(rid)
+        seen = []
+        t.on_tag[b"4"] = seen.append
+        t._dispatch(_err(rid, 2104, b"Market data farm connection is OK"))
+        t._dispatch(_err(-1, 2158, b"Sec-def data farm connection is OK"))
+        assert q.qsize() == 0 and len(seen) == 2
+        assert t.met.errors == {2104: 1, 2158: 1}
+        t._dispatch(_err(rid, 200, b"No security definition has been found"))
+        assert q.qsize() == 1 and t.met.errors[200] == 1
+    asyncio.run(run())
+
+
+def test_no_result_ends_collector():
+    async def run():
+        t = Tws('127.0.0.1', 1, 'cts', 5, reconnect=False)
+        rid = t.next_req_id()
+        q = t.open_request(rid)
+        task = asyncio.ensure_future(_collect_cts_det(q, rid))
+        await asyncio.sleep(0)
+        t._dispatch(_err(rid, 2104, b"farm ok"))
+        await asyncio.sleep(0.01)
+        assert not task.done()
+        t._dispatch(_err(rid, 200, b"No security definition has been found"))
+        await asyncio.wait_for(task, 1.0)
+    asyncio.run(run())
+
+
+def test_request_error_raises():
+    async def run():
+        t = Tws('127.0.0.1', 1, 'mkt', 6, reconnect=False)
+        rid = t.next_req_id()
+        q = t.open_request(rid)
+        task = asyncio.ensure_future(_collect_mkt_data(q))
+        await asyncio.sleep(0)
+        t._dispatch(_err(rid, 354, b"Requested market data is not subscribed."))
+        try:
+            await asyncio.wait_for(task, 1.0)
+        except RequestError as e:
+            assert e.req_id == rid and e.code == 354 and "not subscribed" in e.message
+        else:
+            raise AssertionError("error 354 did not fail the request")
+    asyncio.run(run())
+
+
+def main():
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"{name}: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# Framing on short reads: FrameBuffer never hands out a partial frame, however the bytes arrive
+import socket
+import struct
+
+from core.core_frm import FrameBuffer, FrameError, read_frame
+
+
+def _wire(*payloads):
+    return b"".join(struct.pack(">I", len(p)) + p for p in payloads)
+
+
+PAYLOADS = [b"1\x006\x00%d\x001\x006500.25\x003\x00" % i for i in range(50)] + [b"x" * 70000, b"", b"4\x002\x00-1\x002104\x00ok\x00"]
+
+
+def test_byte_by_byte():
+    fb = FrameBuffer(size=64)
+    out = []
+    for b in _wire(*PAYLOADS):
+        fb.feed(bytes((b,)))
+        out.extend(bytes(f) for f in fb.frames())
+    assert out == PAYLOADS, (len(out), len(PAYLOADS))
+    assert len(fb) == 0
+
+
+def test_split_headers_and_chunks():
+    data = _wire(*PAYLOADS)
+    for chunk in (2, 3, 5, 7, 4096):
+        fb = FrameBuffer(size=128)
+        out = []
+        for i in range(0, len(data), chunk):
+            fb.feed(data[i:i + chunk])
+            out.extend(bytes(f) for f in fb.frames())
+        assert out == PAYLOADS, chunk
+
+
+def test_recv_into_path():
+    # writable()/advance() as BufferedProtocol uses them, reads cut mid-frame
+    data = _wire(*PAYLOADS)
+    fb = FrameBuffer(size=256)
+    out, p = [], 0
+    while p < len(data):
+        buf = fb.writable(100)
+        n = min(len(buf), 37, len(data) - p)
+        buf[:n] = data[p:p + n]
+        fb.advance(n)
+        p += n
+        out.extend(bytes(f) for f in fb.frames())
+    assert out == PAYLOADS
+
+
+def test_take_run_keeps_partial_tail():
+    data = _wire(*PAYLOADS[:10])
+    fb = FrameBuffer()
+    fb.feed(data + _wire(b"tail-frame")[:7])
+    run, offs = fb.take_run()
+    assert len(offs) == 10 and len(fb) == 7
+    ends = offs[1:] + [len(run) + 4]
+    assert [run[s:e - 4] for s, e in zip(offs, ends)] == PAYLOADS[:10]
+    fb.feed(_wire(b"tail-frame")[7:])
+    assert bytes(fb.next_frame()) == b"tail-frame"
+
+
+def test_oversize_frame():
+    fb = FrameBuffer(max_frame=1024)
+    fb.feed(struct.pack(">I", 4096))
+    try:
+        fb.next_frame()
+    except FrameError:
+        return
+    raise AssertionError("oversize frame accepted")
+
+
+def test_socket_short_reads():
+    a, b = socket.socketpair()
+    try:
+        data = _wire(*PAYLOADS[:20])
+        for i in range(0, len(data), 3):
+            a.sendall(data[i:i + 3])
+        a.close()
+        fb = FrameBuffer(size=32)
+        out = [read_frame(b, fb) for _ in range(20)]
+        assert out == PAYLOADS[:20]
+        assert read_frame(b, fb) is None
+    finally:
+        b.close()
+
+
+def main():
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"{name}: ok")
+
+
+if __name__ == "__main__":
+    main()
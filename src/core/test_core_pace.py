@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# Pacing limits: per-connection and per-gateway message windows, historical window, market-data lines
+import asyncio
+import time
+
+from core.core_cfg import PACING
+from core.core_pace import GatewayBudget, Pacer, SlidingWindow
+
+# Small limits so a burst crosses several windows in about two seconds
+CFG = dict(PACING, msg_per_sec=10, gw_msg_per_sec=15, hst_per_window=4, hst_window_sec=0.5, mkt_lines=2)
+# Sleeps wake a little late: measure over a window a hair shorter than the limit's
+SPAN = 0.98
+
+
+def _busiest(stamps, span=SPAN):
+    stamps = sorted(stamps)
+    j = best = 0
+    for i, t in enumerate(stamps):
+        while stamps[j] <= t - span:
+            j += 1
+        best = max(best, i - j + 1)
+    return best
+
+
+def test_sliding_window():
+    w = SlidingWindow(3, 1.0)
+    assert [w.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert 0.9 < w.take() <= 1.0
+    assert w.tokens == 0
+
+
+def test_connection_and_gateway_limits():
+    async def run():
+        gw = GatewayBudget(CFG)
+        a, b = Pacer(gw, CFG), Pacer(gw, CFG)
+        sent = {a: [], b: []}
+
+        async def send(p):
+            await p.pace()
+            sent[p].append(time.monotonic())
+        t0 = time.monotonic()
+        await asyncio.gather(*[send(a) for _ in range(20)], *[send(b) for _ in range(10)])
+        elapsed = time.monotonic() - t0
+        assert _busiest(sent[a]) <= CFG["msg_per_sec"], _busiest(sent[a])
+        assert _busiest(sent[b]) <= CFG["msg_per_sec"]
+        assert _busiest(sent[a] + sent[b]) <= CFG["gw_msg_per_sec"], _busiest(sent[a] + sent[b])
+        # 30 frames at 15/s through the gateway: the last window opens 1 s after the first
+        assert 0.9 < elapsed < 2.5, elapsed
+        # wall time held back, not the sum over concurrent callers
+        for p in (a, b):
+            assert p.waited <= elapsed + 0.05 and p.max_wait <= elapsed + 0.05, (p.waited, elapsed)
+    asyncio.run(run())
+
+
+def test_historical_window():
+    async def run():
+        p = Pacer(GatewayBudget(CFG), CFG)
+        stamps = []
+        for _ in range(10):
+            await p.pace_hst()
+            stamps.append(time.monotonic())
+        assert _busiest(stamps, CFG["hst_window_sec"] * SPAN) <= CFG["hst_per_window"]
+    asyncio.run(run())
+
+
+def test_mkt_lines():
+    async def run():
+        p = Pacer(GatewayBudget(CFG), CFG)
+        await p.acquire_line()
+        await p.acquire_line()
+        third = asyncio.ensure_future(p.acquire_line())
+        await asyncio.sleep(0.01)
+        assert not third.done()
+        p.release_line()
+        await asyncio.wait_for(third, 1.0)
+        assert p.gw.lines == 2
+    asyncio.run(run())
+
+
+def main():
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"{name}: ok")
+
+
+if __name__ == "__main__":
+    main()
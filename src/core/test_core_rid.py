@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# reqId windows per connection and inbound routing by reqId (no gateway needed)
+import asyncio
+
+from core.Tws import Tws
+from core.core_cfg import REQ_IDS
+from core.core_rid import ReqIdAllocator, ReqIdError, RouteTable
+
+
+def test_windows_never_overlap():
+    a = Tws('127.0.0.1', 1, 'cts', 1, reconnect=False)
+    b = Tws('127.0.0.1', 1, 'cts', 2, reconnect=False)
+    m = Tws('127.0.0.1', 1, 'mkt', 1, reconnect=False)
+    ids = {t: [t.next_req_id() for _ in range(1000)] for t in (a, b, m)}
+    for t, got in ids.items():
+        assert all(t.ids.owns(i) for i in got)
+        assert got[0] == t.client_id * REQ_IDS["window"]
+        assert got[-1] < 2 ** 31
+    assert not set(ids[a]) & set(ids[b]) and not set(ids[a]) & set(ids[m])
+
+
+def test_wrap_skips_busy():
+    busy = {10, 11}
+    al = ReqIdAllocator(10, window=4, busy=busy.__contains__)
+    assert [al.alloc() for _ in range(4)] == [12, 13, 12, 13]
+    busy.update((12, 13))
+    try:
+        al.alloc()
+    except ReqIdError:
+        return
+    raise AssertionError("exhausted window handed out an id")
+
+
+def test_route_table():
+    rt = RouteTable(500, window=100)
+    rt[503] = "in"
+    rt[42] = "outside"
+    assert rt.get(503) == "in" and rt[42] == "outside" and rt.get(504) is None
+    assert 503 in rt and len(rt) == 2 and sorted(rt.values()) == ["in", "outside"]
+    assert rt.pop(503) == "in" and rt.pop(503) is None and rt.pop(42) == "outside" and len(rt) == 0
+
+
+def test_dispatch_routes_by_req_id():
+    async def run():
+        t = Tws('127.0.0.1', 1, 'cts', 3, reconnect=False)
+        r1, r2 = t.next_req_id(), t.next_req_id()
+        q1, q2 = t.open_request(r1), t.open_request(r2)
+        tagged = []
+        t.on_tag[b"49"] = tagged.append
+        t._stream = asyncio.Queue()
+        t._dispatch(b"10\x00%d\x00SPX\x00" % r2)
+        t._dispatch(b"10\x00%d\x00SPX\x00" % r1)
+        t._dispatch(b"52\x001\x00%d\x00" % r1)
+        t._dispatch(b"49\x001\x001700000000\x00")
+        t._dispatch(b"10\x00%d\x00late\x00" % (r2 + 7))
+        assert q1.qsize() == 2 and q2.qsize() == 1
+        assert (await q2.get()).startswith(b"10\x00%d" % r2)
+        assert tagged == [b"49\x001\x001700000000\x00"]
+        assert t._stream.get_nowait().endswith(b"late\x00")
+        t.close_request(r1)
+        t._dispatch(b"10\x00%d\x00after close\x00" % r1)
+        assert q1.qsize() == 2 and t._stream.qsize() == 1
+        try:
+            t.open_request(r2)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("reqId opened twice")
+    asyncio.run(run())
+
+
+def main():
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"{name}: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# Reconnect supervisor against the local simulator: pending request and subscription replay,
+# a link that drops (or goes silent) in the middle of the reconnect handshake
+import asyncio
+import struct
+
+import core.Tws as tws_mod
+from core.Tws import Tws
+from cts.cts_dll import req_cts_det_async, set_contract_request
+from mkt.mkt_dll import sub_mkt_data_async
+from sim.sim_srv import SimServer
+
+OPT = {'root': b'SPX\x00', 'sType': b'OPT\x00', 'exp': '20251219', 'strike': 6500, 'right': b'C\x00',
+       'xch': b'CBOE\x00'}
+TICKS = {'conId': b'1\x00', 'root': b'SPX\x00', 'sType': b'OPT\x00', 'strike': 6500, 'xch': b'CBOE\x00'}
+
+
+async def _reconnected(t, n=1, timeout=10.0):
+    for _ in range(int(timeout / 0.05)):
+        if t.sup.reconnects >= n and not t.sup.active:
+            return
+        await asyncio.sleep(0.05)
+    raise AssertionError(f"no reconnect (active={t.sup.active}, reconnects={t.sup.reconnects})")
+
+
+def test_pending_request_replayed():
+    async def run():
+        # slow answers: the request is still pending when the link drops
+        srv = await SimServer(port=0, latency_ms=300).start()
+        t = Tws('127.0.0.1', srv.port, 'cts', 7)
+        await t.connect_async()
+        try:
+            rid = t.next_req_id()
+            task = asyncio.ensure_future(req_cts_det_async(t, rid, set_contract_request(rid, OPT)))
+            await asyncio.sleep(0.05)
+            srv.drop_all()
+            await _reconnected(t)
+            res = await asyncio.wait_for(task, 5.0)
+            assert res and res[3] == 6500.0, res
+            assert srv.connections == 2 and t.inflight == 0
+        finally:
+            await t.close_async()
+            await srv.close()
+    asyncio.run(run())
+
+
+def test_subscription_replayed_under_new_req_id():
+    async def run():
+        srv = await SimServer(port=0, tick_rate=200).start()
+        t = Tws('127.0.0.1', srv.port, 'mkt', 7)
+        await t.connect_async()
+        moved = []
+        t.sup.on_resub = lambda old, new: moved.append((old, new))
+        try:
+            rid = t.next_req_id()
+            q = await sub_mkt_data_async(t, rid, TICKS, "drop_oldest")
+            await asyncio.sleep(0.2)
+            assert len(q.drain()) > 0
+            srv.drop_all()
+            await _reconnected(t)
+            assert moved and moved[0][0] == rid and list(t.subs) == [moved[0][1]]
+            await asyncio.sleep(0.3)
+            # same queue, fed under the new reqId
+            assert len(q.drain()) > 0
+        finally:
+            await t.close_async()
+            await srv.close()
+    asyncio.run(run())
+
+
+def test_drop_mid_handshake():
+    async def run():
+        tws_mod.DEFAULT_CONNECT_TIMEOUT_SEC = 0.5
+        srv = await SimServer(port=0).start()
+        port = srv.port
+        t = Tws('127.0.0.1', port, 'cts', 8)
+        await t.connect_async()
+        await srv.close()
+        attempts = []
+
+        async def half_open(reader, writer):
+            # hello read, server version sent, then the peer drops (odd attempts) or goes silent
+            attempts.append(1)
+            await reader.read(64)
+            writer.write(struct.pack(">I", 5) + b"178\x00\x00")
+            if len(attempts) % 2:
+                await asyncio.sleep(0.05)
+                writer.transport.abort()
+            else:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    pass
+                writer.close()
+        bad = await asyncio.start_server(half_open, '127.0.0.1', port)
+        try:
+            for _ in range(100):
+                if len(attempts) >= 3:
+                    break
+                await asyncio.sleep(0.05)
+            assert len(attempts) >= 3, attempts
+            assert t.sup.active and t.sup.reconnects == 0
+        finally:
+            bad.close()
+            await bad.wait_closed()
+        srv = await SimServer(port=port).start()
+        try:
+            await _reconnected(t)
+            assert t.cx.is_connected() and t.server_version == 178
+        finally:
+            await t.close_async()
+            await srv.close()
+            tws_mod.DEFAULT_CONNECT_TIMEOUT_SEC = 10
+    asyncio.run(run())
+
+
+def main():
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"{name}: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,55 +4,59 @@ import struct
 from typing import List
 
 from core.Tws import Tws
-from core.core_util import encode_field, E_EMPTY
+from core.core_cfg import PIPELINE
+from core.core_pipe import windowed
+from core.core_util import E_EMPTY
 
-from cts.cts_cfg import TYPES, REQ_CONTRACT_DETAILS, VERSION_8, E_CUR_USD, \
-    INCLUDE_EXPIRED_FALSE, INS, E_CALL, TCLASSES, E_PUT
-from cts.cts_dll import req_sec_def_opt_params, req_cts_det_async
+from cts.cts_cfg import TYPES, INS, E_CALL, TCLASSES, E_PUT, E_XCH_CBOE, E_SEC_OPT
+from cts.cts_dll import req_sec_def_opt_params, req_cts_det_async, contract_request, set_contract_request
 
 HISTO_KEY_FORMAT = "<BBHI"  # 8 bytes total
 
 class CtsApi:
-    reqId = 0
-    def __init__(self,slot):
-        self.tws = Tws('127.0.0.1',4012,'cts',slot)
-    def _req_id(self):
-        self.reqId += 1
-    async def retrieve_conid(self,req):
-        self._req_id()
-        return await req_cts_det_async(self.tws, self.reqId, req)
+    def __init__(self,slot,pool=None):
+        # No private Tws with a pool: its signal handlers would replace the pool's
+        self.tws = Tws('127.0.0.1',4012,'cts',slot) if pool is None else None
+        # Optional TwsPool: each request goes to the least-loaded connection
+        self.pool = pool
+        self.reqId = 0  # last reqId issued
+    def _req_id(self, tws):
+        # reqIds come from the connection the request goes out on
+        self.reqId = tws.next_req_id()
+        return self.reqId
+    def _conn(self):
+        return self.pool.pick() if self.pool is not None else self.tws
+    def _conns(self):
+        return self.pool.live if self.pool is not None else [self.tws]
+    async def retrieve_conid(self,prms):
+        tws = self._conn()
+        req_id = self._req_id(tws)
+        return await req_cts_det_async(tws, req_id, contract_request(req_id, prms))
 
     async def _req_fop_parameters(self, root, exch, conid):
-        self._req_id()
+        tws = self._conn()
         prms={'root':root,'xch':exch,'sType':TYPES[3],'conid':conid}
-        return await req_sec_def_opt_params(self.tws, self.reqId, prms)
-
-def set_contract_request(req_id, prms):
-    """Request contract details using binary chunks for maximum efficiency"""
-    payload_parts = [REQ_CONTRACT_DETAILS,
-                     VERSION_8,
-                     encode_field(req_id),
-                     prms.get('conid', E_EMPTY),
-                     prms.get('root', E_EMPTY),
-                     prms.get('sType', E_EMPTY),
-                     encode_field(prms.get('exp', '')),
-                     #prms.get('strike', E_ZERO),
-                     encode_field(prms.get('strike', '')),
-                     prms.get('right', E_EMPTY),
-                     prms.get('mul', E_EMPTY),
-                     prms.get('xch', E_EMPTY),
-                     prms.get('prim', E_EMPTY),
-                     prms.get('cur', E_CUR_USD),
-                     encode_field(prms.get('lSym', '')),
-                     prms.get('tc', E_EMPTY),
-                     INCLUDE_EXPIRED_FALSE,
-                     prms.get('secIdType', E_EMPTY),
-                     prms.get('secId', E_EMPTY),
-                     prms.get('issuerId', E_EMPTY)
-                     ]
-    # Concatenate all binary chunks
-    payload = b''.join(payload_parts)
-    return payload
+        return await req_sec_def_opt_params(tws, self._req_id(tws), prms)
+
+    async def _req_cboe_opt(self, tws, cboe_local_sym):
+        # CBOE 'SPXW250919C06500000' -> IB localSymbol 'SPXW  250919C06500000' (root padded to 6)
+        ib_local_sym = f'{cboe_local_sym[:-15].ljust(6)}{cboe_local_sym[-15:]}'
+        req_id = self._req_id(tws)
+        # one-off prms: built directly, not through the template cache
+        payload = set_contract_request(req_id, {'lSym': ib_local_sym, 'xch': E_XCH_CBOE, 'sType': E_SEC_OPT})
+        return await req_cts_det_async(tws, req_id, payload)
+
+    async def req_cboe_opt(self, cboe_local_sym):
+        """Contract details of one CBOE option symbol"""
+        return await self._req_cboe_opt(self._conn(), cboe_local_sym)
+
+    def resolve_cboe_opts(self, cboe_local_syms, window=PIPELINE["window"]):
+        """
+        Async iterator of (symbol, details) for many CBOE option symbols, `window`
+        requests in flight per connection, in completion order; details is the
+        exception (e.g. RequestError) for a symbol that failed.
+        """
+        return windowed(self._conns(), cboe_local_syms, self._req_cboe_opt, window)
 
 def _gen_key2(callback) -> bytes:
     """Generate the unique 8-byte key."""
@@ -129,7 +133,7 @@ def decode_key(key):
 async def main():
     api=CtsApi(3)
     await api.tws.connect_async()
-    req_id=102
+    req_id=api.tws.next_req_id()
     #prms={'root':E_RT_SPX,'xch':E_XCH_CBOE,'sType':E_SEC_FUT}
     #prms={'conid':INS[0]['conid'], 'xch':INS[0]['xch']}
     #prms = {'root': INS[0]['root'], 'sType':INS[0]['sType'],'xch': INS[0]['xch']}
@@ -138,7 +142,7 @@ async def main():
     idx=12
     prms = {'root': INS[idx]['root'], 'sType': INS[idx]['sType'], 'xch': INS[idx]['xch'],'exp':'20250919','strike':6500,'right':E_CALL}
     print(f'prms {prms}')
-    payload=set_contract_request(req_id, prms)
+    payload=contract_request(req_id, prms)
     #print(payload)
     resp=await req_cts_det_async(api.tws, req_id, payload)
     print(f'response : {resp}')
@@ -146,10 +150,12 @@ async def main():
     print(f'key ')
     prms=decode_key(key)
     print(f'prms {prms}')
-    payload = set_contract_request(req_id, prms)
+    payload = contract_request(req_id, prms)
     print(payload)
     resp = await req_cts_det_async(api.tws, req_id, payload)
     print(f'response : {resp}')
     await api.tws.close_async()
 
-asyncio.run(main())
\ No newline at end of file
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
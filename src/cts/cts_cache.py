@@ -1,20 +1,19 @@
 import copy
+import os
 import struct
-from typing import List, Dict, Optional
 from datetime import datetime as dt
 from datetime import timedelta as td
-from pathlib import Path
 
 from core.core_util import encode_field, E_EMPTY
 from cts.cts_cdn import _fetch_all_async
 from cts.cts_cfg import TCLASSES, MONTHLY, QUARTERLY, INS, E_CALL, E_PUT, E_TC_SPX
 
-CACHE_DIR = Path(__file__).resolve().parent /"cache" / "histo"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
-HISTO_CACHE_FILE = CACHE_DIR / "histo_cache.bin"
+# os.path rather than pathlib: a conid lookup should not import pathlib (and re) just to build two paths
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "histo")
+HISTO_CACHE_FILE = os.path.join(CACHE_DIR, "histo_cache.bin")
 HISTO_KEY_FORMAT = "<BBHI"  # 8 bytes total
 
-RECORDS : Dict[bytes, bytes] = {}
+RECORDS : dict[bytes, bytes] = {}
 REQS =[]
 KEYS =[]
 
@@ -87,29 +86,29 @@ async def _all_req_key_from_opt():
         for o in d['ops']:
             _req_key_from_cdn(i,o)
 
-def _req_key_from_cdn(idx:int, l_sym: str) :
+def key_from_cdn(idx:int, l_sym: str) -> bytes:
     """
-    Parse a CDN local symbol into fields suitable for gen_key().
+    Cache key of a CDN local symbol ('SPXW250919C06500000') of INS[idx].
     """
-    cfg=INS[idx]
-    root = cfg["root"]
-    exchange = cfg["xch"]
-    step = cfg["step"]
     tc = encode_field(l_sym[:-15])
     expiry_str = l_sym[-15:-9]  # e.g. '250919'
     expiry = dt.strptime(expiry_str, "%y%m%d")
     if tc == E_TC_SPX:  # adjust AM-settled
         expiry -= td(days=1)
     exp = dt.strftime(expiry, "%Y%m%d")
-    # right = 1 if l_sym[-9] == "C" else 2
-    #req_right = E_CALL if l_sym[-9] == "C" else E_PUT
-    req_right=encode_field(l_sym[9])
+    # right sits right before the 8-digit strike whatever the root length (SPX / SPXW)
+    req_right = encode_field(l_sym[-9])
     strike = float(l_sym[-8:]) / 1000.0
+    return _gen_key(idx, exp, strike, req_right, tc)
 
+def _req_key_from_cdn(idx:int, l_sym: str) :
+    """
+    Parse a CDN local symbol into fields suitable for gen_key().
+    """
     #ib_l_sym = f'{l_sym[:-15].ljust(6)}{l_sym[-15:]}'
     #req = {'lSym':ib_l_sym, 'xch':E_XCH_CBOE, 'sType':E_SEC_OPT, 'exp':exp, 'strike':strike, 'right':req_right}
     #req = {'root': root, 'xch': E_XCH_CBOE, 'tc': tc, 'exp': exp, 'strike': strike,'right': req_right}
-    key = _gen_key(idx, exp, strike, req_right, tc)
+    key = key_from_cdn(idx, l_sym)
     req = decode_key(key)
     if req not in REQS: REQS.append(req)
     if key not in KEYS: KEYS.append(key)
@@ -139,7 +138,7 @@ def _gen_key2(callback) -> bytes:
             yyyy, mm, dd = int(s[:4]), int(s[4:6]), int(s[6:8])
             return int(f"{mm:02d}{dd:02d}{yyyy % 10}")
         raise ValueError(f"Unsupported expiry format: {s}")
-    def _get_index_safe(array: List[bytes], value: bytes) -> int:
+    def _get_index_safe(array: list[bytes], value: bytes) -> int:
         try:
             return array.index(value)
         except ValueError:
@@ -212,7 +211,7 @@ def _gen_key(idx: int , expiry: str| int, strike: float, right: bytes, tc: bytes
             yyyy, mm, dd = int(s[:4]), int(s[4:6]), int(s[6:8])
             return int(f"{mm:02d}{dd:02d}{yyyy % 10}")
         raise ValueError(f"Unsupported expiry format: {s}")
-    def _get_index_safe(array: List[bytes], value: bytes) -> int:
+    def _get_index_safe(array: list[bytes], value: bytes) -> int:
         try:
             return array.index(value)
         except ValueError:
@@ -254,7 +253,7 @@ def decode_key(key):
     return {'root':INS[cfg_idx]['root'], 'xch':INS[cfg_idx]['xch'],'exp':_decode_yyyymmdd(prms[2]), 'strike':strike,'right':right,'tc':TCLASSES[prms[1]] }
 
 
-def load(filepath: Path = HISTO_CACHE_FILE) -> bool:
+def load(filepath: str = HISTO_CACHE_FILE) -> bool:
     def _import_record_from_file(_f) -> bool:
         key = _f.read(8)
         if len(key) < 8:
@@ -264,7 +263,7 @@ def load(filepath: Path = HISTO_CACHE_FILE) -> bool:
         RECORDS[key] = conid_binary
         return True
 
-    if not filepath.exists():
+    if not os.path.exists(filepath):
         print(f"[CACHE] File {filepath} not found")
         return False
     try:
@@ -278,13 +277,13 @@ def load(filepath: Path = HISTO_CACHE_FILE) -> bool:
         return False
 
 
-def save(filepath: Path = HISTO_CACHE_FILE):
+def save(filepath: str = HISTO_CACHE_FILE):
     def _write_record_to_file(_f, _key, _conid_binary):
         _f.write(_key)
         _f.write(struct.pack("<H", len(_conid_binary)))
         _f.write(conid_binary)
 
-    filepath.parent.mkdir(parents=True, exist_ok=True)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
     with open(filepath, "wb") as f:
         for key, conid_binary in sorted(RECORDS.items()):
             _write_record_to_file(f, key, conid_binary)
@@ -304,7 +303,7 @@ def add_record(key: bytes, conid_binary: bytes):
     print(f"[CACHE] {action} {key.hex()} -> {conid_binary}")
     RECORDS[key] = conid_binary
 
-def get_conid(rec: dict) -> Optional[bytes]:
+def get_conid(rec: dict) -> bytes | None:
     extract= copy.deepcopy(enumerate(REQS))
     for k,v in rec.items():
         extract = [x for x in extract if k in x[1].keys() and x[1][k]==v]
@@ -1,15 +1,12 @@
 import copy
 import math
-import asyncio
-import aiohttp
 from datetime import datetime as dt
 
-import requests
-
-#import requests
-
 from cts.cts_cfg import INS
 
+# aiohttp / requests (and asyncio) are imported by the fetchers that use them: importing this
+# module for its parsers must not pay for an HTTP stack
+
 
 # def _filter_options2(pload):
 #     px=pload['spot']
@@ -74,6 +71,8 @@ def get_url(idx):
     return f"https://cdn.cboe.com/api/global/delayed_quotes/options/{INS[idx]['cdn']}.json"
 
 async def _fetch_all_async():
+    import asyncio
+    import aiohttp
     results = {}
     cases = [i for i, x in enumerate(INS) if x['sType'] == b'OPT\x00']
     async with aiohttp.ClientSession(headers={"User-Agent": "Mozilla/5.0"}) as session:
@@ -97,6 +96,7 @@ async def _fetch_one_async(session, idx):
 
 
 def _fetch_all():
+    import requests
     res = []
     # Create a session for connection reuse and set headers
     with requests.Session() as session:
@@ -1,6 +1,4 @@
 # cts_cfg.py
-from datetime import datetime as dt
-from typing import Tuple
 from core.core_util import E_EMPTY
 
 # 8-byte key structure (little-endian)
@@ -179,7 +177,7 @@ def get_mul_index(value): return MULTIPLIERS.index(value)
 CACHE_GLOBAL = {
     "array_size": 65536,
     "strike_range": 127,  # Always ±127 for uint8 encoding
-    "request_delay_sec": 0.005
+    # request pacing is enforced centrally by core_pace (core_cfg.PACING)
 }
 
 # Network settings
@@ -191,8 +189,9 @@ CLIENT_CONFIG = {
     "retry_attempts": 3
 }
 
-def get_day_of_week_occurrence(date_str: str) -> Tuple[str, int]:
+def get_day_of_week_occurrence(date_str: str) -> tuple[str, int]:
     DAY_MAP = ('M', 'T', 'W', 'S', 'F', 'X', 'Z')
+    from datetime import datetime as dt
     parsed_date = dt.strptime(date_str, "%Y%m%d")
     day_char = DAY_MAP[parsed_date.weekday()]
     # Calculate the occurrence of this weekday in the month.
@@ -1,10 +1,18 @@
 #/cts/cts_dll
 from typing import Any
 
-from core.core_util import encode_field, E_EMPTY, E_ZERO, get_fields_if_match
+from core.core_dsp import Dispatcher
+from core.core_err import on_request_error
+from core.core_fv import FrameView
+from core.core_lc import compile_fields
+from core.core_tpl import build_request
+from core.core_util import encode_field, E_EMPTY, E_ZERO
 from cts.cts_cfg import MSG_CONTRACT_DETAILS_END, MSG_CONTRACT_DETAILS, REQ_CONTRACT_DETAILS, MSG_OPT_PARAMS, \
     MSG_OPT_PARAMS_END, E_CUR_USD, VERSION_8, INCLUDE_EXPIRED_FALSE
 
+# exchange, tradingClass, nExp, first four expirations (get_fields_if_match semantics)
+_opt_params_fields = compile_fields(MSG_OPT_PARAMS, (2, 4, 6, 7, 8, 9, 10), keep_nul=True, as_list=True)
+
 MSG = ['msgId', 'version', 'reqId', 'conId', 'symbol', 'secType', 'lastTradeDateOrContractMonth', 'strike', 'right',
        'multiplier', 'exchange', 'primaryExch', 'currency', 'localSymbol', 'tradingClass', 'includeExpired',
        'secIdType', 'secId', 'issuerId']
@@ -23,47 +31,53 @@ def set_opt_params_request(req_id, prms):
 
 
 async def req_sec_def_opt_params(tws, req_id, prms):
-    payload = set_opt_params_request(req_id, prms)
+    payload = build_request(set_opt_params_request, req_id, prms, 1)
     #print(payload)
-    await tws.send_frame_async(payload)
-
-    results = []
+    frames = tws.open_request(req_id, payload)
+    try:
+        await tws.send_frame_async(payload)
+        return await _collect_opt_params(frames, req_id, prms)
+    finally:
+        tws.close_request(req_id)
+
+
+def _on_opt_params(fv, st):
+    tmp = _opt_params_fields(fv.data)
+    if tmp[2]==b'1':
+        res = tmp[:4]
+    elif tmp[2]==b'2':
+        res = tmp[:5]
+    elif tmp[2] == b'3':
+        res = tmp[:6]
+    else:
+        res = tmp[:7]
+    res.pop(2)
+    exps=[]
+    for i in range(2,6):
+        if len(res[i])==9:
+            exps.append(res[i])
+    st[0].append([st[1].get('root', E_EMPTY)]+res[:2]+[exps])
+
+
+def _on_opt_params_end(fv, st):
+    print(f"secDefOptParamsEnd for req_id: {fv.str_field(1)}")
+    return True
+
+
+_OPT_PARAMS = Dispatcher({MSG_OPT_PARAMS: _on_opt_params, MSG_OPT_PARAMS_END: _on_opt_params_end,
+                          b'4': on_request_error})
+
+
+async def _collect_opt_params(frames, req_id, prms):
+    st = ([], prms)
     while True:
-        response = await tws.recv_frame_async()
+        response = await frames.get()
         if not response:
             print("No Response!")
             break
-        #print(response)
-        end_of_field_0 = response.index(b'\x00')
-        idx=response[:end_of_field_0]
-
-        if idx == MSG_OPT_PARAMS:
-            tmp = get_fields_if_match(response, MSG_OPT_PARAMS, (2, 4,6, 7, 8, 9, 10))
-            if tmp[2]==b'1':
-                res = tmp[:4]
-            elif tmp[2]==b'2':
-                res = tmp[:5]
-            elif tmp[2] == b'3':
-                res = tmp[:6]
-            else:
-                res = tmp[:7]
-            res.pop(2)
-            exps=[]
-            for i in range(2,6):
-                if len(res[i])==9:
-                    exps.append(res[i])
-            results.append( [prms.get('root', E_EMPTY)]+res[:2]+[exps])
-        # else:
-        #     print(response)
-        if idx == MSG_OPT_PARAMS_END:
-            print(f"secDefOptParamsEnd for req_id: {req_id}")
+        if _OPT_PARAMS.dispatch(response, st):
             break
-        if idx == b'4':
-            msg = b'No security definition has been found for the request'
-            if msg in response:
-                break
-    #print(f'resul {results}')
-    return results
+    return st[0]
 
 
 
@@ -95,57 +109,57 @@ def set_contract_request(req_id, prms):
     return payload
 
 
+def contract_request(req_id, prms):
+    """set_contract_request through the template cache: only the reqId is encoded per call"""
+    return build_request(set_contract_request, req_id, prms, 2)
+
+
 async def req_cts_det_async(tws, req_id, payload):
     """Request contract details using binary chunks for maximum efficiency"""
     #payload = set_contract_request(req_id, prms)
     #print(payload)
-    await tws.send_frame_async(payload)
+    frames = tws.open_request(req_id, payload)
+    try:
+        await tws.send_frame_async(payload)
+        return await _collect_cts_det(frames, req_id)
+    finally:
+        tws.close_request(req_id)
+
+
+def _on_cts_det(fv, st):
+    st[0] = _get_all_from_callback(fv)
+
 
-    res = None
+def _on_cts_det_end(fv, st):
+    print(f"Contract details end for req_id: {fv.str_field(2)}")
+    return True
+
+
+_CTS_DET = Dispatcher({MSG_CONTRACT_DETAILS: _on_cts_det, MSG_CONTRACT_DETAILS_END: _on_cts_det_end,
+                       b'4': on_request_error})
+
+
+async def _collect_cts_det(frames, req_id):
+    st = [None]
     while True:
-        response = await tws.recv_frame_async()
+        response = await frames.get()
         if not response:
             print("No Response!")
             break
-
-        end_of_field_0 = response.index(b'\x00')
-        idx=response[:end_of_field_0]
-        #print(response)
-        if idx == MSG_CONTRACT_DETAILS:
-            res = _get_all_from_callback(response)
-        if idx == MSG_CONTRACT_DETAILS_END:
-            print(f"Contract details end for req_id: {req_id}")
+        if _CTS_DET.dispatch(response, st):
             break
-        if idx == b'4':
-            msg = b'No security definition has been found for the request'
-            if msg in response:
-                break
-    return res
-
-def _get_conid_from_callback(data: bytes) -> bytes:
-    if not data.startswith(b'10\x00'):
+    return st[0]
+
+def _get_conid_from_callback(fv: FrameView) -> bytes:
+    """conId (field 12) of a contractDetails frame, b'' if not one"""
+    if not fv.is_tag(b'10') or not fv.has(12):
         return b''
-    pos = 0
-    for _ in range(12):  # 13 nulls to reach 12th value
-        pos = data.find(b'\x00', pos) + 1
-        if pos == 0:
-            return b''
-    end = data.find(b'\x00', pos)
-    return data[pos:end] if end != -1 else data[pos:]
-
-def _get_all_from_callback(data: bytes) -> list[Any]:
-    if not data.startswith(b'10\x00'):
+    return fv.field(12)
+
+def _get_all_from_callback(fv: FrameView) -> list[Any]:
+    """symbol, secType, expiry (int), strike (float), right, exchange, tradingClass, conId"""
+    if not fv.is_tag(b'10') or not fv.has(12):
         return []
-    res=[]
-    pos = 0
-    for _ in range(12):  # 13 nulls to reach 12th value
-        pos = data.find(b'\x00', pos) + 1
-        if pos == 0:
-            res.append(b'')
-        end = data.find(b'\x00', pos)
-        res.append(data[pos:end] if end != -1 else data[pos:])
-    tmp= [x+b'\x00' for i,x in enumerate(res) if i in [1,2,3,4,5,6,10,11,12]]
-    tmp[2]=int(tmp[2][:8])
-    tmp[3]=float(tmp[3].replace(b'\x00',b''))
-    return tmp
+    z = fv.field_z
+    return [z(2), z(3), int(fv.field(4)[:8]), fv.float_field(5), z(6), z(7), z(11), z(12)]
 
@@ -10,7 +10,6 @@ from cts.cts_cdn import Cdn, get_filtered_dico_async, get_filtered_dico
 from cts.cts_cfg import TCLASSES, E_XCH_CBOE, E_SEC_FUT, FUT, MONTHLY, QUARTERLY, INS, E_CALL, E_PUT
 
 CACHE_DIR = Path(__file__).resolve().parent /"cache" / "histo"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
 HISTO_CACHE_FILE = CACHE_DIR / "histo_cache.bin"
 HISTO_KEY_FORMAT = "<BBHI"  # 8 bytes total
 
@@ -1,38 +1,63 @@
 #!/usr/bin/env python3
 import asyncio
 
-from core.AsyncTws import AsyncTws
+from core.Tws import Tws
 from cts.cts_cfg import CtsChunks
 from hst.hst_dll import req_historical_data_binary, listen_historical_data, cancel_historical_data, req_one_hst_bar_binary
 
 
 class HstApi:
-    reqId = 0
-    def __init__(self, slot):
-        self.tws = AsyncTws('127.0.0.1', 4002, 'hst', slot)
+    def __init__(self, slot, pool=None):
+        self.tws = Tws('127.0.0.1', 4002, 'hst', slot) if pool is None else None
+        # Optional TwsPool: backfills spread over the least-loaded connections (no private Tws then)
+        self.pool = pool
+        self.reqId = 0  # last reqId issued
+        self._owner = {}
+        # reqId -> queue its bars are routed to from the moment the request goes out
+        self._frames = {}
 
-    def rec_id(self):
-        self.reqId += 1
+    def rec_id(self, tws):
+        # reqIds come from the connection the request goes out on
+        self.reqId = tws.next_req_id()
+        return self.reqId
+
+    def _conn(self):
+        return self.pool.pick() if self.pool is not None else self.tws
 
     async def sub_hst_bar(self, prms):
-        self.rec_id()
-        await req_historical_data_binary(self.tws, self.reqId, prms)
+        tws = self._conn()
+        req_id = self.rec_id(tws)
+        self._owner[req_id] = tws
+        self._frames[req_id] = tws.open_request(req_id)
+        await req_historical_data_binary(tws, req_id, prms)
+        return req_id
 
-    async def stream_hst_bar(self, duration_sec=30):
-        await listen_historical_data(self.tws, duration_sec=30)
+    async def stream_hst_bar(self, duration_sec=30, req_id=None):
+        """Collect the bars of a sub_hst_bar request (the last one by default)"""
+        req_id = self.reqId if req_id is None else req_id
+        tws = self._owner.get(req_id, self.tws)
+        hst = await listen_historical_data(tws, duration_sec, self._frames.get(req_id))
+        if hst.get('bars') is not None and req_id in self._frames:
+            del self._frames[req_id]
+            tws.close_request(req_id)
+        return hst
 
-    async def cancel_historical_data(self):
-        self.rec_id()
-        await cancel_historical_data(self.tws, self.reqId)
+    async def cancel_historical_data(self, req_id=None):
+        """Cancel a sub_hst_bar request (the last one by default)"""
+        req_id = self.reqId if req_id is None else req_id
+        tws = self._owner.pop(req_id, self.tws)
+        if self._frames.pop(req_id, None) is not None:
+            tws.close_request(req_id)
+        await cancel_historical_data(tws, req_id)
 
     async def req_one_hst_bar(self, prms):
-        self.rec_id()
-        return await req_one_hst_bar_binary(self.tws, self.reqId, prms)
+        tws = self._conn()
+        return await req_one_hst_bar_binary(tws, self.rec_id(tws), prms)
 
 
 async def main():
     api = HstApi(3)
-    await api.tws.connect()
+    await api.tws.connect_async()
 
     #prms={'symbol':CtsChunks.ES,'expiry':'202509','exchange':CtsChunks.EXCH_CME,'secType':CtsChunks.SEC_FUT}
     prms={'symbol':CtsChunks.CL,'expiry':'202510','exchange':CtsChunks.EXCH_NYMEX,'secType':CtsChunks.SEC_FUT}
@@ -46,7 +71,7 @@ async def main():
         # print(len(ff[1]))
 
 
-    await api.tws.close()
+    await api.tws.close_async()
 
 
 if __name__ == "__main__":
@@ -1,13 +1,19 @@
 #!/usr/bin/env python3
-import copy
-import socket
-from core.core_util import encode_field, E_EMPTY, E_ZERO, get_fields_if_match
-from cts.cts_cfg import CtsChunks
+import asyncio
+from core.core_dsp import Dispatcher
+from core.core_err import is_info, on_request_error
+from core.core_lc import compile_fields
+from core.core_util import encode_field, E_EMPTY, E_ZERO
+from core.core_tpl import build_request
+from cts.cts_cfg import CtsChunks, INCLUDE_EXPIRED_FALSE
 from hst.hst_cfg import HstChunks
 from datetime import datetime as dt
 
 from mkt.mkt_cfg import MktChunks
 
+# startDateTime and first bar close of a historicalData frame
+_hst_bar_fields = compile_fields(HstChunks.MSG_HST_DATA, (2, 9), keep_nul=True, as_list=True)
+
 # Historical data request field array (from Java source)
 HIST_MSG = ['msgId', 'version', 'reqId', 'conId', 'symbol', 'secType', 'lastTradeDateOrContractMonth',
             'strike', 'right', 'multiplier', 'exchange', 'primaryExch', 'currency', 'localSymbol',
@@ -46,10 +52,45 @@ async def req_historical_data_binary(tws, req_id, prms):
 
     # Concatenate all binary chunks
     payload = b''.join(payload_parts)
-    await tws.send_frame(payload)
+    await tws.pacer.pace_hst()
+    await tws.send_frame_async(payload)
+
+def _on_hst_data(fv, hst):
+    rec_sz=8
+    nb = fv.int_field(4)
+    hst.clear()
+    hst.update({'req_id':fv.str_field(1),'strt':dt.strptime(fv.str_field(2)[:-11],'%Y%m%d %H:%M:%S'),'end':dt.strptime(fv.str_field(3)[:-11],'%Y%m%d %H:%M:%S'), 'bar_count':nb ,'bars':[]})
+    print(hst)
+    k = 5
+    for i in range(nb):
+        # date, open, high, low, close, volume, wap, count
+        rec = [dt.strptime(fv.str_field(k)[:-11], '%Y%m%d %H:%M:%S').timestamp(),
+               fv.float_field(k + 1), fv.float_field(k + 2), fv.float_field(k + 3), fv.float_field(k + 4),
+               fv.int_field(k + 5), fv.float_field(k + 6), fv.int_field(k + 7)]
+        k += rec_sz
+        print(rec)
+        hst['bars'].append(rec)
+
+
+def _on_hst_end(fv, hst):
+    print(f"Historical data end for req_id: {fv.str_field(1)}")
+    return True
+
+
+def _on_hst_error(fv, hst):
+    if fv.has(3) and is_info(fv.int_field(3, -1)):
+        print(f"Info message: {fv.str_field(4) if fv.has(4) else 'N/A'}")
+        return False
+    print(f"Error: {bytes(fv)}")
+    return True
+
+
+_HST_LISTEN = Dispatcher({HstChunks.MSG_HST_DATA: _on_hst_data, HstChunks.MSG_HST_DATA_END: _on_hst_end,
+                          b"4": _on_hst_error})
 
-async def listen_historical_data(tws, duration_sec=30):
-    """Listen for historical data callbacks"""
+
+async def listen_historical_data(tws, duration_sec=30, frames=None):
+    """Listen for historical data callbacks (on the request's own queue if given, else the unrouted stream)"""
     import time
     start_time = time.time()
     hst = {}
@@ -57,68 +98,29 @@ async def listen_historical_data(tws, duration_sec=30):
     print(f"Listening for historical data for {duration_sec} seconds...")
 
     while time.time() - start_time < duration_sec:
-        tws.sock.settimeout(1.0)
         try:
-            response = tws.recv_frame()
+            response = await asyncio.wait_for(frames.get() if frames is not None else tws.recv_frame_async(), 1.0)
             if not response:
                 continue
-
-            fields = response.decode('utf-8', 'replace').rstrip('\x00').split('\x00')
-
-            if fields[0] == "17":  # historicalData
-                rec_sz=8
-                nb =int(fields[4])
-                tmp=copy.deepcopy(fields)
-                tmp=tmp[5:]
-                hst={'req_id':fields[1],'strt':dt.strptime(fields[2][:-11],'%Y%m%d %H:%M:%S'),'end':dt.strptime(fields[3][:-11],'%Y%m%d %H:%M:%S'), 'bar_count':nb ,'bars':[]}
-                print(hst)
-                for i in range(nb):
-                    rec = []
-                    for j in range(rec_sz):
-                        val=tmp.pop(0)
-                        if j in [1,2,3,4,6]:
-                            val=float(val)
-                        elif j in [5,7]:
-                            val=int(val)
-                        elif j == 0 and len(val)==27:
-                            val = dt.strptime(val[:17], '%Y%m%d %H:%M:%S').timestamp()
-                        rec.append(val)
-                    print(rec)
-
-                    rec[0] = copy.deepcopy(dt.strptime(rec[0][:-11],'%Y%m%d %H:%M:%S').timestamp())
-                    hst['bars'].append(rec)
-                #print (hst)
-
-
-            elif fields[0] == "18":  # historicalDataEnd
-                print(f"Historical data end for req_id: {fields[1]}")
+            if _HST_LISTEN.dispatch(response, hst):
                 break
 
-            elif fields[0] == "4":  # error
-                if len(fields) > 3 and fields[3] in ['2104', '2107', '2158']:
-                    print(f"Info message: {fields[4] if len(fields) > 4 else 'N/A'}")
-                else:
-                    print(f"Error: {fields}")
-                    break
-
-        except socket.timeout:
+        except asyncio.TimeoutError:
             continue
         except Exception as e:
             print(f"Error receiving data: {e}")
             break
 
-    await tws.sock.settimeout(None)
     return hst
 
 async def cancel_historical_data(tws, req_id):
     """Cancel historical data request"""
     payload = f"25\x001\x00{req_id}\x00".encode('ascii')
-    await tws.send_frame(payload)
+    await tws.send_frame_async(payload)
 
 
-async def req_one_hst_bar_binary(tws, req_id, prms):
-    """Request historical data using binary chunks for maximum efficiency"""
-    # Build payload using pre-encoded binary chunks
+def set_one_hst_bar_request(req_id, prms):
+    """reqHistoricalData for one bar, from pre-encoded binary chunks"""
     payload_parts = [
         HstChunks.REQ_HST_DATA,  # msgId: 20
         #HstBinaryChunks.VERSION_6,  # version: 6 (only if server < 124)
@@ -132,10 +134,10 @@ async def req_one_hst_bar_binary(tws, req_id, prms):
         encode_field(prms.get('multiplier', '')),  # multiplier
         prms.get('exchange', E_EMPTY),  # exchange
         E_EMPTY,  # primaryExch
-        CtsChunks.CUR_USD,  # currency
+        CtsChunks.E_CUR_USD,  # currency
         E_EMPTY,  # localSymbol
         E_EMPTY,  # tradingClass
-        CtsChunks.INCLUDE_EXPIRED_FALSE,  # includeExpired
+        INCLUDE_EXPIRED_FALSE,  # includeExpired
         encode_field(prms.get('endDateTime', '')),  # endDateTime
         prms.get('barSizeSetting', HstChunks.BAR_SIZE_1_DAY),  # barSizeSetting
         prms.get('durationString',HstChunks.DURATION_1_DAY),  # durationString
@@ -147,32 +149,42 @@ async def req_one_hst_bar_binary(tws, req_id, prms):
     ]
 
     # Concatenate all binary chunks
-    payload = b''.join(payload_parts)
-    #print(payload)
-    await tws.send_frame(payload)
+    return b''.join(payload_parts)
+
+
+async def req_one_hst_bar_binary(tws, req_id, prms):
+    """Request one historical bar; the payload comes from the per-instrument template cache"""
+    payload = build_request(set_one_hst_bar_request, req_id, prms, 1)
+    frames = tws.open_request(req_id, payload)
+    try:
+        await tws.pacer.pace_hst()
+        await tws.send_frame_async(payload)
+        return await _collect_one_hst_bar(frames, req_id)
+    finally:
+        tws.close_request(req_id)
+
+
+def _on_one_hst_bar(fv, st):
+    st[0] = _hst_bar_fields(fv.data)
+    return True
+
 
-    results = None
+def _on_one_hst_bar_end(fv, st):
+    print(f"Hst Bar end for req_id: {fv.str_field(1)}")
+    return True
+
+
+_ONE_HST_BAR = Dispatcher({HstChunks.MSG_HST_DATA: _on_one_hst_bar, HstChunks.MSG_HST_DATA_END: _on_one_hst_bar_end,
+                           b'4': on_request_error})
+
+
+async def _collect_one_hst_bar(frames, req_id):
+    st = [None]
     while True:
-        response = await tws.recv_frame()
+        response = await frames.get()
         if not response:
             print("No Response!")
             break
-        #print(response)
-        end_of_field_0 = response.index(b'\x00')
-        idx=response[:end_of_field_0]
-
-        if idx == HstChunks.MSG_HST_DATA:
-            res = get_fields_if_match(response, HstChunks.MSG_HST_DATA, (2,9))
-            results=res
-            #print(res)
+        if _ONE_HST_BAR.dispatch(response, st):
             break
-        if idx == str(req_id).encode('ascii') :
-            print(f"Hst Bar end for req_id: {req_id}")
-            break
-        if idx == b'4':
-            msg = b'No security definition has been found for the request'
-            if msg in response:
-                break
-        else:
-            continue
-    return results
\ No newline at end of file
+    return st[0]
@@ -2,6 +2,7 @@
 import asyncio
 
 from core.Tws import Tws
+from core.core_cfg import SUB_QUEUE
 from core.core_util import E_EMPTY
 from cts.cts_cfg import CtsChunks
 from mkt.mkt_dll import cancel_mkt_data, sub_rt_bar_async, sub_mkt_data_async, stream_mkt_data, req_mkt_data, \
@@ -9,47 +10,73 @@ from mkt.mkt_dll import cancel_mkt_data, sub_rt_bar_async, sub_mkt_data_async, s
 
 
 class MktApi:
-    reqId = 0
-    def __init__(self,slot):
-        self.tws=Tws('127.0.0.1',4012,'mkt',slot)
-    def rec_id(self):
-        self.reqId += 1
+    def __init__(self,slot,pool=None):
+        self.tws = Tws('127.0.0.1', 4012, 'mkt', slot) if pool is None else None
+        # Optional TwsPool: subscriptions spread over the least-loaded connections (no private Tws then)
+        self.pool = pool
+        self.reqId = 0  # last reqId issued
+        self._owner = {}
+        # Subscriptions re-sent after a reconnect get new wire reqIds: api id <-> wire id
+        self._wire = {}
+        self._api = {}
+        # every connection of the pool, connected yet or not: live is empty until connect_async
+        for t in (self.pool.conns if self.pool is not None else [self.tws]):
+            if t.sup is not None:
+                t.sup.on_resub = self._on_resub
+    def rec_id(self, tws):
+        # reqIds come from the connection the request goes out on (windows never overlap)
+        self.reqId = tws.next_req_id()
+        return self.reqId
+    def _conn(self):
+        return self.pool.pick() if self.pool is not None else self.tws
+    def _conns(self):
+        return self.pool.live if self.pool is not None else [self.tws]
+
+    def _on_resub(self, old, new):
+        api_id = self._api.pop(old, old)
+        self._api[new] = api_id
+        self._wire[api_id] = new
 
     def sub_rt_bar(self, prms):
-        self.rec_id()
-        sub_rt_bar(self.tws, self.reqId, prms)
+        sub_rt_bar(self.tws, self.rec_id(self.tws), prms)
 
     async def sub_rt_bar_async(self, prms):
-        self.rec_id()
-        await sub_rt_bar_async(self.tws, self.reqId, prms)
+        tws = self._conn()
+        req_id = self.rec_id(tws)
+        self._owner[req_id] = tws
+        await sub_rt_bar_async(tws, req_id, prms)
 
     def sub_mkt_data(self, prms):
-        self.rec_id()
-        return sub_mkt_data(self.tws, self.reqId, prms)
+        return sub_mkt_data(self.tws, self.rec_id(self.tws), prms)
 
-    async def sub_mkt_data_async(self, prms):
-        self.rec_id()
-        return await sub_mkt_data_async(self.tws, self.reqId, prms)
+    async def sub_mkt_data_async(self, prms, queue_policy=SUB_QUEUE["policy"]):
+        tws = self._conn()
+        req_id = self.rec_id(tws)
+        self._owner[req_id] = tws
+        return await sub_mkt_data_async(tws, req_id, prms, queue_policy)
 
     def stream_mkt_data(self,  duration_sec=10):
         return stream_mkt_data(self.tws, duration_sec)
 
     async def stream_mkt_data_async(self, duration_sec=10):
-        return await stream_mkt_data_async(self.tws, duration_sec)
+        res = await asyncio.gather(*(stream_mkt_data_async(t, duration_sec) for t in self._conns()))
+        # keyed by the api reqId, not the wire id a reconnect may have given the subscription
+        return {self._api.get(req_id, req_id): rec for part in res for req_id, rec in part.items()}
 
     def cancel_mkt_data(self,req_id):
         return cancel_mkt_data(self.tws, req_id)
 
     async def cancel_mkt_data_async(self, req_id):
-        return await cancel_mkt_data_async(self.tws, req_id)
+        wire_id = self._wire.pop(req_id, req_id)
+        self._api.pop(wire_id, None)
+        return await cancel_mkt_data_async(self._owner.pop(req_id, self.tws), wire_id)
 
     def req_mkt_data(self, prms):
-        self.rec_id()
-        return req_mkt_data(self.tws, self.reqId, prms)
+        return req_mkt_data(self.tws, self.rec_id(self.tws), prms)
 
     async def req_mkt_data_async(self, prms):
-        self.rec_id()
-        return await req_mkt_data_async(self.tws, self.reqId, prms)
+        tws = self._conn()
+        return await req_mkt_data_async(tws, self.rec_id(tws), prms)
 
 async def main():
     api = MktApi(3)
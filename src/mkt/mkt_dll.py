@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
 
-import socket
+import asyncio
 
 from datetime import datetime as dt
 
+from core.core_bq import SubQueue, CONFLATE
+from core.core_cfg import SUB_QUEUE
+from core.core_dsp import Dispatcher, stop
+from core.core_err import RequestError, is_info, on_request_error
+from core.core_tpl import build_request, request_template
+from core.core_trc import TRC
 from core.core_util import encode_field, E_EMPTY, E_ZERO
 from cts.cts_cfg import CtsChunks
 from mkt.mkt_cfg import MktChunks
@@ -15,38 +21,49 @@ REQ_MKT_MSG = ['MsgID','Version','reqId',
 
 
 def _set_rt_bar_pld(req_id, prms):
-    # Build payload using pre-encoded binary chunks
+    # Build payload using pre-encoded binary chunks (same prms keys as _set_mkt_data_pld)
     payload_parts = [MktChunks.REQ_RT_BAR_DATA,
                      MktChunks.VERSION_3,
                      encode_field(req_id),
-                     encode_field(prms.get('conId', '')),
-                     encode_field(prms.get('symbol', '')),
-                     CtsChunks.get_sectype_chunk_end(prms.get('secType', '')),
-                     encode_field(prms.get('expiry', '')),
+                     prms.get('conId', E_EMPTY),
+                     prms.get('root', E_EMPTY),
+                     prms.get('sType', E_EMPTY),
+                     encode_field(prms.get('exp', '')),
                      encode_field(prms.get('strike', '0')),
-                     encode_field(prms.get('right', '0')),
-                     encode_field(prms.get('mul', '')),
-                     CtsChunks.get_exchange_chunk_end(prms.get('xch', '')),
-                     E_EMPTY,
-                     CtsChunks.CUR_USD,
-                     E_EMPTY,
+                     prms.get('right', E_EMPTY),
+                     prms.get('mul', E_EMPTY),
+                     prms.get('xch', E_EMPTY),
                      E_EMPTY,
+                     prms.get('cur', CtsChunks.E_CUR_USD),
+                     prms.get('lSym', E_EMPTY),
+                     prms.get('tc', E_EMPTY),
                      MktChunks.RT_BAR_SIZE,
                      MktChunks.get_what_to_show_chunk(prms.get('whatToShow', 'BID')),
                      encode_field(prms.get('useRth', '0')),
                      MktChunks.RT_BAR_OPTIONS_EMPTY]
     # Concatenate all binary chunks
-    return b'\x00'.join(payload_parts)
+    return b''.join(payload_parts)
 
 
 def sub_rt_bar(tws, req_id, prms):
-    payload = _set_rt_bar_pld(req_id, prms)
+    payload = build_request(_set_rt_bar_pld, req_id, prms, 2)
     tws.send_frame(payload)
 
 
 async def sub_rt_bar_async(tws, req_id, prms):
-    payload = _set_rt_bar_pld(req_id, prms)
-    await tws.send_frame(payload)
+    tpl = request_template(_set_rt_bar_pld, prms, 2)
+    tws.subs[req_id] = tpl.build
+    await tws.send_frame_async(tpl.build(req_id))
+
+
+async def cancel_rt_bar_async(tws, req_id):
+    """Cancel real time bars"""
+    payload = f"51\x001\x00{req_id}\x00".encode('ascii')
+    tws.subs.pop(req_id, None)
+    q = tws.close_request(req_id)
+    if q is not None:
+        q.put_nowait(None)
+    return await tws.send_frame_async(payload)
 
 
 def _set_mkt_data_pld(req_id, prms, snapshot: bool):
@@ -86,19 +103,23 @@ def _set_mkt_data_pld(req_id, prms, snapshot: bool):
         MktChunks.MKT_OPTIONS_EMPTY  # Field 19: mktDataOptions
     ]
 
-    res = b''.join(payload_parts)
-    print(res)
-    return res
+    return b''.join(payload_parts)
 
 
 
 def sub_mkt_data(tws, req_id, prms):
-    payload = _set_mkt_data_pld(req_id, prms, False)
+    payload = build_request(_set_mkt_data_pld, req_id, prms, 2, False)
     return tws.send_frame(payload)
 
-async def sub_mkt_data_async(tws, req_id, prms):
-    payload = _set_mkt_data_pld(req_id, prms, False)
-    return await tws.send_frame_async(payload)
+async def sub_mkt_data_async(tws, req_id, prms, queue_policy=SUB_QUEUE["policy"]):
+    """The subscription's frames go to a bounded SubQueue of its own (block | drop_oldest | conflate),
+    returned. queue_policy=None registers nothing: the caller has its own route (add_route)"""
+    tpl = request_template(_set_mkt_data_pld, prms, 2, False)
+    await tws.pacer.acquire_line()
+    q = tws.open_subscription(req_id, queue_policy) if queue_policy is not None else None
+    tws.subs[req_id] = tpl.build
+    await tws.send_frame_async(tpl.build(req_id))
+    return q
 
 def cancel_mkt_data(tws, req_id):
     """Cancel market data subscription"""
@@ -108,281 +129,168 @@ def cancel_mkt_data(tws, req_id):
 async def cancel_mkt_data_async(tws, req_id):
     """Cancel market data subscription"""
     payload = f"2\x001\x00{req_id}\x00".encode('ascii')
+    if tws.subs.pop(req_id, None) is not None:
+        tws.pacer.release_line()
+    q = tws.close_request(req_id)
+    if q is not None:
+        q.put_nowait(None)
     return await tws.send_frame_async(payload)
 
+def _opt_key(rec):
+    return rec['tickType']
+
+
+def _ins(ins, req_id):
+    rec = ins.get(req_id)
+    if rec is None:
+        rec = ins[req_id] = {k: SubQueue(policy=p, key=_opt_key if p == CONFLATE else None)
+                             for k, p in SUB_QUEUE["records"].items()}
+    return rec
+
+
+def _on_rt_bar(fv, ins):
+    rec= {'ts':fv.int_field(3),'op':fv.float_field(4),'hi':fv.float_field(5),'lo':fv.float_field(6),'cl':fv.float_field(7)}
+    _ins(ins, fv.int_field(2))['bar'].put_nowait(rec)
+    if TRC.wire_on:
+        print(rec)
+
+
+def _on_tick_opt(fv, ins):
+    if fv.int_field(2) in (10, 11, 13):
+        f = fv.float_field
+        rec = {
+            'reqId': fv.str_field(1),
+            'tickType': fv.str_field(2),
+            'iv': int(f(4)*1000000),
+            'dl': int(f(5)*1000000),
+            'oPx': int(f(6)*1000),
+            #'dv': int(f(7),1),
+            'gm': int(f(8)*1000000),
+            'vg': int(f(9)*1000000),
+            'th': int(f(10)*1000000),
+            'uPx': int(f(11)*1000),
+        }
+        _ins(ins, fv.int_field(1))['opt'].put_nowait(rec)
+        if TRC.wire_on:
+            print(rec)
+
+
+def _on_tick_price(fv, ins):
+    if TRC.wire_on and fv.int_field(3) in (1, 2, 3, 4):
+        print(bytes(fv))
+
+
+def _on_tick_size(fv, ins):
+    if TRC.wire_on and fv.field(3) == b"8":
+        print(bytes(fv))
+
+
+def _on_tick_string(fv, ins):
+    tick = fv.field(3)
+    if tick == b"45":
+        if TRC.wire_on:
+            print(dt.fromtimestamp(fv.int_field(4)))
+    elif tick == b"48":
+        tmp=fv.str_field(4).split(';')
+        last=float(tmp[0])
+        sz = int(tmp[1].split('.')[0])
+        ts=dt.fromtimestamp(float(tmp[2])/1000)
+        vol=int(tmp[3].split('.')[0])
+        vwap=float(tmp[4])
+        rec ={'ts':ts,'px':last,'sz':sz,'vol':vol,'vwap':vwap}
+        _ins(ins, fv.int_field(2))['trd'].put_nowait(rec)
+
+
+def _on_mkt_error(fv, ins):
+    if fv.has(3) and is_info(fv.int_field(3, -1)):
+        print(f"Info message: {fv.str_field(4) if fv.has(4) else 'N/A'}")
+    else:
+        print(f"Error: {bytes(fv)}")
+        TRC.dump(last=32)
+
+
+# realtimeBar, tickOptionComputation, tickPrice, tickSize, tickString, error; ctx: reqId -> records
+_MKT_STREAM = Dispatcher({b"50": _on_rt_bar, b"21": _on_tick_opt, b"1": _on_tick_price, b"2": _on_tick_size,
+                          b"46": _on_tick_string, b"4": _on_mkt_error})
+
+
+def _records(ins) -> dict:
+    """reqId -> {'bar' | 'opt' | 'trd': records kept by the SUB_QUEUE['records'] buffers}"""
+    return {req_id: {k: q.drain() for k, q in rec.items()} for req_id, rec in ins.items()}
+
+
 def stream_mkt_data(tws, duration_sec=10):
-    """Listen for trade data callbacks for specified duration"""
+    """Listen for trade data callbacks for specified duration; returns the records per reqId"""
     import time
     start_time = time.time()
-    trade_records = []
 
     print(f"Listening for trade data for {duration_sec} seconds...")
 
     ins = {}
     while time.time() - start_time < duration_sec:
-        tws.sock.settimeout(1.0)  # 1 second timeout
         try:
             response = tws.recv_frame()
             if not response:
                 continue
+            _MKT_STREAM.dispatch(response, ins)
 
-            print(response)
-
-            fields = response.decode('utf-8', 'replace').rstrip('\x00').split('\x00')
-            id = int(fields[3])
-            if fields[3] not in ins.keys():
-                ins[id]={'bar':[],'opt':[],'trd':[]}
-
-
-            if fields[0] == "50":
-                rec= {'ts':int(fields[3]),'op':float(fields[4]),'hi':float(fields[5]),'lo':float(fields[6]),'cl':float(fields[7])}
-                ins[id]['bar'].append(rec)
-                print(rec)
-
-            if fields[0] == "21":
-                if int(fields[2]) in [10,11,13]:
-                    #print(fields)
-                    # rec = {
-                    #     'reqId': fields[1],
-                    #     'tickType': fields[2],
-                    #     'iv': round(float(fields[4]),6),
-                    #     'dl': round(float(fields[5]),6),
-                    #     'oPx': round(float(fields[6]),2),
-                    #     #'dv': round(float(fields[7]),1),
-                    #     'gm': round(float(fields[8]),6),
-                    #     'vg': round(float(fields[9]),6),
-                    #     'th': round(float(fields[10]),6),
-                    #     'uPx': round(float(fields[11]),2),
-                    # }
-                    rec = {
-                        'reqId': fields[1],
-                        'tickType': fields[2],
-                        'iv': int(float(fields[4])*1000000),
-                        'dl': int(float(fields[5])*1000000),
-                        'oPx': int(float(fields[6])*1000),
-                        #'dv': int(float(fields[7]),1),
-                        'gm': int(float(fields[8])*1000000),
-                        'vg': int(float(fields[9])*1000000),
-                        'th': int(float(fields[10])*1000000),
-                        'uPx': int(float(fields[11])*1000),
-                    }
-                    ins[id]['opt'].append(rec)
-                    print(rec)
-
-
-            if fields[0] == "1":  # tickPrice
-                if int(fields[3]) in [1,2,3,4]:
-                    print(fields)
-
-
-            elif fields[0] == "2":  # tickSize
-                if fields[3] == "8":
-                    print(fields)
-
-            elif fields[0] == "46":  # ts
-                if fields[3] == "45":
-                    print(dt.fromtimestamp(int(fields[4])))
-                elif fields[3] == "48":
-                    #print(fields)
-                    tmp=fields[4].split(';')
-                    #print(rec)
-                    last=float(tmp[0])
-                    sz = int(tmp[1].split('.')[0])
-                    ts=dt.fromtimestamp(float(tmp[2])/1000)
-                    vol=int(tmp[3].split('.')[0])
-                    vwap=float(tmp[4])
-                    rec ={'ts':ts,'px':last,'sz':sz,'vol':vol,'vwap':vwap}
-                    ins[id]['trd'].append(rec)
-
-
-            elif fields[0] == "4":  # error
-                if len(fields) > 3 and fields[3] in ['2104', '2107', '2158']:
-                    print(f"Info message: {fields[4] if len(fields) > 4 else 'N/A'}")
-                else:
-                    print(f"Error: {fields}")
-
-        except socket.timeout:
-            continue
         except Exception as e:
             print(f"Error receiving data: {e}")
+            TRC.dump(last=32)
             break
 
-    tws.sock.settimeout(None)  # Reset timeout
-    return trade_records
+    return _records(ins)
 
 
-async def stream_mkt_data_async(tws, duration_sec=10):
-    """Listen for trade data callbacks for specified duration"""
-    import time
-    start_time = time.time()
-    trade_records = []
+async def _pump(get, ins):
+    while True:
+        response = await get()
+        if response is None:
+            return
+        try:
+            _MKT_STREAM.dispatch(response, ins)
+        except Exception as e:
+            print(f"Error receiving data: {e}")
+
 
+async def stream_mkt_data_async(tws, duration_sec=10):
+    """
+    Listen for trade data callbacks for specified duration; returns the records per reqId.
+    Reads the subscription queues of tws (sub_mkt_data_async) and the unrouted stream.
+    """
     print(f"Listening for trade data for {duration_sec} seconds...")
 
     ins = {}
-    while time.time() - start_time < duration_sec:
-        #tws.set_time_out(1.0)  # 1 second timeout
-        try:
-            response = await tws.recv_frame_async()
-            if not response:
-                continue
+    gets = [q.get for q in map(tws._routes.get, list(tws.subs)) if isinstance(q, SubQueue)]
+    gets.append(tws.recv_frame_async)
+    tasks = [asyncio.create_task(_pump(get, ins)) for get in gets]
+    try:
+        await asyncio.wait(tasks, timeout=duration_sec)
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return _records(ins)
 
-            print(response)
-
-            # fields = response.decode('utf-8', 'replace').rstrip('\x00').split('\x00')
-            # id = int(fields[3])
-            # if fields[3] not in ins.keys():
-            #     ins[id]={'bar':[],'opt':[],'trd':[]}
-            #
-            #
-            # if fields[0] == "50":
-            #     rec= {'ts':int(fields[3]),'op':float(fields[4]),'hi':float(fields[5]),'lo':float(fields[6]),'cl':float(fields[7])}
-            #     ins[id]['bar'].append(rec)
-            #     print(rec)
-            #
-            # if fields[0] == "21":
-            #     if int(fields[2]) in [10,11,13]:
-            #         rec = {
-            #             'reqId': fields[1],
-            #             'tickType': fields[2],
-            #             'iv': int(float(fields[4])*1000000),
-            #             'dl': int(float(fields[5])*1000000),
-            #             'oPx': int(float(fields[6])*1000),
-            #             #'dv': int(float(fields[7]),1),
-            #             'gm': int(float(fields[8])*1000000),
-            #             'vg': int(float(fields[9])*1000000),
-            #             'th': int(float(fields[10])*1000000),
-            #             'uPx': int(float(fields[11])*1000),
-            #         }
-            #         ins[id]['opt'].append(rec)
-            #         print(rec)
-            #
-            #
-            # if fields[0] == "1":  # tickPrice
-            #     if int(fields[3]) in [1,2,3,4]:
-            #         print(fields)
-            #
-            #
-            # elif fields[0] == "2":  # tickSize
-            #     if fields[3] == "8":
-            #         print(fields)
-            #
-            # elif fields[0] == "46":  # ts
-            #     if fields[3] == "45":
-            #         print(dt.fromtimestamp(int(fields[4])))
-            #     elif fields[3] == "48":
-            #         #print(fields)
-            #         tmp=fields[4].split(';')
-            #         #print(rec)
-            #         last=float(tmp[0])
-            #         sz = int(tmp[1].split('.')[0])
-            #         ts=dt.fromtimestamp(float(tmp[2])/1000)
-            #         vol=int(tmp[3].split('.')[0])
-            #         vwap=float(tmp[4])
-            #         rec ={'ts':ts,'px':last,'sz':sz,'vol':vol,'vwap':vwap}
-            #         ins[id]['trd'].append(rec)
-            #
-            #
-            # elif fields[0] == "4":  # error
-            #     if len(fields) > 3 and fields[3] in ['2104', '2107', '2158']:
-            #         print(f"Info message: {fields[4] if len(fields) > 4 else 'N/A'}")
-            #     else:
-            #         print(f"Error: {fields}")
-
-        except socket.timeout:
-            continue
-        except Exception as e:
-            print(f"Error receiving data: {e}")
-            break
 
-    #tws.set_time_out(None)  # Reset timeout
-    return trade_records
+_MKT_SNAPSHOT = Dispatcher({b"57": stop, b"88": stop,  # tickSnapshotEnd, headTimestamp (the original end tag)
+                           b"4": on_request_error})
 
 
 def req_mkt_data(tws, req_id, prms):
-    payload = _set_mkt_data_pld(req_id, prms, True)
-    print(payload)
+    payload = build_request(_set_mkt_data_pld, req_id, prms, 2, True)
     tws.send_frame(payload)
 
     trade_records = []
-
-    ins = {}
     while True:
         #tws.sock.settimeout(1.0)  # 1 second timeout
         try:
             response = tws.recv_frame()
             if not response:
                 continue
+            if _MKT_SNAPSHOT.dispatch(response):
+                break
 
-            end_of_field_0 = response.index(b'\x00')
-            idx = response[:end_of_field_0]
-            # print(response)
-            print(idx)
-
-            print(response)
-
-            # fields = response.decode('utf-8', 'replace').rstrip('\x00').split('\x00')
-            # id = int(fields[3])
-            # if fields[3] not in ins.keys():
-            #     ins[id]={'bar':[],'opt':[],'trd':[]}
-            #
-            #
-            # if fields[0] == "50":
-            #     rec= {'ts':int(fields[3]),'op':float(fields[4]),'hi':float(fields[5]),'lo':float(fields[6]),'cl':float(fields[7])}
-            #     ins[id]['bar'].append(rec)
-            #     print(rec)
-            #
-            # if fields[0] == "21":
-            #     if int(fields[2]) in [10,11,13]:
-            #         rec = {
-            #             'reqId': fields[1],
-            #             'tickType': fields[2],
-            #             'iv': int(float(fields[4])*1000000),
-            #             'dl': int(float(fields[5])*1000000),
-            #             'oPx': int(float(fields[6])*1000),
-            #             #'dv': int(float(fields[7]),1),
-            #             'gm': int(float(fields[8])*1000000),
-            #             'vg': int(float(fields[9])*1000000),
-            #             'th': int(float(fields[10])*1000000),
-            #             'uPx': int(float(fields[11])*1000),
-            #         }
-            #         ins[id]['opt'].append(rec)
-            #         print(rec)
-            #
-            #
-            # if fields[0] == "1":  # tickPrice
-            #     if int(fields[3]) in [1,2,3,4]:
-            #         print(fields)
-            #
-            #
-            # elif fields[0] == "2":  # tickSize
-            #     if fields[3] == "8":
-            #         print(fields)
-            #
-            # elif fields[0] == "46":  # ts
-            #     if fields[3] == "45":
-            #         print(dt.fromtimestamp(int(fields[4])))
-            #     elif fields[3] == "48":
-            #         #print(fields)
-            #         tmp=fields[4].split(';')
-            #         #print(rec)
-            #         last=float(tmp[0])
-            #         sz = int(tmp[1].split('.')[0])
-            #         ts=dt.fromtimestamp(float(tmp[2])/1000)
-            #         vol=int(tmp[3].split('.')[0])
-            #         vwap=float(tmp[4])
-            #         rec ={'ts':ts,'px':last,'sz':sz,'vol':vol,'vwap':vwap}
-            #         ins[id]['trd'].append(rec)
-            #
-            #
-            # elif fields[0] == "4":  # error
-            #     if len(fields) > 3 and fields[3] in ['2104', '2107', '2158']:
-            #         print(f"Info message: {fields[4] if len(fields) > 4 else 'N/A'}")
-            #     else:
-            #         print(f"Error: {fields}")
-
-        except socket.timeout:
-            continue
         except Exception as e:
             print(f"Error receiving data: {e}")
             break
@@ -390,95 +298,34 @@ def req_mkt_data(tws, req_id, prms):
     #tws.sock.settimeout(None)  # Reset timeout
     return trade_records
 
+
 async def req_mkt_data_async(tws, req_id, prms):
-    payload = _set_mkt_data_pld(req_id, prms, True)
-    print(payload)
-    await tws.send_frame(payload)
+    payload = build_request(_set_mkt_data_pld, req_id, prms, 2, True)
+    frames = tws.open_request(req_id, payload)
+    try:
+        await tws.send_frame_async(payload)
+        return await _collect_mkt_data(frames)
+    finally:
+        tws.close_request(req_id)
 
-    trade_records = []
 
-    ins = {}
+async def _collect_mkt_data(frames):
+    trade_records = []
     while True:
         try:
-            response = await tws.recv_frame()
+            response = await frames.get()
+            if response is None:
+                print("No Response!")
+                break
             if not response:
-                #print("No Response!")
                 continue
-
-            end_of_field_0 = response.index(b'\x00')
-            idx = response[:end_of_field_0]
-            # print(response)
-            print(idx)
-
-            print( {response})
-
-            if idx == b'88':
-                print('exit')
+            if _MKT_SNAPSHOT.dispatch(response):
                 break
-            # fields = response.decode('utf-8', 'replace').rstrip('\x00').split('\x00')
-            # id = int(fields[3])
-            # if fields[3] not in ins.keys():
-            #     ins[id]={'bar':[],'opt':[],'trd':[]}
-            #
-            #
-            # if fields[0] == "50":
-            #     rec= {'ts':int(fields[3]),'op':float(fields[4]),'hi':float(fields[5]),'lo':float(fields[6]),'cl':float(fields[7])}
-            #     ins[id]['bar'].append(rec)
-            #     print(rec)
-            #
-            # if fields[0] == "21":
-            #     if int(fields[2]) in [10,11,13]:
-            #         rec = {
-            #             'reqId': fields[1],
-            #             'tickType': fields[2],
-            #             'iv': int(float(fields[4])*1000000),
-            #             'dl': int(float(fields[5])*1000000),
-            #             'oPx': int(float(fields[6])*1000),
-            #             #'dv': int(float(fields[7]),1),
-            #             'gm': int(float(fields[8])*1000000),
-            #             'vg': int(float(fields[9])*1000000),
-            #             'th': int(float(fields[10])*1000000),
-            #             'uPx': int(float(fields[11])*1000),
-            #         }
-            #         ins[id]['opt'].append(rec)
-            #         print(rec)
-            #
-            #
-            # if fields[0] == "1":  # tickPrice
-            #     if int(fields[3]) in [1,2,3,4]:
-            #         print(fields)
-            #
-            #
-            # elif fields[0] == "2":  # tickSize
-            #     if fields[3] == "8":
-            #         print(fields)
-            #
-            # elif fields[0] == "46":  # ts
-            #     if fields[3] == "45":
-            #         print(dt.fromtimestamp(int(fields[4])))
-            #     elif fields[3] == "48":
-            #         #print(fields)
-            #         tmp=fields[4].split(';')
-            #         #print(rec)
-            #         last=float(tmp[0])
-            #         sz = int(tmp[1].split('.')[0])
-            #         ts=dt.fromtimestamp(float(tmp[2])/1000)
-            #         vol=int(tmp[3].split('.')[0])
-            #         vwap=float(tmp[4])
-            #         rec ={'ts':ts,'px':last,'sz':sz,'vol':vol,'vwap':vwap}
-            #         ins[id]['trd'].append(rec)
-            #
-            #
-            # elif fields[0] == "4":  # error
-            #     if len(fields) > 3 and fields[3] in ['2104', '2107', '2158']:
-            #         print(f"Info message: {fields[4] if len(fields) > 4 else 'N/A'}")
-            #     else:
-            #         print(f"Error: {fields}")
-
-        except socket.timeout:
-            continue
+
+        except RequestError:
+            raise
         except Exception as e:
             print(f"Error receiving data: {e}")
             break
 
-    return trade_records
\ No newline at end of file
+    return trade_records
@@ -0,0 +1,273 @@
+# mkt_shard.py — market data across worker processes: one 'mkt' slot each, decoded ticks out through shm rings
+import asyncio
+import itertools
+import multiprocessing as mp
+import queue
+
+from core.Tws import Tws
+from core.core_cfg import SHARD, PACING
+from core.core_dsp import Dispatcher
+from core.core_fv import FrameView
+from core.core_pace import gateway_budget, budget_share
+from core.core_shm import ShmRing
+from mkt.mkt_dll import sub_mkt_data_async, sub_rt_bar_async, cancel_mkt_data_async, cancel_rt_bar_async
+
+# Record layout per tag (core_shm.TICK: time, key, tag, tickType, 7 values)
+#   1  tickPrice       price, size
+#   2  tickSize        size
+#   21 tickOptionComp  iv, delta, optPx, gamma, vega, theta, undPx
+#   46 tickString 48   last, size, volume, vwap, trade time (s)
+#   50 realTimeBar     open, high, low, close, volume, wap, bar time (s)   tickType 0
+#   4  error           tickType = error code
+
+
+class _TickSink:
+    """Route of one subscription in a worker: frames are decoded straight into the ring"""
+    __slots__ = ("ring", "key")
+
+    def __init__(self, ring, key):
+        self.ring = ring
+        self.key = key
+
+    def put_nowait(self, frame):
+        if frame is not None:
+            _SHARD_TICKS.dispatch(frame, self)
+
+
+def _on_price(fv, sink):
+    sink.ring.write(sink.key, 1, fv.int_field(3), fv.float_field(4, 0.0), fv.float_field(5, 0.0))
+
+
+def _on_size(fv, sink):
+    sink.ring.write(sink.key, 2, fv.int_field(3), fv.float_field(4, 0.0))
+
+
+def _on_opt(fv, sink):
+    f = fv.float_field
+    sink.ring.write(sink.key, 21, fv.int_field(2), f(4, 0.0), f(5, 0.0), f(6, 0.0), f(8, 0.0), f(9, 0.0),
+                    f(10, 0.0), f(11, 0.0))
+
+
+def _on_string(fv, sink):
+    if fv.field(3) == b"48":
+        px, sz, ms, vol, vwap = (fv.field(4).split(b";") + [b""] * 5)[:5]
+        if px:
+            sink.ring.write(sink.key, 46, 48, float(px), float(sz or 0), float(vol or 0), float(vwap or 0),
+                            int(ms or 0) / 1000)
+
+
+def _on_bar(fv, sink):
+    f = fv.float_field
+    sink.ring.write(sink.key, 50, 0, f(4, 0.0), f(5, 0.0), f(6, 0.0), f(7, 0.0), f(8, 0.0), f(9, 0.0),
+                    f(3, 0.0))
+
+
+def _on_error(fv, sink):
+    sink.ring.write(sink.key, 4, fv.int_field(3, 0))
+
+
+_SHARD_TICKS = Dispatcher({b"1": _on_price, b"2": _on_size, b"21": _on_opt, b"46": _on_string, b"50": _on_bar,
+                           b"4": _on_error})
+
+# High-rate tags taken a whole read at a time (Tws.add_batch_handler); errors stay per frame
+_BATCH_TICKS = {b"1": _on_price, b"2": _on_size, b"21": _on_opt, b"46": _on_string, b"50": _on_bar}
+
+
+def _tick_batch(routes, handler):
+    """
+    Batch handler for one tick tag: the reqId column of the FrameBatch picks
+    each row's sink, the row is decoded through one reused FrameView straight
+    into the ring (no per-frame bytes copy, no tag lookup).
+    """
+    fv = FrameView()
+
+    def on_batch(batch, rows):
+        req_ids = batch.req_ids
+        for i in rows:
+            sink = routes.get(int(req_ids[i]))
+            if type(sink) is _TickSink:
+                handler(batch.view(i, fv), sink)
+            elif sink is not None:
+                sink.put_nowait(batch.frame(i))
+    return on_batch
+
+
+async def _worker(slot, host, port, ring_name, cmds, events, pacing):
+    ring = ShmRing.attach(ring_name)
+    gateway_budget(host, port, pacing)  # this worker's share, before Tws binds the gateway budget
+    tws = Tws(host, port, 'mkt', slot)
+    try:
+        await tws.connect_async()
+    except Exception as e:
+        events.put(("error", slot, str(e)))
+        ring.close()
+        return
+    for tag, handler in _BATCH_TICKS.items():
+        tws.add_batch_handler(tag, _tick_batch(tws._routes, handler))
+    events.put(("ready", slot, tws.client_id))
+    wire = {}  # key -> current reqId (the supervisor renumbers on reconnect)
+    cancel = {}  # key -> cancel coroutine for its kind
+
+    def on_resub(old, new):
+        sink = tws._routes.get(new)
+        if sink is not None:
+            wire[sink.key] = new
+    if tws.sup is not None:
+        tws.sup.on_resub = on_resub
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            cmd = await loop.run_in_executor(None, cmds.get)
+            op = cmd[0]
+            if op == "sub" or op == "bar":
+                _, key, prms = cmd
+                req_id = tws.next_req_id()
+                tws.add_route(req_id, _TickSink(ring, key))
+                wire[key] = req_id
+                if op == "sub":
+                    cancel[key] = cancel_mkt_data_async
+                    await sub_mkt_data_async(tws, req_id, prms, queue_policy=None)
+                else:
+                    cancel[key] = cancel_rt_bar_async
+                    await sub_rt_bar_async(tws, req_id, prms)
+            elif op == "cancel":
+                req_id = wire.pop(cmd[1], None)
+                if req_id is not None:
+                    await cancel.pop(cmd[1])(tws, req_id)
+            elif op == "stop":
+                break
+    finally:
+        for key, req_id in list(wire.items()):
+            await cancel[key](tws, req_id)
+        await tws.close_async()
+        ring.close()
+        events.put(("stopped", slot, tws.client_id))
+
+
+def _worker_main(slot, host, port, ring_name, cmds, events, pacing):
+    asyncio.run(_worker(slot, host, port, ring_name, cmds, events, pacing))
+
+
+class Shard:
+    """One worker process: its slot, command queue, ring, and the keys it owns"""
+    __slots__ = ("slot", "client_id", "proc", "cmds", "ring", "keys")
+
+    def __init__(self, slot, proc, cmds, ring):
+        self.slot = slot
+        self.client_id = None
+        self.proc = proc
+        self.cmds = cmds
+        self.ring = ring
+        self.keys = set()
+
+
+class ShardCoordinator:
+    """
+    Runs SHARD['workers'] processes, each a Tws on its own 'mkt' slot
+    (client ids from BUSINESS_RANGES) decoding its subscriptions into its own
+    ShmRing, so decoding scales past one GIL. subscribe() places an instrument
+    on the least-loaded worker and returns its key, the id carried by every
+    record of it; read() collects new records from every ring. Rings are
+    created and unlinked here; other processes can ShmRing.attach(name) them.
+    Each worker paces against its budget_share of pacing, so together they
+    stay within the gateway's message rate and market-data lines.
+    """
+
+    def __init__(self, host="127.0.0.1", port=4012, workers=SHARD["workers"], first_slot=SHARD["first_slot"],
+                 ring_records=SHARD["ring_records"], cfg: dict = SHARD, pacing: dict = PACING):
+        self.host = host
+        self.port = port
+        self.slots = range(first_slot, first_slot + workers)
+        self.ring_records = ring_records
+        self.cfg = cfg
+        self.pacing = pacing
+        self.shards = []
+        self.live = []
+        self._ctx = mp.get_context(cfg["start_method"])
+        self._events = self._ctx.Queue()
+        self._keys = itertools.count(1)
+        self._where = {}
+
+    def start(self):
+        """Spawn every worker and wait for their handshakes; keep the ones that came up"""
+        for k, slot in enumerate(self.slots):
+            ring = ShmRing.create(self.ring_records)
+            cmds = self._ctx.Queue()
+            share = budget_share(self.pacing, len(self.slots), k)
+            proc = self._ctx.Process(target=_worker_main, name=f"mkt-shard-{slot}", daemon=True,
+                                     args=(slot, self.host, self.port, ring.name, cmds, self._events, share))
+            proc.start()
+            self.shards.append(Shard(slot, proc, cmds, ring))
+        by_slot = {s.slot: s for s in self.shards}
+        pending = set(by_slot)
+        while pending:
+            try:
+                kind, slot, info = self._events.get(timeout=self.cfg["ready_timeout_sec"])
+            except queue.Empty:
+                break
+            pending.discard(slot)
+            if kind == "ready":
+                by_slot[slot].client_id = info
+                self.live.append(by_slot[slot])
+            else:
+                print(f"Shard mkt slot {slot} failed: {info}")
+        for slot in pending:
+            print(f"Shard mkt slot {slot}: no handshake in {self.cfg['ready_timeout_sec']} s")
+        if not self.live:
+            self.stop()
+            raise ConnectionError("Shard mkt: no worker connected")
+        print(f"Shard mkt: {len(self.live)} workers, client ids {[s.client_id for s in self.live]}")
+        return self
+
+    def _place(self, op, prms):
+        shard = min(self.live, key=lambda s: len(s.keys))
+        key = next(self._keys)
+        shard.keys.add(key)
+        self._where[key] = shard
+        shard.cmds.put((op, key, prms))
+        return key
+
+    def subscribe(self, prms) -> int:
+        """reqMktData on the least-loaded worker; returns the instrument key"""
+        return self._place("sub", prms)
+
+    def subscribe_rt_bar(self, prms) -> int:
+        return self._place("bar", prms)
+
+    def cancel(self, key):
+        shard = self._where.pop(key, None)
+        if shard is not None:
+            shard.keys.discard(key)
+            shard.cmds.put(("cancel", key))
+
+    def read(self, max_n: int = None) -> list:
+        """New records from every ring (each ring's in order)"""
+        out = []
+        for s in self.live:
+            out.extend(s.ring.read(max_n))
+        return out
+
+    @property
+    def lost(self) -> int:
+        return sum(s.ring.lost for s in self.shards)
+
+    def stop(self, timeout: float = 5.0):
+        """Ask every worker to cancel and disconnect, then release the rings"""
+        for s in self.shards:
+            if s.proc.is_alive():
+                s.cmds.put(("stop",))
+        for s in self.shards:
+            s.proc.join(timeout)
+            if s.proc.is_alive():
+                s.proc.terminate()
+                s.proc.join()
+            s.ring.close()
+        self.shards = []
+        self.live = []
+
+
+__all__ = [
+    "Shard",
+    "ShardCoordinator",
+]
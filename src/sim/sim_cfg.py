@@ -0,0 +1,39 @@
+# sim_cfg.py — local TWS/Gateway simulator settings (sim_srv)
+from typing import Final
+
+SIM: Final[dict] = {
+    "host": "127.0.0.1",
+    "port": 4012,               # same as the default gateway, so the mains run unchanged
+    "server_version": 178,
+    "account": "DU0000001",
+    "next_valid_id": 1,
+    "seed": 7,                  # generators are deterministic for a given seed
+
+    # Latency added to every request/response (ms); streams are pushed without it
+    "latency_ms": 0.5,
+    "jitter_ms": 0.0,
+
+    # Inbound pacing like the gateway: error 100 above this rate (0 = off)
+    "max_msg_per_sec": 50,
+
+    # Contract details / option chains
+    "con_id_base": 700000000,
+    "expiries": ["20250919", "20251017", "20251121", "20251219"],
+    "strike_lo": 5000.0,
+    "strike_hi": 7000.0,
+    "strike_step": 25.0,
+    "opt_exchanges": ["SMART", "CBOE"],
+    "multiplier": "100",
+
+    # Historical bars
+    "hst_max_bars": 2000,
+    "hst_start_px": 6000.0,
+    "hst_vol": 0.001,           # per-bar relative step of the random walk
+
+    # Market data streams
+    "tick_rate": 20.0,          # ticks per second per subscription
+    "rt_bar_sec": 5.0,          # realTimeBars interval
+}
+
+
+__all__ = ["SIM"]
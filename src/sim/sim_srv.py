@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# sim_srv.py — local TWS/Gateway simulator: handshake, contracts, chains, bars, ticks
+import asyncio
+import random
+import struct
+import time
+import zlib
+from datetime import datetime as dt, timedelta
+
+from core.core_cfg import REQ_ID_FIELD
+from sim.sim_cfg import SIM
+
+_pack = struct.Struct(">I").pack
+
+_BAR_MIN = {"sec": 1 / 60, "secs": 1 / 60, "min": 1, "mins": 1, "hour": 60, "hours": 60, "day": 390, "days": 390}
+_DUR_DAYS = {"S": 1 / 23400, "D": 1, "W": 5, "M": 21, "Y": 252}
+
+
+def _enc(*fields) -> bytes:
+    """One payload from str/bytes/number fields, each NUL-terminated"""
+    return b"".join((f if isinstance(f, bytes) else str(f).encode("ascii")) + b"\x00" for f in fields)
+
+
+def _set_req_id(payload: bytes, req_id: bytes) -> bytes:
+    """Rewrite the reqId field of a recorded response (position from REQ_ID_FIELD)"""
+    f = payload.split(b"\x00")
+    idx = REQ_ID_FIELD.get(f[0])
+    if idx is None or idx >= len(f):
+        return payload
+    f[idx] = req_id
+    return b"\x00".join(f)
+
+
+def _con_id(cfg, *key) -> int:
+    return cfg["con_id_base"] + zlib.crc32("|".join(map(str, key)).encode()) % 100000000
+
+
+def _strikes(cfg):
+    k = cfg["strike_lo"]
+    out = []
+    while k <= cfg["strike_hi"]:
+        out.append(k)
+        k += cfg["strike_step"]
+    return out
+
+
+def _fmt_px(x: float) -> str:
+    return f"{x:.2f}"
+
+
+class SimSession:
+    """One client connection: framing, handshake, then request dispatch by tag"""
+
+    def __init__(self, srv, reader, writer):
+        self.srv = srv
+        self.cfg = srv.cfg
+        self.rnd = random.Random(self.cfg["seed"])
+        self.r = reader
+        self.w = writer
+        self.client_id = None
+        self.streams = {}           # reqId bytes -> task
+        self._sec = 0
+        self._sec_count = 0
+        self.handlers = {
+            b"9": self.on_contract_details,
+            b"78": self.on_sec_def_opt_params,
+            b"20": self.on_historical_data,
+            b"25": self.on_cancel,
+            b"1": self.on_mkt_data,
+            b"2": self.on_cancel,
+            b"50": self.on_rt_bars,
+            b"51": self.on_cancel,
+            b"49": self.on_current_time,
+        }
+
+    # ---- framing ----
+    def send(self, *payloads) -> None:
+        if self.w.is_closing():
+            return
+        self.w.write(b"".join(_pack(len(p)) + p for p in payloads))
+        self.srv.frames_out += len(payloads)
+
+    def reply(self, payloads) -> None:
+        """Responses to requests leave together after the configured latency"""
+        if not payloads:
+            return
+        cfg = self.cfg
+        delay = (cfg["latency_ms"] + self.rnd.uniform(-cfg["jitter_ms"], cfg["jitter_ms"])) / 1000
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self.send, *payloads)
+        else:
+            self.send(*payloads)
+
+    async def read_frame(self):
+        n = struct.unpack(">I", await self.r.readexactly(4))[0]
+        return await self.r.readexactly(n)
+
+    # ---- session ----
+    async def run(self):
+        try:
+            magic = await self.r.readexactly(4)
+            if magic != b"API\x00":
+                return
+            await self.read_frame()  # "v157..178"
+            now = dt.now().strftime("%Y%m%d %H:%M:%S")
+            self.send(_enc(self.cfg["server_version"], now + " EST"))
+            start = (await self.read_frame()).split(b"\x00")
+            self.client_id = start[2] if len(start) > 2 else b"0"
+            self.send(_enc(15, 1, self.cfg["account"]), _enc(9, 1, self.cfg["next_valid_id"]))
+            while True:
+                p = await self.read_frame()
+                self.srv.frames_in += 1
+                if not self._paced():
+                    continue
+                tag = p[:p.find(b"\x00")]
+                h = self.handlers.get(tag)
+                if h is not None:
+                    h(p.split(b"\x00"))
+                else:
+                    self.srv.unhandled += 1
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for t in self.streams.values():
+                t.cancel()
+            self.streams.clear()
+            self.w.close()
+
+    def _paced(self) -> bool:
+        lim = self.cfg["max_msg_per_sec"]
+        if not lim:
+            return True
+        sec = int(time.monotonic())
+        if sec != self._sec:
+            self._sec, self._sec_count = sec, 0
+        self._sec_count += 1
+        if self._sec_count > lim:
+            self.srv.paced += 1
+            self.send(_enc(4, 2, -1, 100, "Max rate of messages per second has been exceeded", ""))
+            return False
+        return True
+
+    def _recorded(self, tag, req_id):
+        rec = self.srv.recorded.get(tag)
+        if rec is None:
+            return None
+        return [_set_req_id(p, req_id) for p in rec]
+
+    # ---- requests ----
+    def on_current_time(self, f):
+        self.reply([_enc(49, 1, int(time.time()))])
+
+    def on_contract_details(self, f):
+        # 9, version, reqId, conId, symbol, secType, exp, strike, right, mul, xch, prim, cur, lSym, tc, ...
+        req_id = f[2]
+        out = self._recorded(b"9", req_id)
+        if out is None:
+            cfg = self.cfg
+            sym = f[4].decode() or "SPX"
+            sec = f[5].decode() or "OPT"
+            xch = f[10].decode() or "SMART"
+            cur = f[12].decode() or "USD"
+            tc = f[14].decode() if len(f) > 14 else ""
+            exps = [f[6].decode()] if f[6] else cfg["expiries"]
+            strikes = [float(f[7])] if f[7] and float(f[7]) else _strikes(cfg)
+            rights = [f[8].decode()] if f[8] and f[8] != b"0" else ["C", "P"]
+            if sec not in ("OPT", "FOP"):
+                exps, strikes, rights = [f[6].decode()], [0.0], [""]
+            out = []
+            for e in exps:
+                for k in strikes:
+                    for r in rights:
+                        cid = int(f[3]) if f[3] and f[3] != b"0" else _con_id(cfg, sym, sec, e, k, r)
+                        lsym = f"{sym:<6}{e[2:]}{r}{int(k * 1000):08d}" if r else sym
+                        out.append(_enc(
+                            10, req_id, sym, sec, e, k, r, xch, cur, lsym, tc or sym, tc or sym, cid,
+                            0.05, cfg["multiplier"] if r else "", "ACTIVETIM,LMT,MKT", xch, 1, 0,
+                            sym, xch, e[:6], "", "", "", "US/Eastern", "", "", "", "", 0, 1, sym, "",
+                            "", e, "", 1, 1, 1))
+        out.append(_enc(52, 1, req_id))
+        self.reply(out)
+
+    def on_sec_def_opt_params(self, f):
+        # 78, reqId, root, xch, sType, conId
+        req_id = f[1]
+        out = self._recorded(b"78", req_id)
+        if out is None:
+            cfg = self.cfg
+            root = f[2].decode() or "SPX"
+            con_id = f[5].decode() or "0"
+            strikes = [_fmt_px(k) for k in _strikes(cfg)]
+            out = [_enc(75, req_id, x, con_id, root, cfg["multiplier"],
+                        len(cfg["expiries"]), *cfg["expiries"], len(strikes), *strikes)
+                   for x in cfg["opt_exchanges"]]
+        out.append(_enc(76, req_id))
+        self.reply(out)
+
+    def on_historical_data(self, f):
+        # 20, reqId, conId, symbol, ..., endDateTime(15), barSize(16), duration(17), useRTH, whatToShow, ...
+        req_id = f[1]
+        out = self._recorded(b"20", req_id)
+        if out is None:
+            out = [self._hst_bars(req_id, f[16].decode(), f[17].decode())]
+        out.append(_enc(18, req_id, "", ""))
+        self.reply(out)
+
+    def _hst_bars(self, req_id, bar_size, duration):
+        cfg = self.cfg
+        n, unit = (bar_size.split() + ["mins"])[:2]
+        bar_min = float(n) * _BAR_MIN.get(unit, 1)
+        d, du = (duration.split() + ["D"])[:2]
+        count = int(float(d) * _DUR_DAYS.get(du, 1) * 390 / bar_min) or 1
+        count = min(count, cfg["hst_max_bars"])
+        end = dt.now().replace(second=0, microsecond=0)
+        t = end - timedelta(minutes=bar_min * count)
+        px = cfg["hst_start_px"]
+        bars = []
+        for _ in range(count):
+            o = px
+            px *= 1 + self.rnd.gauss(0, cfg["hst_vol"])
+            hi = max(o, px) * (1 + abs(self.rnd.gauss(0, cfg["hst_vol"] / 2)))
+            lo = min(o, px) * (1 - abs(self.rnd.gauss(0, cfg["hst_vol"] / 2)))
+            vol = self.rnd.randint(100, 10000)
+            bars += [t.strftime("%Y%m%d %H:%M:%S") + " US/Eastern", _fmt_px(o), _fmt_px(hi), _fmt_px(lo),
+                     _fmt_px(px), vol, _fmt_px((o + px) / 2), self.rnd.randint(10, 500)]
+            t += timedelta(minutes=bar_min)
+        start = end - timedelta(minutes=bar_min * count)
+        return _enc(17, req_id, start.strftime("%Y%m%d %H:%M:%S") + " US/Eastern",
+                    end.strftime("%Y%m%d %H:%M:%S") + " US/Eastern", count, *bars)
+
+    def on_mkt_data(self, f):
+        # 1, version, reqId, conId, symbol, secType, exp, strike, right, ..., genericTicks(15), snapshot(16)
+        req_id = f[2]
+        is_opt = f[5] in (b"OPT", b"FOP")
+        px = float(f[7]) / 20 if is_opt and f[7] and float(f[7]) else self.cfg["hst_start_px"]
+        if len(f) > 16 and f[16] == b"1":
+            out = self._recorded(b"1", req_id)
+            if out is None:
+                out = self._ticks(req_id, px, is_opt)
+            out.append(_enc(57, 1, req_id))
+            self.reply(out)
+            return
+        self._start_stream(req_id, self._tick_stream(req_id, px, is_opt))
+
+    def _ticks(self, req_id, px, is_opt):
+        sp = max(px * 0.0002, 0.05)
+        bid, ask = px - sp, px + sp
+        sz = self.rnd.randint(1, 50)
+        ms = int(time.time() * 1000)
+        out = [_enc(1, 6, req_id, 1, _fmt_px(bid), sz, 0),
+               _enc(1, 6, req_id, 2, _fmt_px(ask), sz, 0),
+               _enc(1, 6, req_id, 4, _fmt_px(px), sz, 0),
+               _enc(2, 6, req_id, 8, self.rnd.randint(1000, 100000)),
+               _enc(46, 6, req_id, 48, f"{_fmt_px(px)};{sz};{ms};{self.rnd.randint(1000, 100000)};{_fmt_px(px)};false")]
+        if is_opt:
+            r = self.rnd
+            out.append(_enc(21, req_id, 13, 1, f"{r.uniform(0.1, 0.4):.6f}", f"{r.uniform(-1, 1):.6f}",
+                            _fmt_px(px), 0, f"{r.uniform(0, 0.01):.6f}", f"{r.uniform(0, 5):.6f}",
+                            f"{-r.uniform(0, 5):.6f}", _fmt_px(self.cfg["hst_start_px"])))
+        return out
+
+    async def _tick_stream(self, req_id, px, is_opt):
+        rate = self.cfg["tick_rate"]
+        while True:
+            px *= 1 + self.rnd.gauss(0, 0.0002)
+            self.send(*self._ticks(req_id, px, is_opt))
+            await asyncio.sleep(1 / rate)
+
+    def on_rt_bars(self, f):
+        # 50, version, reqId, ...
+        req_id = f[2]
+        self._start_stream(req_id, self._bar_stream(req_id))
+
+    async def _bar_stream(self, req_id):
+        cfg = self.cfg
+        px = cfg["hst_start_px"]
+        while True:
+            await asyncio.sleep(cfg["rt_bar_sec"])
+            o = px
+            px *= 1 + self.rnd.gauss(0, cfg["hst_vol"])
+            self.send(_enc(50, 3, req_id, int(time.time()), _fmt_px(o), _fmt_px(max(o, px)),
+                           _fmt_px(min(o, px)), _fmt_px(px), self.rnd.randint(1, 1000), _fmt_px((o + px) / 2),
+                           self.rnd.randint(1, 100)))
+
+    def _start_stream(self, req_id, coro):
+        old = self.streams.pop(req_id, None)
+        if old is not None:
+            old.cancel()
+        self.streams[req_id] = asyncio.get_running_loop().create_task(coro)
+
+    def on_cancel(self, f):
+        # cancelMktData / cancelHistoricalData / cancelRealTimeBars: tag, version, reqId
+        t = self.streams.pop(f[2], None)
+        if t is not None:
+            t.cancel()
+
+
+class SimServer:
+    """
+    Local stand-in for TWS / IB Gateway. Speaks the handshake and answers
+    contractDetails (10/52), secDefOptParams (75/76), historicalData (17/18),
+    reqCurrentTime (49) and market data (1/2/21/46/57, realTimeBars 50) from
+    seeded generators, or replays recorded response payloads per request tag
+    (recorded={b"9": [payload, ...]}, reqId rewritten per request, end marker
+    appended). Inbound rate above max_msg_per_sec is rejected with error 100.
+    """
+
+    def __init__(self, cfg: dict = SIM, recorded: dict = None, **overrides):
+        self.cfg = dict(cfg, **overrides)
+        self.recorded = recorded or {}
+        self.server = None
+        self.sessions = {}          # SimSession -> its task
+        self.connections = 0
+        self.frames_in = 0
+        self.frames_out = 0
+        self.unhandled = 0
+        self.paced = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._on_client, self.cfg["host"], self.cfg["port"])
+        return self
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _on_client(self, reader, writer):
+        s = SimSession(self, reader, writer)
+        self.sessions[s] = asyncio.current_task()
+        self.connections += 1
+        try:
+            await s.run()
+        finally:
+            self.sessions.pop(s, None)
+
+    def drop_all(self) -> None:
+        """Abort every client socket (reconnect testing)"""
+        for s in list(self.sessions):
+            s.w.transport.abort()
+
+    async def close(self):
+        tasks = list(self.sessions.values())
+        self.drop_all()
+        self.server.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.server.wait_closed()
+
+    @property
+    def stats(self):
+        return {
+            "connections": self.connections,
+            "sessions": len(self.sessions),
+            "frames_in": self.frames_in,
+            "frames_out": self.frames_out,
+            "unhandled": self.unhandled,
+            "paced": self.paced,
+        }
+
+
+async def main():
+    srv = await SimServer().start()
+    print(f"Simulator listening on {srv.cfg['host']}:{srv.port} (server version {srv.cfg['server_version']})")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(srv.stats)
+    finally:
+        await srv.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())